@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Conversion pool benchmark - 8 ta konvertatsiya bir vaqtda ishlaganda
+event loop javob berish kechikishini o'lchash
+
+Ishlatish:
+    python bench_conversion_pool.py [--jobs 8] [--pages 20]
+
+Ikki rejim solishtiriladi:
+    inline - eski usul: sinxron funksiya event loop ichida chaqiriladi
+    pool   - conversion_pool orqali alohida jarayonlarda
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+import documents
+from conversion_pool import ConversionPool
+
+TICK = 0.01  # "tugma bosilishi" simulyatsiyasi - har 10ms da callback
+
+
+def create_sample_pdf(path, pages):
+    """Create a text-heavy PDF for conversion"""
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        y = 60
+        for line in range(40):
+            page.insert_text((50, y), f"Sahifa {page_num + 1}, qator {line + 1}: Soliq.uz hisob-faktura ma'lumotlari",
+                             fontsize=10)
+            y += 18
+    doc.save(path)
+    doc.close()
+
+
+async def measure_lag(stop: asyncio.Event, samples: list):
+    """Record how late each periodic callback fires"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        samples.append(time.perf_counter() - started - TICK)
+
+
+async def run_inline(jobs):
+    for pdf_path, docx_path in jobs:
+        documents.convert_pdf_to_word(pdf_path, docx_path)
+        await asyncio.sleep(0)
+
+
+async def run_pool(pool, jobs):
+    await asyncio.gather(*(pool.run(documents.convert_pdf_to_word, pdf, docx) for pdf, docx in jobs))
+
+
+async def bench(mode, jobs, workers):
+    pool = ConversionPool(max_workers=workers, max_tasks_per_child=20, timeout=600)
+    if mode == 'pool':
+        # Worker'larni oldindan ishga tushirish (spawn vaqti o'lchovga kirmasin)
+        await asyncio.gather(*(pool.run(time.sleep, 0) for _ in range(workers)))
+
+    samples = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop, samples))
+    started = time.perf_counter()
+    if mode == 'inline':
+        await run_inline(jobs)
+    else:
+        await run_pool(pool, jobs)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    pool.shutdown()
+
+    samples.sort()
+    p50 = statistics.median(samples) if samples else 0
+    p99 = samples[int(len(samples) * 0.99) - 1] if samples else 0
+    worst = samples[-1] if samples else elapsed
+    print(f"{mode:>6}: jami {elapsed:6.2f}s | callback kechikishi p50 {p50 * 1000:7.1f}ms "
+          f"p99 {p99 * 1000:8.1f}ms max {worst * 1000:8.1f}ms ({len(samples)} ta o'lchov)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=8)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'sample.pdf')
+        create_sample_pdf(source, args.pages)
+        jobs = [(source, os.path.join(tmp, f"out_{i}.docx")) for i in range(args.jobs)]
+        print(f"{args.jobs} ta konvertatsiya, har biri {args.pages} sahifa, {args.workers} worker")
+        asyncio.run(bench('inline', jobs, args.workers))
+        asyncio.run(bench('pool', jobs, args.workers))
+
+
+if __name__ == '__main__':
+    main()
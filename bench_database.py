@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Database benchmark - har chaqiruvda yangi ulanish va pooled ulanishni solishtirish
+
+Har bir "update" require_permission ning ishi: add_or_update_user + is_admin +
+is_user_allowed. Benchmark ikki rejimda ishlaydi:
+
+    max   - iloji boricha tez, sekundiga nechta update
+    paced - sekundiga --rate ta update (default 1000), kechikish p50/p99
+
+Ishlatish:
+    python bench_database.py [--updates 5000] [--rate 1000] [--users 500]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import database
+
+
+def legacy_update(db_file, user_id, username, full_name):
+    """The old code path: three sqlite3.connect() calls per update"""
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO users (user_id, username, full_name)
+        VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            username = excluded.username,
+            full_name = excluded.full_name
+    ''', (user_id, username, full_name))
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM admins WHERE user_id = ?', (user_id,))
+    admin = cursor.fetchone()[0] > 0
+    conn.close()
+
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute('SELECT is_allowed FROM users WHERE user_id = ?', (user_id,))
+    result = cursor.fetchone()
+    conn.close()
+    return admin or (result[0] == 1 if result else False)
+
+
+def pooled_update(db_file, user_id, username, full_name):
+    """The pooled data access layer"""
+    database.add_or_update_user(user_id, username, full_name)
+    return database.is_admin(user_id) or database.is_user_allowed(user_id)
+
+
+def fresh_database(tmp, name, wal):
+    path = os.path.join(tmp, name)
+    database.DB_FILE = path
+    database.init_database()
+    database.close_connections()
+    if not wal:
+        # Eski baza default rollback journal bilan ishlagan
+        conn = sqlite3.connect(path)
+        conn.execute('PRAGMA journal_mode=DELETE')
+        conn.close()
+    return path
+
+
+def run_max(func, db_file, updates, users):
+    started = time.perf_counter()
+    for i in range(updates):
+        user_id = random.randint(1, users)
+        func(db_file, user_id, f"user{user_id}", f"User {user_id}")
+    elapsed = time.perf_counter() - started
+    return updates / elapsed
+
+
+def run_paced(func, db_file, updates, users, rate):
+    interval = 1.0 / rate
+    latencies = []
+    started = time.perf_counter()
+    for i in range(updates):
+        scheduled = started + i * interval
+        now = time.perf_counter()
+        if now < scheduled:
+            time.sleep(scheduled - now)
+        user_id = random.randint(1, users)
+        func(db_file, user_id, f"user{user_id}", f"User {user_id}")
+        # Jadvaldan kechikish ham hisobga olinadi (navbat to'planishi)
+        latencies.append(time.perf_counter() - scheduled)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'achieved_rate': updates / elapsed,
+        'p50': statistics.median(latencies),
+        'p99': latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=5000)
+    parser.add_argument('--rate', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, func, wal in (('per-call', legacy_update, False), ('pooled', pooled_update, True)):
+            db_file = fresh_database(tmp, f"{label}.db", wal)
+            throughput = run_max(func, db_file, args.updates, args.users)
+            paced = run_paced(func, db_file, args.updates, args.users, args.rate)
+            print(f"{label:>8}: max {throughput:8.0f} update/s | {args.rate}/s da: "
+                  f"erishildi {paced['achieved_rate']:6.0f}/s, "
+                  f"p50 {paced['p50'] * 1000:7.2f}ms, p99 {paced['p99'] * 1000:8.2f}ms")
+            database.close_connections()
+
+
+if __name__ == '__main__':
+    main()
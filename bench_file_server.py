@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+File server yuklama testi - bitta QR havolani yuzlab mijoz bir vaqtda ochadi
+
+Server alohida jarayonda ishga tushiriladi, mijozlar bitta /files/<uuid>.pdf
+havolasini parallel so'raydi. Rejimlar:
+    dev       - Flask development server (eski app.run)
+    gunicorn  - file_server.serve(): gunicorn gthread, sendfile
+    aiohttp   - web_server.serve(): webhook rejimidagi bitta asyncio server
+
+Har rejimda ikki xil so'rov o'lchanadi:
+    full      - to'liq yuklab olish (200)
+    revisit   - If-None-Match bilan qayta ochish (304)
+
+Mijoz aiohttp (httpx ko'p ulanishda o'zi tor joyga aylanadi): pip install aiohttp
+
+Ishlatish:
+    python bench_file_server.py [--clients 300] [--requests 3000] [--size-kb 512]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+
+import aiohttp
+
+SERVERS = {
+    'dev': "import file_server; file_server.app.run(host='127.0.0.1', port={port}, threaded=True)",
+    'gunicorn': "import file_server; file_server.serve(host='127.0.0.1', port={port}, workers={workers})",
+    'aiohttp': "import web_server; web_server.serve(host='127.0.0.1', port={port})",
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, upload_dir, workers):
+    port = free_port()
+    env = dict(os.environ, UPLOAD_FOLDER=upload_dir, DB_FILE=os.path.join(upload_dir, 'bench.db'))
+    code = SERVERS[mode].format(port=port, workers=workers)
+    process = subprocess.Popen([sys.executable, '-c', code], env=env,
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{mode} server ishga tushmadi")
+
+
+async def load(url, clients, total, headers):
+    latencies = []
+    errors = 0
+    remaining = total
+    connector = aiohttp.TCPConnector(limit=clients)
+    timeout = aiohttp.ClientTimeout(total=60)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    async with session.get(url, headers=headers) as response:
+                        await response.read()
+                        if response.status not in (200, 304):
+                            errors += 1
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies),
+        'p99': latencies[max(0, int(len(latencies) * 0.99) - 1)],
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=300)
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--size-kb', type=int, default=512)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--modes', default='dev,gunicorn')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as upload_dir:
+        filename = f"{uuid.uuid4()}.pdf"
+        with open(os.path.join(upload_dir, filename), 'wb') as f:
+            f.write(os.urandom(args.size_kb * 1024))
+
+        for mode in args.modes.split(','):
+            process, port = start_server(mode, upload_dir, args.workers)
+            url = f"http://127.0.0.1:{port}/files/{filename}"
+            try:
+                with urllib.request.urlopen(url) as response:
+                    etag = response.headers.get('ETag')
+                runs = [('full', {})]
+                if etag:
+                    runs.append(('revisit', {'If-None-Match': etag}))
+                for label, headers in runs:
+                    result = asyncio.run(load(url, args.clients, args.requests, headers))
+                    print(f"{mode:>8} {label:>7}: {result['rps']:7.0f} req/s, "
+                          f"p50 {result['p50'] * 1000:7.1f}ms, p99 {result['p99'] * 1000:7.1f}ms, "
+                          f"xatolar {result['errors']}")
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Lokal Bot API benchmark - faylni blob store ga olish vaqti va xotira
+
+Uch usul solishtiriladi (--sizes MB dagi tasodifiy fayl bilan):
+    http      - bulutli Bot API dagidek: fayl HTTP orqali yuklab olinadi
+                (download_to_store -> File.download_to_memory), soxta fayl
+                serveri shu jarayonda
+    local-ptb - lokal server, PTB ning o'zi: download_to_memory faylni
+                to'liq o'qib, blob store ga yozadi
+    local     - lokal server, blob_store.download_to_store: hard link va
+                bo'laklab hash (boshqa FS da copy_file_range)
+Ko'rsatiladi: vaqt, MB/s va Python xotirasining eng yuqori nuqtasi
+(tracemalloc).
+
+Ishlatish:
+    python bench_local_bot_api.py [--sizes 20,200] [--dir /tmp]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from aiohttp import web
+from telegram import File
+from telegram.ext import ExtBot
+
+from bench_file_server import free_port
+
+TOKEN = '123456:bench'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+
+
+async def ingest(mode, path, store):
+    from blob_store import download_to_store
+
+    size = os.path.getsize(path)
+    app = web.Application()
+    app.router.add_post('/bot{token}/getMe', lambda request: web.json_response({'ok': True, 'result': BOT_USER}))
+    app.router.add_get('/file/bot{token}/{name}', lambda request: web.FileResponse(path))
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    port = free_port()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    base = f"http://127.0.0.1:{port}"
+    if mode == 'http':
+        bot = ExtBot(TOKEN, base_url=f"{base}/bot", base_file_url=f"{base}/file/bot")
+        file_path = f"{base}/file/bot{TOKEN}/big.pdf"
+    else:
+        bot = ExtBot(TOKEN, base_url=f"{base}/bot", local_mode=True)
+        file_path = path
+    tg_file = File('bench', 'bench', size, file_path)
+    tg_file.set_bot(bot)
+    try:
+        async with bot:
+            tracemalloc.start()
+            started = time.perf_counter()
+            if mode == 'local-ptb':
+                with store.writer() as writer:
+                    await tg_file.download_to_memory(out=writer)
+                    writer.commit()
+            else:
+                await download_to_store(tg_file, store)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    finally:
+        await runner.cleanup()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='20,200')
+    parser.add_argument('--dir', default=tempfile.gettempdir(), help="Bot API server fayllari papkasi")
+    args = parser.parse_args()
+
+    from blob_store import BlobStore
+
+    server_dir = tempfile.mkdtemp(dir=args.dir)
+    store_dir = tempfile.mkdtemp()
+    try:
+        for size_mb in (int(s) for s in args.sizes.split(',')):
+            path = os.path.join(server_dir, f"{size_mb}mb.pdf")
+            with open(path, 'wb') as f:
+                for _ in range(size_mb):
+                    f.write(os.urandom(1024 * 1024))
+            for mode in ('http', 'local-ptb', 'local'):
+                # Har safar bo'sh store - mavjud blob bilan solishtirish bo'lmasin
+                store = BlobStore(os.path.join(store_dir, mode, str(size_mb)))
+                elapsed, peak = asyncio.run(ingest(mode, path, store))
+                print(f"{size_mb:>5} MB {mode:>9}: {elapsed * 1000:8.1f}ms, {size_mb / elapsed:8.0f} MB/s, "
+                      f"xotira {peak / 1024 / 1024:7.1f} MB")
+            os.remove(path)
+    finally:
+        shutil.rmtree(server_dir, ignore_errors=True)
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
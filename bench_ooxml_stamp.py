@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+OOXML QR qo'shish benchmark - rasmlarga boy DOCX da python-docx va zip patch
+
+Hujjatda N ta noyob (siqilmaydigan) rasm va matn bor. Har rejim alohida
+jarayonda ishga tushiriladi, shuning uchun peak RSS ham alohida o'lchanadi:
+    dom    - python-docx: butun paket o'qiladi, DOM ga yuklanadi va barcha
+             a'zolar qayta siqib yoziladi
+    patch  - ooxml_stamp.stamp_docx: faqat document.xml, rels, footer va
+             [Content_Types].xml qayta yoziladi, qolgani xom ko'chiriladi
+
+Ishlatish:
+    python bench_ooxml_stamp.py [--images 40] [--image-kb 256] [--repeat 5] [--qr vector|png]
+"""
+import argparse
+import contextlib
+import io
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from docx import Document
+from docx.shared import Inches
+from PIL import Image
+
+QR_URL = 'https://example.uz/files/0a1b2c3d-0000-4000-8000-123456789abc.docx'
+
+
+def create_image_docx(path, images, image_kb):
+    """Build a DOCX with unique noisy PNG images (they do not compress)"""
+    side = int((image_kb * 1024 / 3) ** 0.5)
+    rng = np.random.default_rng(0)
+    doc = Document()
+    for num in range(images):
+        doc.add_paragraph(f"{num + 1}-rasm: skanerlangan hujjat sahifasi")
+        pixels = rng.integers(0, 256, (side, side, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels, 'RGB').save(buffer, format='PNG')
+        buffer.seek(0)
+        doc.add_picture(buffer, width=Inches(5))
+    doc.save(path)
+
+
+def run_mode(mode, source, qr_kind, repeat):
+    """Child process: stamp repeat times, print median seconds and peak RSS growth"""
+    import documents
+    import ooxml_stamp
+    import qr_render
+
+    qr = qr_render.qr_matrix(QR_URL) if qr_kind == 'vector' else qr_render.render_png(QR_URL)
+    stamp = documents._add_qr_to_word_dom if mode == 'dom' else ooxml_stamp.stamp_docx
+    output_path = source + f'.{mode}.docx'
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            stamp(source, qr, output_path)
+        timings.append(time.perf_counter() - started)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{statistics.median(timings):.4f} {(peak - baseline) / 1024:.1f} {os.path.getsize(output_path)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=40)
+    parser.add_argument('--image-kb', type=int, default=256)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--qr', choices=('vector', 'png'), default='vector')
+    parser.add_argument('--run', nargs=2, metavar=('MODE', 'DOCX'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_mode(args.run[0], args.run[1], args.qr, args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'images.docx')
+        create_image_docx(path, args.images, args.image_kb)
+        size = os.path.getsize(path)
+        print(f"{args.images} rasm, {size / 1024 / 1024:.1f} MB, QR: {args.qr}")
+        for mode in ('dom', 'patch'):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', mode, path,
+                                     '--qr', args.qr, '--repeat', str(args.repeat)],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            elapsed, rss, out_size = output.split()[-3:]
+            print(f"{mode:>6}: {float(elapsed) * 1000:9.1f}ms, peak RSS +{float(rss):7.1f} MB, "
+                  f"natija {(int(out_size) - size) / 1024:+.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+PDF -> Word benchmark - katta PDF ni 1, 2, 4 va 8 worker bilan konvertatsiya
+
+Matn va jadvalli N sahifali PDF yaratiladi va parallel_pdf.convert_pdf_to_word
+orqali har xil o'lchamdagi ConversionPool da konvertatsiya qilinadi.
+1 worker - oddiy yo'l (bitta Converter.convert), qolganlari sahifa
+oraliqlari bo'yicha parallel. Worker larni ishga tushirish vaqti
+o'lchovga kirmaydi (pool oldindan isitiladi).
+
+Natija mashinadagi yadrolar soniga bog'liq: yadrolardan ko'p worker
+tezlik bermaydi.
+
+Ishlatish:
+    python bench_pdf_to_word.py [--pages 150] [--workers 1,2,4,8] [--chunk-pages 10]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+import documents
+import parallel_pdf
+from conversion_pool import ConversionPool
+
+
+def create_report_pdf(path, pages):
+    """Build a PDF whose pages hold paragraphs and a bordered table"""
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        page.insert_text((50, 50), f"Hisobot, {page_num + 1}-sahifa", fontsize=14)
+        y = 80
+        for line in range(12):
+            page.insert_text((50, y), f"{line + 1}. Soliq to'lovchi ma'lumotlari va hisob-faktura tafsilotlari",
+                             fontsize=10)
+            y += 16
+        top = y + 10
+        for row in range(15):
+            for col in range(5):
+                rect = fitz.Rect(50 + col * 100, top + row * 20, 150 + col * 100, top + (row + 1) * 20)
+                page.draw_rect(rect, color=(0, 0, 0), width=0.5)
+                page.insert_text((rect.x0 + 4, rect.y1 - 6), f"{row + 1}.{col + 1}", fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+async def bench(pdf_path, workers, chunk_pages, tmp):
+    pool = ConversionPool(max_workers=workers, max_tasks_per_child=0, timeout=0)
+    try:
+        # Worker larni oldindan ishga tushirish
+        await asyncio.gather(*(pool.run(documents.pdf_page_count, pdf_path) for _ in range(workers)))
+        docx_path = os.path.join(tmp, f"out-{workers}.docx")
+        chunks = []
+
+        async def progress(done, total):
+            chunks.append(time.perf_counter())
+
+        started = time.perf_counter()
+        ok = await parallel_pdf.convert_pdf_to_word(pool, pdf_path, docx_path, progress, chunk_pages)
+        elapsed = time.perf_counter() - started
+        return elapsed, ok, len(chunks)
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=150)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--chunk-pages', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, 'report.pdf')
+        create_report_pdf(pdf_path, args.pages)
+        print(f"{args.pages} sahifa, {args.chunk_pages} sahifalik qismlar, {os.cpu_count()} yadro")
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(',')):
+            elapsed, ok, chunks = asyncio.run(bench(pdf_path, workers, args.chunk_pages, tmp))
+            baseline = baseline or elapsed
+            print(f"{workers} worker: {elapsed:7.1f}s, {baseline / elapsed:4.2f}x, "
+                  f"{chunks} qism, {'ok' if ok else 'xato'}")
+
+
+if __name__ == '__main__':
+    main()
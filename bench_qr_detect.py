@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Eski QR ni topish benchmark - katta skanerlangan PDF da vaqt va xotira
+
+Har sahifasi to'liq sahifali JPEG bo'lgan PDF yaratiladi (skaner natijasi),
+oxirgi sahifaga bot qo'ygan PNG QR qo'shiladi. Har rejim alohida jarayonda
+ishga tushiriladi, shuning uchun peak RSS ham alohida o'lchanadi:
+    pixmap    - eski usul: har rasm uchun fitz.Pixmap (to'liq dekodlash)
+    metadata  - qr_detect.find_pdf_qr_images, dekodlashsiz
+    confirm   - metadata + kvadrat nomzodni OpenCV bilan dekodlash
+
+Ishlatish:
+    python bench_qr_detect.py [--pages 200] [--dpi 150]
+"""
+import argparse
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image, ImageDraw
+
+import qr_render
+
+QR_URL = 'https://example.uz/files/0a1b2c3d-0000-4000-8000-123456789abc.pdf'
+
+
+def create_scanned_pdf(path, pages, dpi):
+    """Build a PDF whose every page is a unique full-page JPEG"""
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    rng = np.random.default_rng(0)
+    paper = (235 + rng.integers(0, 20, (height, width), dtype=np.uint8)).astype(np.uint8)
+    doc = fitz.open()
+    for page_num in range(pages):
+        img = Image.fromarray(paper, 'L')
+        draw = ImageDraw.Draw(img)
+        for line in range(60):
+            y = 80 + line * (height - 160) // 60
+            draw.rectangle((80, y, 80 + (page_num * 37 + line * 91) % (width - 160), y + 6), fill=40)
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=75)
+        page = doc.new_page(width=595, height=842)
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    doc[-1].insert_image(fitz.Rect(513, 760, 585, 832), stream=qr_render.render_png(QR_URL))
+    doc.save(path)
+    doc.close()
+
+
+def legacy_scan(pdf_document):
+    """The old loop: decode every image just to read its size"""
+    found = []
+    for page_num in range(len(pdf_document)):
+        page = pdf_document[page_num]
+        for img in page.get_images():
+            xref = img[0]
+            pix = fitz.Pixmap(pdf_document, xref)
+            if pix.width == pix.height and pix.width <= 100:
+                found.append(xref)
+            pix = None
+    return found
+
+
+def run_mode(mode, path):
+    """Child process: one scan, print seconds and peak RSS growth"""
+    import qr_detect
+
+    pdf_document = fitz.open(path)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    if mode == 'pixmap':
+        found = legacy_scan(pdf_document)
+    else:
+        found = list(qr_detect.find_pdf_qr_images(pdf_document, confirm=(mode == 'confirm')))
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{elapsed:.4f} {(peak - baseline) / 1024:.1f} {len(found)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--dpi', type=int, default=150)
+    parser.add_argument('--run', nargs=2, metavar=('MODE', 'PDF'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_mode(*args.run)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'scanned.pdf')
+        create_scanned_pdf(path, args.pages, args.dpi)
+        print(f"{args.pages} sahifa, {args.dpi} dpi, {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+        for mode in ('pixmap', 'metadata', 'confirm'):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run', mode, path],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            elapsed, rss, found = output.split()[-3:]
+            print(f"{mode:>9}: {float(elapsed) * 1000:9.1f}ms, peak RSS +{float(rss):7.1f} MB, topildi {found}")
+
+
+if __name__ == '__main__':
+    main()
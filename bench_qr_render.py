@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+QR chizish benchmark - soniyasiga nechta QR
+
+Rejimlar:
+    pil        - eski yo'l: har safar qrcode.QRCode + make(fit=True) + PIL PNG
+    cold       - qr_render.render_png, kesh bo'sh (har havola yangi)
+    cached     - qr_render.render_png, bir xil havola qayta yuborilganda
+    variants   - bitta havola uchun Telegram rasmi + PDF/Word vektor shtampi
+                 (kesh bo'sh; matritsa bir marta hisoblanadi)
+Alohida: faqat PNG kodlash - PIL va numpy 1-bitli kodlovchi.
+
+Ishlatish:
+    python bench_qr_render.py [--count 300]
+"""
+import argparse
+import io
+import secrets
+import string
+import time
+
+import qrcode
+
+import qr_render
+
+
+def short_code(length=9):
+    """Random code like database.new_short_code (without opening the DB)"""
+    return ''.join(secrets.choice(string.digits + string.ascii_uppercase) for _ in range(length))
+
+
+def old_render(data):
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def variants(data):
+    qr_render.render_png(data)
+    qr_render.qr_matrix(data)
+
+
+def rate(func, payloads, clear=False):
+    started = time.perf_counter()
+    for data in payloads:
+        if clear:
+            qr_render.clear_cache()
+        func(data)
+    return len(payloads) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=300)
+    args = parser.parse_args()
+
+    payloads = [f"https://soliq-bot-production.up.railway.app/f/{short_code()}".upper()
+                for _ in range(args.count)]
+    same = payloads[:1] * args.count
+
+    qr_render.render_png(payloads[0])  # isitish
+    print(f"{'pil':>9}: {rate(old_render, payloads):8.0f} QR/s")
+    print(f"{'cold':>9}: {rate(qr_render.render_png, payloads, clear=True):8.0f} QR/s")
+    print(f"{'cached':>9}: {rate(qr_render.render_png, same):8.0f} QR/s")
+    print(f"{'variants':>9}: {rate(variants, payloads, clear=True):8.0f} havola/s")
+
+    matrix = qr_render.modules(payloads[0])
+    image = qr_render._make_qr(payloads[0]).make_image(fill_color="black", back_color="white")
+
+    def pil_encode(_):
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG')
+
+    print(f"PNG kodlash: PIL {rate(pil_encode, same):8.0f}/s, "
+          f"numpy {rate(lambda _: qr_render.encode_png(matrix), same):8.0f}/s")
+
+
+if __name__ == '__main__':
+    main()
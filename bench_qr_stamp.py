@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+QR qo'shish benchmark - 1, 10 va 100 sahifali hujjatga QR qo'shish kechikishi
+
+Telegram dan yuklab olingandan keyingi butun yo'l o'lchanadi: kirish faylini
+saqlash, QR rasm, QR qo'shish, natijani blob store ga joylash. Rejimlar:
+    disk    - eski usul: kirish fayli diskka, QR PNG QR_FOLDER ga, _with_qr
+              natija diskka, keyin ko'chirish
+    memory  - kirish va QR PNG xotirada (fitz.open(stream=...), BytesIO),
+              diskka faqat yakuniy natija blob store ichiga bir marta yoziladi
+
+QR qo'shish botdagidek conversion_pool orqali (1 worker) bajariladi, shuning
+uchun bytes ni jarayonlar orasida uzatish narxi ham o'lchovga kiradi.
+
+Ishlatish:
+    python bench_qr_stamp.py [--pages 1,10,100] [--repeat 10] [--formats pdf,docx]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+import fitz  # PyMuPDF
+import qrcode
+from docx import Document
+
+import documents
+from blob_store import BlobStore
+from conversion_pool import ConversionPool
+
+QR_URL = 'https://example.uz/files/00000000-0000-0000-0000-000000000000.pdf'
+
+
+def create_sample(fmt, pages):
+    """Build a sample PDF/DOCX with roughly the given page count; returns bytes"""
+    buffer = io.BytesIO()
+    if fmt == 'pdf':
+        doc = fitz.open()
+        for page_num in range(pages):
+            page = doc.new_page()
+            y = 60
+            for line in range(40):
+                page.insert_text((50, y), f"Sahifa {page_num + 1}, qator {line + 1}: hisob-faktura ma'lumotlari",
+                                 fontsize=10)
+                y += 18
+        doc.save(buffer)
+        doc.close()
+    else:
+        doc = Document()
+        for page_num in range(pages):
+            doc.add_heading(f"Sahifa {page_num + 1}", level=1)
+            for line in range(30):
+                doc.add_paragraph(f"Qator {line + 1}: hisob-faktura ma'lumotlari")
+            doc.add_page_break()
+        doc.save(buffer)
+    return buffer.getvalue()
+
+
+def qr_image():
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+    qr.add_data(QR_URL)
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white")
+
+
+def _quiet(func, *args):
+    """Run a documents function without its progress prints"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+async def stamp_disk(pool, store, tmp, fmt, data):
+    unique_id = str(uuid.uuid4())
+    original_path = os.path.join(tmp, f"{unique_id}_original.{fmt}")
+    output_path = os.path.join(tmp, f"{unique_id}_with_qr.{fmt}")
+    qr_path = os.path.join(tmp, f"{unique_id}.png")
+    with open(original_path, 'wb') as f:  # download_to_drive
+        f.write(data)
+    qr_image().save(qr_path)
+    stamp = documents.add_qr_to_pdf_document if fmt == 'pdf' else documents.add_qr_to_word_document
+    await pool.run(_quiet, stamp, original_path, qr_path, output_path)
+    store.put_file(output_path)
+    os.remove(original_path)
+    os.remove(qr_path)
+
+
+async def stamp_memory(pool, store, tmp, fmt, data):
+    output_path = os.path.join(store.tmp_dir, f"{uuid.uuid4()}_with_qr.{fmt}")
+    buffer = io.BytesIO()
+    qr_image().save(buffer, format='PNG')
+    stamp = documents.add_qr_to_pdf_document if fmt == 'pdf' else documents.add_qr_to_word_document
+    await pool.run(_quiet, stamp, data, buffer.getvalue(), output_path)
+    store.put_file(output_path)
+
+
+async def bench(fmt, pages, repeat, tmp):
+    data = create_sample(fmt, pages)
+    pool = ConversionPool(max_workers=1, max_tasks_per_child=1000, timeout=600)
+    store = BlobStore(os.path.join(tmp, 'blobs'))
+    await pool.run(time.sleep, 0)  # worker spawn vaqti o'lchovga kirmasin
+    results = {}
+    for mode, func in (('disk', stamp_disk), ('memory', stamp_memory)):
+        await func(pool, store, tmp, fmt, data)  # isitish
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await func(pool, store, tmp, fmt, data)
+            timings.append(time.perf_counter() - started)
+        results[mode] = statistics.median(timings)
+    pool.shutdown()
+
+    speedup = results['disk'] / results['memory'] if results['memory'] else 0
+    print(f"{fmt:>4} {pages:>4} sahifa ({len(data) / 1024:7.0f} KB): "
+          f"disk {results['disk'] * 1000:8.1f}ms | memory {results['memory'] * 1000:8.1f}ms | x{speedup:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', default='1,10,100')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--formats', default='pdf,docx')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats.split(','):
+            for pages in (int(p) for p in args.pages.split(',')):
+                asyncio.run(bench(fmt, pages, args.repeat, tmp))
+
+
+if __name__ == '__main__':
+    main()
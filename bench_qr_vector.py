@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Vektor QR benchmark - PNG (qrcode + PIL) va vektor QR ni solishtirish
+
+Har bir hujjat uchun ikki rejim o'lchanadi:
+    png     - qr_render.render_png: PNG rasm, hujjatga rasm sifatida
+    vector  - qr_render.qr_matrix: PDF da bitta path, Word da DrawingML shakl
+
+Ko'rsatiladi: QR tayyorlash vaqti, QR qo'shish vaqti (QR tayyorlash bilan
+birga) va natija fayl hajmining asl hujjatga nisbatan o'sishi.
+
+Ishlatish:
+    python bench_qr_vector.py [--pages 1,10,100] [--repeat 20] [--formats pdf,docx]
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+import documents
+import qr_render
+from bench_qr_stamp import create_sample
+
+QR_URL = 'https://example.uz/files/0a1b2c3d-0000-4000-8000-123456789abc.pdf'
+MODES = {'png': qr_render.render_png, 'vector': qr_render.qr_matrix}
+
+
+def median_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def bench(fmt, pages, repeat, tmp):
+    data = create_sample(fmt, pages)
+    stamp = documents.add_qr_to_pdf_document if fmt == 'pdf' else documents.add_qr_to_word_document
+    output_path = os.path.join(tmp, f"out.{fmt}")
+
+    def run(make_qr):
+        with contextlib.redirect_stdout(io.StringIO()):
+            stamp(data, make_qr(QR_URL), output_path)
+
+    line = [f"{fmt:>4} {pages:>4} sahifa:"]
+    for mode, make_qr in MODES.items():
+        run(make_qr)  # isitish
+        elapsed = median_time(lambda: run(make_qr), repeat)
+        growth = os.path.getsize(output_path) - len(data)
+        line.append(f"{mode} {elapsed * 1000:7.1f}ms +{growth / 1024:6.1f}KB")
+    print(' | '.join(line))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', default='1,10,100')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--formats', default='pdf,docx')
+    args = parser.parse_args()
+
+    for mode, make_qr in MODES.items():
+        # Kesh tozalanadi - QR har safar qaytadan hisoblanadi
+        elapsed = median_time(lambda: (qr_render.clear_cache(), make_qr(QR_URL)), args.repeat * 5)
+        print(f"QR tayyorlash ({mode}): {elapsed * 1000:.2f}ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats.split(','):
+            for pages in (int(p) for p in args.pages.split(',')):
+                bench(fmt, pages, args.repeat, tmp)
+
+
+if __name__ == '__main__':
+    main()
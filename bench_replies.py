@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Javoblar benchmark - bitta fayl yuklashning boshidan oxirigacha vaqti
+
+Soxta Bot API server har bir so'rovga --rtt-ms kechikish bilan javob
+beradi. Ikki oqim solishtiriladi (ikkalasi ham bir xil yuklab olish, blob
+store, DB va QR):
+    eski  - status reply_text, edit_text, havola reply_text va QR
+            reply_photo - har biri kutiladi
+    yangi - bot.handle_document: status fonda (StatusMessage), havola va QR
+            bitta reply_photo da
+Ko'rsatiladi: yuklash boshidan QR xabari yuborilguncha vaqt (median, p95)
+va bitta yuklashdagi Bot API so'rovlari.
+
+--flood-every N: har N-chi so'rovga 429 (retry_after 1s) qaytariladi -
+rate_limiter() ularni qayta yuboradi, yuklashlar xatosiz tugashi kerak.
+
+Bot moduli vaqtinchalik papkadagi DB va fayllar bilan import qilinadi.
+
+Ishlatish:
+    python bench_replies.py [--uploads 30] [--rtt-ms 0,60,150] [--flood-every 0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from aiohttp import web
+
+TOKEN = '123456:bench'
+USER_ID = 777
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+FILE_BYTES = os.urandom(64 * 1024)
+
+
+class FakeBotApi:
+    """Bot API methods used by an upload, each answered after rtt seconds"""
+
+    def __init__(self, rtt, flood_every=0):
+        self.rtt = rtt
+        self.flood_every = flood_every
+        self.requests = 0
+        self.floods = 0
+        self.message_id = 1000
+        self.port = None
+
+    async def start(self):
+        from bench_file_server import free_port
+
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.api)
+        app.router.add_get('/file/bot{token}/{path:.*}', self.download)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        self.port = free_port()
+        await web.TCPSite(self.runner, '127.0.0.1', self.port).start()
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def message(self, **fields):
+        self.message_id += 1
+        return {'message_id': self.message_id, 'date': int(time.time()),
+                'chat': {'id': USER_ID, 'type': 'private'}, 'from': BOT_USER, **fields}
+
+    async def api(self, request):
+        method = request.match_info['method']
+        await request.read()
+        await asyncio.sleep(self.rtt)
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': BOT_USER})
+        self.requests += 1
+        if self.flood_every and self.requests % self.flood_every == 0:
+            self.floods += 1
+            return web.json_response({'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                                      'parameters': {'retry_after': 1}}, status=429)
+        if method == 'getFile':
+            result = {'file_id': 'doc', 'file_unique_id': 'udoc', 'file_size': len(FILE_BYTES),
+                      'file_path': 'documents/file.pdf'}
+        elif method == 'sendPhoto':
+            result = self.message(photo=[{'file_id': 'qr', 'file_unique_id': 'uqr', 'width': 290, 'height': 290}])
+        else:
+            result = self.message(text='ok')
+        return web.json_response({'ok': True, 'result': result})
+
+    async def download(self, request):
+        await asyncio.sleep(self.rtt)
+        self.requests += 1
+        return web.Response(body=FILE_BYTES)
+
+
+def document_update(application, update_id):
+    data = {'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': int(time.time()),
+        'chat': {'id': USER_ID, 'type': 'private'},
+        'from': {'id': USER_ID, 'is_bot': False, 'first_name': 'user'},
+        'document': {'file_id': 'doc', 'file_unique_id': f'u{update_id}', 'file_name': 'hisobot.pdf',
+                     'file_size': len(FILE_BYTES)}}}
+    from telegram import Update
+
+    return Update.de_json(json.loads(json.dumps(data)), application.bot)
+
+
+async def legacy_upload(update, context):
+    """The upload handler before replies.py: every request awaited in turn"""
+    import uuid
+
+    import bot
+    import qr_render
+    from blob_store import download_to_store, store as blob_store
+    from database import adb
+
+    message = update.message
+    document = message.document
+    status_message = await message.reply_text("⏳ Fayl yuklanmoqda...")
+    file = await context.bot.get_file(document.file_id)
+    unique_filename = f"{uuid.uuid4()}.pdf"
+    blob, size = await download_to_store(file, blob_store)
+    await adb.add_alias(unique_filename, blob, size)
+    file_url = await bot.public_url(unique_filename)
+    await adb.add_file_record(user_id=USER_ID, file_name=document.file_name, file_path=blob_store.path_for(blob),
+                              file_url=file_url, file_type='pdf', file_size=document.file_size, blob=blob)
+    qr_png = qr_render.render_png(bot.qr_data(file_url))
+    await status_message.edit_text("✅ Fayl muvaffaqiyatly yuklandi!")
+    await message.reply_text(f"✅ <b>Faylingiz muvaffaqiyatli yuklandi!</b>\n\n🔗 {file_url}", parse_mode='HTML')
+    await message.reply_photo(photo=qr_png, caption="📱 QR-kodni skaner qiling\n🌐 Soliq.uz",
+                              reply_markup=bot.create_back_keyboard())
+
+
+async def measure(flow, rtt, uploads, flood_every):
+    from telegram.ext import Application, CallbackContext
+
+    import bot
+    from replies import drain, rate_limiter
+
+    api = FakeBotApi(rtt, flood_every)
+    await api.start()
+    base = f"http://127.0.0.1:{api.port}"
+    application = (Application.builder().token(TOKEN).base_url(f"{base}/bot").base_file_url(f"{base}/file/bot")
+                   .rate_limiter(rate_limiter()).build())
+    handler = legacy_upload if flow == 'eski' else bot.handle_document
+    timings = []
+    async with application:
+        for update_id in range(1, uploads + 1):
+            update = document_update(application, update_id)
+            context = CallbackContext.from_update(update, application)
+            started = time.perf_counter()
+            await handler(update, context)
+            timings.append(time.perf_counter() - started)
+            await drain()
+        total = api.requests
+    await api.stop()
+    timings.sort()
+    return {'p50': statistics.median(timings), 'p95': timings[int(len(timings) * 0.95)],
+            'requests': total / uploads, 'floods': api.floods}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploads', type=int, default=30)
+    parser.add_argument('--rtt-ms', default='0,60,150')
+    parser.add_argument('--flood-every', type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_replies_')
+    os.environ.update({
+        'TELEGRAM_BOT_TOKEN': TOKEN, 'ADMIN_TELEGRAM_ID': str(USER_ID), 'DB_WRITE_BEHIND': 'false',
+        'DB_FILE': os.path.join(workdir, 'bench.db'), 'DB_WRITE_JOURNAL_DIR': '',
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'), 'QR_FOLDER': os.path.join(workdir, 'qr_codes'),
+    })
+    os.chdir(workdir)
+
+    print(f"Fayl yuklash: {args.uploads} ta, {len(FILE_BYTES) // 1024} KB")
+    for rtt_ms in (float(r) for r in args.rtt_ms.split(',')):
+        for flow in ('eski', 'yangi'):
+            result = asyncio.run(measure(flow, rtt_ms / 1000, args.uploads, args.flood_every))
+            print(f"RTT {rtt_ms:5.0f}ms {flow:>6}: p50 {result['p50'] * 1000:7.1f}ms, "
+                  f"p95 {result['p95'] * 1000:7.1f}ms, so'rovlar {result['requests']:.1f}, 429 {result['floods']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Qisqa havola benchmark - QR versiyasi, chizish vaqti va skanerlanish
+
+Uch xil QR matni solishtiriladi:
+    uuid   - https://<domen>/files/<uuid4>.pdf (eski havola)
+    short  - https://<domen>/f/<CODE> kichik harfli domen bilan (byte rejim)
+    upper  - bot.qr_data: butunlay katta harfli qisqa havola (alphanumeric
+             rejim) - bot QR ichiga shuni yozadi
+
+Ko'rsatiladi: QR versiyasi va modullar soni, qr_render.render_png vaqti va
+skanerlanish foizi: QR rasm taxminan --sizes pikselgacha (+-10%)
+kichraytiriladi (chop etilgan 1 dyuymli QR ni telefon kamerasi
+ko'rgandek), biroz buriladi, xiralashtiriladi va OpenCV QRCodeDetector
+bilan o'qiladi.
+
+Ishlatish:
+    python bench_short_urls.py [--domain soliq-bot-production.up.railway.app] [--count 200]
+                               [--sizes 90,100,120,140]
+"""
+import argparse
+import io
+import random
+import secrets
+import statistics
+import string
+import time
+import uuid
+
+import cv2
+import numpy as np
+from PIL import Image, ImageFilter
+
+import qr_render
+
+
+def short_code(length=9):
+    """Random code like database.new_short_code (without opening the DB)"""
+    return ''.join(secrets.choice(string.digits + string.ascii_uppercase) for _ in range(length))
+
+
+def payloads(kind, domain, count):
+    for _ in range(count):
+        if kind == 'uuid':
+            yield f"https://{domain}/files/{uuid.uuid4()}.pdf"
+        elif kind == 'short':
+            yield f"https://{domain}/f/{short_code()}"
+        else:
+            yield f"https://{domain}/f/{short_code()}".upper()
+
+
+def scans(png, size, rng):
+    """Downscale the QR to about size pixels, tilt and blur it slightly and
+    try to decode it"""
+    size = rng.randint(int(size * 0.9), int(size * 1.1))
+    image = Image.open(io.BytesIO(png)).convert('L').resize((size, size), Image.BILINEAR)
+    image = image.rotate(rng.uniform(-3, 3), Image.BILINEAR, expand=True, fillcolor=255)
+    image = image.filter(ImageFilter.GaussianBlur(0.6))
+    gray = cv2.copyMakeBorder(np.asarray(image), 16, 16, 16, 16, cv2.BORDER_CONSTANT, value=255)
+    text, _, _ = cv2.QRCodeDetector().detectAndDecode(gray)
+    return bool(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--domain', default='soliq-bot-production.up.railway.app')
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--sizes', default='90,100,120,140')
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',')]
+
+    print(f"{'':>6} {'uzunlik':>8} {'versiya':>8} {'modul':>6} {'chizish':>9}  "
+          + '  '.join(f"{size}px" .rjust(6) for size in sizes))
+    for kind in ('uuid', 'short', 'upper'):
+        texts = list(payloads(kind, args.domain, args.count))
+        qr = qr_render._make_qr(texts[0])
+        timings, images = [], []
+        for text in texts:
+            started = time.perf_counter()
+            images.append(qr_render.render_png(text))
+            timings.append(time.perf_counter() - started)
+        rng = random.Random(0)
+        rates = [sum(scans(png, size, rng) for png in images) / len(images) for size in sizes]
+        print(f"{kind:>6} {len(texts[0]):>8} {qr.version:>8} {qr.modules_count:>6} "
+              f"{statistics.mean(timings) * 1000:7.2f}ms  " + '  '.join(f"{rate:6.0%}" for rate in rates))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Polling va webhook benchmark - update dan handler gacha kechikish va fayl tezligi
+
+Soxta Bot API server alohida thread da (o'z event loop ida) ishlaydi va
+Telegram rolini o'ynaydi:
+    polling - update getUpdates long-poll javobida beriladi
+    webhook - update web_server ga POST qilinadi (secret token bilan)
+Ikkala rejimda ham bot ChatOrderedUpdateProcessor bilan ishlaydi; handler
+update kelgan vaqtni qayd qiladi. Update lar turli chat lardan --interval-ms
+oralig'ida yuboriladi; --rtt-ms bot va Telegram orasidagi tarmoq kechikishini
+taqlid qiladi (polling da har getUpdates so'rovi va javobi, webhook da POST).
+
+So'ng fayl yuklab olish tezligi bench_file_server orqali o'lchanadi:
+polling rejimi fayllari (Flask dev / gunicorn) va webhook rejimidagi
+aiohttp server.
+
+Ishlatish:
+    python bench_webhook.py [--updates 500] [--interval-ms 2] [--rtt-ms 0,60]
+                            [--file-modes dev,gunicorn,aiohttp]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+
+import aiohttp
+from aiohttp import web
+from telegram.ext import Application, MessageHandler, filters
+
+import web_server
+from bench_file_server import free_port, load, start_server
+from update_processor import ChatOrderedUpdateProcessor
+
+TOKEN = '123456:bench'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+
+
+class FakeTelegram:
+    """Minimal Bot API: getMe, webhook methods, long-polled getUpdates"""
+
+    def __init__(self, rtt=0.0):
+        self.port = free_port()
+        self.one_way = rtt / 2
+        self.loop = asyncio.new_event_loop()
+        self.pending = []
+        self.arrived = None
+        self.webhook_url = None
+        self.session = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._setup())
+        self._ready.set()
+        self.loop.run_forever()
+
+    async def _setup(self):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.api)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', self.port).start()
+        self.arrived = asyncio.Event()
+        self.session = aiohttp.ClientSession()
+
+    async def api(self, request):
+        method = request.match_info['method']
+        params = dict(await request.post()) if request.content_type != 'application/json' else await request.json()
+        if method == 'getMe':
+            result = BOT_USER
+        elif method == 'getUpdates':
+            # So'rov Telegram ga yetib borguncha kelgan update lar keyingi javobni kutadi
+            await asyncio.sleep(self.one_way)
+            result = await self.get_updates(int(params.get('offset') or 0), float(params.get('timeout') or 0))
+            await asyncio.sleep(self.one_way)
+        elif method == 'setWebhook':
+            self.webhook_url = params.get('url')
+            result = True
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def get_updates(self, offset, timeout):
+        self.pending = [u for u in self.pending if u['update_id'] >= offset]
+        if not self.pending and timeout:
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(self.arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.pending[:100]
+
+    def deliver(self, update, mode, secret):
+        """Hand an update to the bot from the fake Telegram's own loop"""
+        async def send():
+            if mode == 'polling':
+                self.pending.append(update)
+                self.arrived.set()
+            else:
+                await asyncio.sleep(self.one_way)
+                headers = {web_server.SECRET_HEADER: secret}
+                async with self.session.post(self.webhook_url, json=update, headers=headers) as response:
+                    response.raise_for_status()
+        asyncio.run_coroutine_threadsafe(send(), self.loop)
+
+
+def make_update(update_id):
+    chat_id = 1000 + update_id % 50
+    return {'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': int(time.time()), 'text': 'ping',
+        'chat': {'id': chat_id, 'type': 'private'},
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': 'user'}}}
+
+
+async def measure(mode, telegram, updates, interval):
+    sent = {}
+    latency = []
+    done = asyncio.Event()
+
+    async def handler(update, context):
+        latency.append(time.perf_counter() - sent[update.update_id])
+        if len(latency) == updates:
+            done.set()
+
+    application = (Application.builder().token(TOKEN).base_url(f"http://127.0.0.1:{telegram.port}/bot")
+                   .concurrent_updates(ChatOrderedUpdateProcessor()).build())
+    application.add_handler(MessageHandler(filters.TEXT, handler))
+    runner = None
+    async with application:
+        await application.start()
+        if mode == 'polling':
+            await application.updater.start_polling(poll_interval=0, timeout=10)
+        else:
+            runner = web.AppRunner(web_server.create_app(application), access_log=None)
+            await runner.setup()
+            port = free_port()
+            await web.TCPSite(runner, '127.0.0.1', port).start()
+            await application.bot.set_webhook(f"http://127.0.0.1:{port}{web_server.WEBHOOK_PATH}",
+                                              secret_token=web_server.webhook_secret(TOKEN))
+        await asyncio.sleep(0.5)
+
+        for update_id in range(1, updates + 1):
+            sent[update_id] = time.perf_counter()
+            telegram.deliver(make_update(update_id), mode, web_server.webhook_secret(TOKEN))
+            await asyncio.sleep(interval)
+        await asyncio.wait_for(done.wait(), 60)
+
+        if mode == 'polling':
+            await application.updater.stop()
+        if runner is not None:
+            await runner.cleanup()
+        await application.stop()
+    latency.sort()
+    return statistics.median(latency), latency[int(len(latency) * 0.95)], latency[-1]
+
+
+def file_throughput(modes, clients, requests, size_kb):
+    with tempfile.TemporaryDirectory() as upload_dir:
+        filename = f"{uuid.uuid4()}.pdf"
+        with open(os.path.join(upload_dir, filename), 'wb') as f:
+            f.write(os.urandom(size_kb * 1024))
+        for mode in modes:
+            process, port = start_server(mode, upload_dir, workers=4)
+            url = f"http://127.0.0.1:{port}/files/{filename}"
+            try:
+                urllib.request.urlopen(url).read()
+                result = asyncio.run(load(url, clients, requests, {}))
+                mb_per_sec = result['rps'] * size_kb / 1024
+                print(f"{mode:>8}: {result['rps']:7.0f} req/s, {mb_per_sec:7.1f} MB/s, "
+                      f"p50 {result['p50'] * 1000:7.1f}ms, xatolar {result['errors']}")
+            finally:
+                process.terminate()
+                process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=500)
+    parser.add_argument('--interval-ms', type=float, default=2)
+    parser.add_argument('--rtt-ms', default='0,60')
+    parser.add_argument('--file-modes', default='dev,gunicorn,aiohttp')
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--size-kb', type=int, default=512)
+    args = parser.parse_args()
+
+    print(f"Update -> handler kechikishi ({args.updates} update, {args.interval_ms}ms oraliq)")
+    for rtt_ms in (float(r) for r in args.rtt_ms.split(',')):
+        telegram = FakeTelegram(rtt_ms / 1000)
+        telegram.start()
+        for mode in ('polling', 'webhook'):
+            p50, p95, worst = asyncio.run(measure(mode, telegram, args.updates, args.interval_ms / 1000))
+            print(f"RTT {rtt_ms:3.0f}ms {mode:>8}: p50 {p50 * 1000:6.1f}ms, p95 {p95 * 1000:6.1f}ms, "
+                  f"maks {worst * 1000:6.1f}ms")
+
+    if args.file_modes:
+        print(f"Fayl yuklab olish ({args.size_kb} KB, {args.clients} mijoz)")
+        file_throughput(args.file_modes.split(','), args.clients, args.requests, args.size_kb)
+
+
+if __name__ == '__main__':
+    main()
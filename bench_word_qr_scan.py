@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Word QR qidirish benchmark - 300 jadvalli shartnomada eski QR ni topish
+
+Hujjatda N ta jadval (birinchi qatori birlashtirilgan kataklar), oxirgi
+paragrafda va header da avval qo'yilgan QR bor. Rejimlar:
+    legacy  - eski usul: doc.paragraphs va har jadvalning
+              rows -> cells -> paragraphs -> runs bo'ylab har run uchun xpath
+    xpath   - qr_detect.find_word_qr_drawings: har story part uchun bitta
+              kompilyatsiya qilingan XPath
+
+Ishlatish:
+    python bench_word_qr_scan.py [--tables 300] [--rows 12] [--cols 5] [--repeat 5]
+"""
+import argparse
+import io
+import statistics
+import time
+
+from docx import Document
+from docx.shared import Inches
+
+import qr_detect
+import qr_render
+
+QR_URL = 'https://example.uz/files/0a1b2c3d-0000-4000-8000-123456789abc.docx'
+
+
+def create_contract(tables, rows, cols):
+    """Build a table-heavy DOCX with legacy 1x1 inch QR pictures; returns bytes"""
+    doc = Document()
+    png = qr_render.render_png(QR_URL)
+    for table_num in range(tables):
+        doc.add_paragraph(f"{table_num + 1}-bo'lim: shartnoma shartlari")
+        table = doc.add_table(rows=rows, cols=cols)
+        table.cell(0, 0).merge(table.cell(0, cols - 1)).text = f"Jadval {table_num + 1}"
+        for row in range(1, rows):
+            for col in range(cols):
+                table.cell(row, col).text = f"{row}.{col}"
+    doc.add_paragraph('\t').add_run().add_picture(io.BytesIO(png), width=Inches(1), height=Inches(1))
+    doc.sections[0].header.paragraphs[0].add_run().add_picture(io.BytesIO(png), width=Inches(1), height=Inches(1))
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def legacy_scan(doc):
+    """The old loops, returning the matching runs instead of clearing them"""
+    found = []
+    for paragraph in doc.paragraphs:
+        for run in paragraph.runs:
+            if run._element.xpath('.//a:blip'):
+                found.append(run)
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                for paragraph in cell.paragraphs:
+                    for run in paragraph.runs:
+                        if run._element.xpath('.//a:blip'):
+                            found.append(run)
+    return found
+
+
+def measure(func, data, repeat):
+    timings = []
+    found = 0
+    for _ in range(repeat):
+        doc = Document(io.BytesIO(data))
+        started = time.perf_counter()
+        found = len(func(doc))
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tables', type=int, default=300)
+    parser.add_argument('--rows', type=int, default=12)
+    parser.add_argument('--cols', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = create_contract(args.tables, args.rows, args.cols)
+    print(f"{args.tables} jadval ({args.rows}x{args.cols}), {len(data) / 1024:.0f} KB")
+    for label, func in (('legacy', legacy_scan), ('xpath', qr_detect.find_word_qr_drawings)):
+        elapsed, found = measure(func, data, args.repeat)
+        print(f"{label:>7}: {elapsed * 1000:9.1f}ms, topildi {found}")
+
+
+if __name__ == '__main__':
+    main()
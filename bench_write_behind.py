@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Write-behind benchmark - yuklashlar to'lqinida fayl yozuvlari tezligi (insert/s)
+
+Bir nechta thread bir vaqtda add_file_record + add_or_update_user chaqiradi.
+Rejimlar:
+    per-call     - eski kod: har chaqiruvda yangi ulanish va commit
+    direct       - pooled WAL ulanish, har yozuvda commit
+    write-behind - navbat + batched tranzaksiya
+    wb+fsync     - write-behind + har yozuvda fsync qilinadigan journal
+
+Ishlatish:
+    python bench_write_behind.py [--rows 4000] [--threads 8]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import database
+
+
+def legacy_write(db_file, i):
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO users (user_id, username, full_name)
+        VALUES (?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            username = excluded.username,
+            full_name = excluded.full_name
+    ''', (i % 200, f"user{i % 200}", f"User {i % 200}"))
+    conn.commit()
+    conn.close()
+
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO files (user_id, file_name, file_path, file_url, file_type, file_size, service_used)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (i % 200, f"file{i}.pdf", f"uploads/{i}.pdf", f"http://x/files/{i}.pdf", 'pdf', 1000, 'file_upload'))
+    conn.commit()
+    conn.close()
+
+
+def pooled_write(db_file, i):
+    database.add_or_update_user(i % 200, f"user{i % 200}", f"User {i % 200}")
+    database.add_file_record(i % 200, f"file{i}.pdf", f"uploads/{i}.pdf", f"http://x/files/{i}.pdf", 'pdf', 1000)
+
+
+def run(label, func, db_file, rows, threads):
+    per_thread = rows // threads
+
+    def worker(offset):
+        for i in range(offset, offset + per_thread):
+            func(db_file, i)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    database.stop_write_behind()  # qolgan yozuvlar ham o'lchovga kiradi
+    elapsed = time.perf_counter() - started
+
+    conn = sqlite3.connect(db_file)
+    stored = conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
+    conn.close()
+    print(f"{label:>12}: {per_thread * threads / elapsed:9.0f} insert/s  ({stored} qator, {elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=4000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = (
+            ('per-call', legacy_write, None, None),
+            ('direct', pooled_write, None, None),
+            ('write-behind', pooled_write, '', False),
+            ('wb+fsync', pooled_write, os.path.join(tmp, 'journal'), True),
+        )
+        for label, func, journal_dir, fsync in modes:
+            database.DB_FILE = os.path.join(tmp, f"{label}.db")
+            database.init_database()
+            database.close_connections()
+            if label == 'per-call':
+                conn = sqlite3.connect(database.DB_FILE)
+                conn.execute('PRAGMA journal_mode=DELETE')
+                conn.close()
+            if journal_dir is not None:
+                database.DB_WRITE_JOURNAL_DIR = journal_dir
+                database.DB_JOURNAL_FSYNC = fsync
+                database.start_write_behind()
+            run(label, func, database.DB_FILE, args.rows, args.threads)
+            database.close_connections()
+
+
+if __name__ == '__main__':
+    main()
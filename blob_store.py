@@ -0,0 +1,234 @@
+"""
+Content-addressed blob store - bir xil fayl diskda faqat bir marta saqlanadi
+
+Har bir fayl SHA-256 bo'yicha BLOB_FOLDER/ab/cd/<sha256> yo'lida saqlanadi.
+Hash yuklab olish paytida, yozilayotgan baytlardan hisoblanadi (faylni
+qayta o'qish shart emas). Agar shu hashli blob allaqachon bor bo'lsa,
+yangi nusxa o'chiriladi.
+
+Ommaviy /files/<uuid>.<ext> havolalari aliases jadvali orqali blob'ga
+bog'lanadi (database.add_alias / resolve_alias).
+
+Lokal Bot API serverida (LOCAL_BOT_API_URL) get_file diskdagi yo'lni
+beradi: fayl yuklab olinmaydi - blob store ga hard link qilinadi (boshqa
+FS da copy_file_range bilan yadro ichida nusxalanadi), hash esa bo'laklab
+o'qiladi. Katta fayl hech qachon to'liq xotiraga o'qilmaydi.
+"""
+import asyncio
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from config import BLOB_FOLDER, BLOB_GC_GRACE_SECONDS
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobWriter:
+    """File-like sink that hashes bytes while writing them to a temp file.
+
+    Pass it to telegram.File.download_to_memory(out=...), then commit().
+    """
+
+    def __init__(self, store: 'BlobStore'):
+        self.store = store
+        self.size = 0
+        self._hash = hashlib.sha256()
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.tmp_dir)
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, data) -> int:
+        self._hash.update(data)
+        self._file.write(data)
+        self.size += len(data)
+        return len(data)
+
+    def commit(self):
+        """Move the temp file into place; returns (sha256, size)"""
+        self._file.close()
+        sha256 = self._hash.hexdigest()
+        self.store._install(self._tmp_path, sha256)
+        return sha256, self.size
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.discard()
+
+
+class BlobStore:
+    """Sharded sha256 -> file mapping on the local filesystem"""
+
+    def __init__(self, root: str = BLOB_FOLDER):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path_for(sha256))
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter(self)
+
+    def _install(self, tmp_path: str, sha256: str):
+        """Link tmp_path in as the blob, or drop it if the blob already exists"""
+        target = self.path_for(sha256)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            # link() atomik va mavjud faylni bosib yozmaydi - parallel
+            # yuklashlar bir xil blob'ni ikki marta yozmaydi
+            os.link(tmp_path, target)
+        except FileExistsError:
+            # Yangilangan mtime - GC bu blob'ni hozir havola olinayotganini biladi
+            os.utime(target)
+        except OSError:
+            # Hard link qo'llab-quvvatlanmaydigan FS
+            if not os.path.exists(target):
+                os.replace(tmp_path, target)
+                return
+        os.remove(tmp_path)
+
+    def put_file(self, path: str, move: bool = True):
+        """Hash an existing file and store it; returns (sha256, size).
+
+        With move=True the file is linked into place (no copy) and removed.
+        """
+        if move:
+            sha256, size = hash_file(path), os.path.getsize(path)
+            self._install(path, sha256)
+            return sha256, size
+        with self.writer() as writer:
+            with open(path, 'rb') as source:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    writer.write(chunk)
+            return writer.commit()
+
+    def put_local(self, path: str):
+        """Store a file owned by someone else (the local Bot API server)
+        without reading it into memory; returns (sha256, size).
+
+        The file is hard-linked (copied on another filesystem) and hashed in
+        chunks; the original is left in place.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        os.close(fd)
+        os.remove(tmp_path)
+        try:
+            link_or_copy(path, tmp_path)
+            sha256, size = hash_file(tmp_path), os.path.getsize(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._install(tmp_path, sha256)
+        return sha256, size
+
+    def put_bytes(self, data: bytes):
+        """Store an in-memory payload; returns (sha256, size)"""
+        with self.writer() as writer:
+            writer.write(data)
+            return writer.commit()
+
+    def delete_unused(self, sha256: str, grace: float = BLOB_GC_GRACE_SECONDS) -> bool:
+        """Remove an unreferenced blob unless it was stored within grace
+        seconds; returns True when the file is gone"""
+        path = self.path_for(sha256)
+        try:
+            if time.time() - os.stat(path).st_mtime < grace:
+                return False
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def delete(self, sha256: str):
+        try:
+            os.remove(self.path_for(sha256))
+        except FileNotFoundError:
+            pass
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def copy_file(source: str, target: str):
+    """Copy source to target inside the kernel: copy_file_range (a reflink
+    or server-side copy where the filesystem supports it), else sendfile"""
+    if hasattr(os, 'copy_file_range'):
+        with open(source, 'rb') as src, open(target, 'wb') as dst:
+            try:
+                while os.copy_file_range(src.fileno(), dst.fileno(), 1 << 30):
+                    pass
+                return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+    # Eski yadro yoki qo'llab-quvvatlanmaydigan FS
+    shutil.copyfile(source, target)
+
+
+def link_or_copy(source: str, target: str):
+    """Hard-link source at target, or copy it when linking is not possible"""
+    try:
+        os.link(source, target)
+    except OSError as e:
+        # Boshqa FS (EXDEV) yoki begona fayl (protected_hardlinks - EPERM)
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EACCES, errno.EMLINK, errno.EOPNOTSUPP):
+            raise
+        copy_file(source, target)
+
+
+def hash_source(source) -> str:
+    """SHA-256 of in-memory bytes or of the file at a path"""
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    return hash_file(source)
+
+
+def local_path(tg_file):
+    """Path of a file given by a local Bot API server (local_mode), else None"""
+    if tg_file.get_bot().local_mode and tg_file.file_path and os.path.isabs(tg_file.file_path):
+        return tg_file.file_path
+    return None
+
+
+async def download_to_store(tg_file, store: 'BlobStore'):
+    """Download a telegram.File straight into the store; returns (sha256, size)"""
+    path = local_path(tg_file)
+    if path is not None:
+        return await asyncio.to_thread(store.put_local, path)
+    with store.writer() as writer:
+        await tg_file.download_to_memory(out=writer)
+        return writer.commit()
+
+
+async def download_to_path(tg_file, path: str):
+    """Download a telegram.File to path: a private copy of a local Bot API
+    file (it may be changed in place), or an HTTP download"""
+    source = local_path(tg_file)
+    if source is not None:
+        await asyncio.to_thread(copy_file, source, path)
+    else:
+        await tg_file.download_to_drive(path)
+
+
+store = BlobStore()
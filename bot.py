@@ -1,30 +1,41 @@
 import os
+import html
+import shutil
+import tempfile
 import uuid
-import qrcode
 import io
 import logging
-import subprocess
-import fitz  # PyMuPDF
-from pdf2docx import Converter
-from docx import Document
-from docx.shared import Inches, Pt
+import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
 from telegram.error import BadRequest, Conflict
-from functools import wraps
+from contextlib import contextmanager
+from functools import cache, wraps
+from pathlib import Path
+from concurrent.futures.process import BrokenProcessPool
+
+import documents
+import parallel_pdf
+import qr_render
+from conversion_pool import run_conversion, ConversionTimeout, pool as conversion_pool
+from libreoffice import LibreOfficeCrashed, LibreOfficeError, pool as libreoffice_pool
+from blob_store import (
+    store as blob_store, download_to_store, download_to_path, hash_file, hash_source, link_or_copy, local_path
+)
+from update_processor import ChatOrderedUpdateProcessor
+from replies import StatusMessage, drain as drain_replies, rate_limiter
 
 # Import configuration
 from config import (
     TELEGRAM_BOT_TOKEN, ADMIN_TELEGRAM_ID, MAX_FILE_SIZE,
     UPLOAD_FOLDER, QR_FOLDER, ALLOWED_EXTENSIONS, 
-    RAILWAY_URL, REPLIT_URL
+    RAILWAY_URL, REPLIT_URL, DB_WRITE_BEHIND, PIPELINE_SPILL_BYTES, QR_VECTOR,
+    JOB_QUEUE, JOB_MAX_ATTEMPTS, SHORT_URLS, PORT, BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, LOCAL_BOT_API_URL
 )
 
-# Import database functions
+# Import database functions (awaitable facade, runs off the event loop)
 from database import (
-    add_or_update_user, is_user_allowed, set_user_permission,
-    get_all_users, add_file_record, get_all_files, get_stats,
-    is_admin, add_admin, remove_admin, get_all_admins
+    adb, peek_user_access, close_connections, start_write_behind, stop_write_behind, CachedResult
 )
 
 logging.basicConfig(
@@ -39,6 +50,138 @@ os.makedirs(QR_FOLDER, exist_ok=True)
 
 # Admin ID from config (for backward compatibility)
 ADMIN_ID = ADMIN_TELEGRAM_ID
+MAX_FILE_SIZE_MB = MAX_FILE_SIZE // (1024 * 1024)
+
+def bot_api_settings() -> dict:
+    """Bot keyword arguments for a local telegram-bot-api server (empty for the cloud API)"""
+    if not LOCAL_BOT_API_URL:
+        return {}
+    return {
+        'base_url': f"{LOCAL_BOT_API_URL}/bot",
+        'base_file_url': f"{LOCAL_BOT_API_URL}/file/bot",
+        'local_mode': True,
+    }
+
+async def publish_file(path: str, public_name: str):
+    """Move a finished file into the blob store behind /files/<public_name>.
+
+    Returns (blob path, sha256, size); identical content is stored once.
+    """
+    sha256, size = await asyncio.to_thread(blob_store.put_file, path)
+    await adb.add_alias(public_name, sha256, size)
+    return blob_store.path_for(sha256), sha256, size
+
+async def download_source(tg_file, file_size, spill_path: str):
+    """Download an input document into memory, or to spill_path when it is
+    larger than PIPELINE_SPILL_BYTES. Returns the bytes or the path."""
+    if file_size is not None and file_size <= PIPELINE_SPILL_BYTES:
+        path = local_path(tg_file)
+        if path is not None:
+            return await asyncio.to_thread(Path(path).read_bytes)
+        buffer = io.BytesIO()
+        await tg_file.download_to_memory(out=buffer)
+        return buffer.getvalue()
+    await download_to_path(tg_file, spill_path)
+    return spill_path
+
+@contextmanager
+def upload_source(path: str, filename: str):
+    """Document to send for the file at path under filename.
+
+    The cloud API gets the open file. A local Bot API server reads the file
+    from disk itself, so it gets a hard link named filename instead: large
+    results are not read into memory and uploaded over HTTP.
+    """
+    if not LOCAL_BOT_API_URL:
+        with open(path, 'rb') as source:
+            yield source
+        return
+    directory = tempfile.mkdtemp(dir=blob_store.tmp_dir)
+    try:
+        link = os.path.join(directory, os.path.basename(filename.replace('\\', '/')) or 'file')
+        link_or_copy(path, link)
+        yield Path(link)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+async def public_url(public_name: str) -> str:
+    """Download link for a public file name: /f/<code>, or /files/<name>
+    with SHORT_URLS off"""
+    if SHORT_URLS:
+        return f"{get_base_url()}/f/{await adb.short_code(public_name)}"
+    return f"{get_base_url()}/files/{public_name}"
+
+def qr_data(url: str) -> str:
+    """QR payload for a link. Short links are case-insensitive, so they are
+    upper-cased: the QR then uses alphanumeric mode and a smaller version."""
+    if '/f/' in url:
+        return url.upper()
+    return url
+
+def make_stamp_qr(url: str):
+    """QR for stamping into a document: vector module matrix, or PNG bytes
+    when QR_VECTOR is off"""
+    if QR_VECTOR:
+        return qr_render.qr_matrix(qr_data(url))
+    return qr_render.render_png(qr_data(url))
+
+# Bump an operation's version when its output changes, so results cached
+# by an older version are not sent again
+RESULT_VERSIONS = {'pdf_to_word': 1, 'word_to_pdf': 1, 'qr_to_word': 1, 'qr_to_pdf': 1, 'qr_to_office': 1}
+
+def result_options(operation: str) -> str:
+    """Options part of the result cache key"""
+    options = f"v{RESULT_VERSIONS[operation]}"
+    if operation.startswith('qr_'):
+        # QR ichidagi havola bazaviy URL ga, ko'rinishi esa QR_VECTOR ga bog'liq
+        options += f"|{get_base_url()}|{'vector' if QR_VECTOR else 'png'}{'|short' if SHORT_URLS else ''}"
+    return options
+
+async def reply_from_result_cache(message, user, source_keys, operation, status_message, reply_markup,
+                                  count_miss=True) -> bool:
+    """Answer with an already produced result: no download, processing or upload"""
+    options = result_options(operation)
+    cached = await adb.get_cached_result(source_keys, operation, options, count_miss)
+    if cached is None or not cached.tg_file_id:
+        return False
+    
+    try:
+        await message.reply_document(
+            document=cached.tg_file_id,
+            caption=cached.caption,
+            reply_markup=reply_markup
+        )
+    except BadRequest as e:
+        logger.warning(f"Keshdagi file_id ishlamadi ({operation}): {e}")
+        await adb.forget_cached_result(source_keys, operation, options)
+        return False
+    
+    await status_message.edit_text("✅ Tayyor natija yuborildi!")
+    try:
+        await adb.add_file_record(
+            user_id=user.id,
+            file_name=cached.file_name,
+            file_path=blob_store.path_for(cached.sha256),
+            file_url=await public_url(cached.public_name),
+            file_type=os.path.splitext(cached.public_name)[1].lstrip('.'),
+            file_size=cached.size,
+            service_used=operation,
+            blob=cached.sha256
+        )
+    except Exception as e:
+        logger.error(f"Failed to save cached {operation} record: {e}")
+    return True
+
+async def remember_result(source_keys, operation, sent_message, blob, public_name, file_name, caption, size):
+    """Cache a freshly sent result under the source document's keys"""
+    try:
+        sent_document = sent_message.document if sent_message else None
+        result = CachedResult(blob, public_name, file_name,
+                              sent_document.file_id if sent_document else None, caption, size)
+        await adb.save_cached_result(source_keys, operation, result_options(operation), result,
+                                     remove_blob=blob_store.delete_unused)
+    except Exception as e:
+        logger.error(f"Natijani keshga saqlashda xato ({operation}): {e}")
 
 # Note: is_admin() function is now imported from database module
 # This allows multiple admins to be managed through the database
@@ -50,17 +193,20 @@ def require_permission(func):
         user = update.effective_user
         user_id = user.id
         
-        # Save/update user in database
+        # Save/update user in database (cached - no disk I/O unless changed)
         username = user.username or "No username"
         full_name = user.full_name or "No name"
-        add_or_update_user(user_id, username, full_name)
+        access = peek_user_access(user_id, username, full_name)
+        if access is None:
+            access = await adb.get_user_access(user_id, username, full_name)
+        allowed, admin = access
         
         # Admin always has access
-        if is_admin(user_id):
+        if admin:
             return await func(update, context, *args, **kwargs)
         
         # Check if user is allowed
-        if not is_user_allowed(user_id):
+        if not allowed:
             await update.effective_message.reply_text(
                 "❌ <b>Ruxsat yo'q!</b>\n\n"
                 "Botdan foydalanish uchun admin ruxsati kerak.\n"
@@ -72,6 +218,9 @@ def require_permission(func):
         return await func(update, context, *args, **kwargs)
     return wrapper
 
+# Muhit ish davomida o'zgarmaydi: URL bir marta aniqlanadi, DEBUG satrlari
+# har bir havola va result_options() da qayta chiqmaydi
+@cache
 def get_base_url():
     """Get the base URL for file hosting"""
     # Railway da to'g'ridan-to'g'ri URL ni qaytarish
@@ -103,7 +252,8 @@ def create_main_keyboard():
         [InlineKeyboardButton("📤 Fayl yuborish", callback_data='upload')],
         [InlineKeyboardButton("🔄 PDF ↔ Word", callback_data='convert_menu')],
         [InlineKeyboardButton("📋 Word faylga QR qo'shish", callback_data='add_qr_to_word')],
-        [InlineKeyboardButton("📄 PDF faylga QR qo'shish", callback_data='add_qr_to_pdf')]
+        [InlineKeyboardButton("📄 PDF faylga QR qo'shish", callback_data='add_qr_to_pdf')],
+        [InlineKeyboardButton("📊 Excel/PowerPoint faylga QR qo'shish", callback_data='add_qr_to_office')]
     ]
     return InlineKeyboardMarkup(keyboard)
 
@@ -126,7 +276,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     
     # Show admin badge for admin
-    title = "🔱 <b>Admin Panel - Soliq.uz QR Fayl Bot</b>" if is_admin(user.id) else "🌟 <b>Soliq.uz QR Fayl Bot</b>"
+    title = "🔱 <b>Admin Panel - Soliq.uz QR Fayl Bot</b>" if await adb.is_admin(user.id) else "🌟 <b>Soliq.uz QR Fayl Bot</b>"
     
     welcome_text = (
         f"{title}\n\n"
@@ -136,7 +286,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "✅ QR-kodni skaner qilib faylni ochishingiz mumkin\n\n"
     )
     
-    if is_admin(user.id):
+    if await adb.is_admin(user.id):
         welcome_text += "👑 Admin: /admin - Admin panelni ochish\n\n"
     
     welcome_text += "Quyidagi tugmalardan birini tanlang:"
@@ -167,7 +317,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "🖼 Rasmlar: JPG, PNG, GIF, BMP\n"
             "📦 Arxivlar: ZIP, RAR, 7Z\n"
             "📊 Taqdimotlar: PPTX, PPT\n\n"
-            "⚠️ Maksimal hajm: 20MB"
+            f"⚠️ Maksimal hajm: {MAX_FILE_SIZE_MB}MB"
         )
         keyboard = create_back_keyboard()
     elif query.data == 'convert_menu':
@@ -178,7 +328,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "PDF faylni DOCX formatiga o'zgartirish\n\n"
             "📝 <b>Word → PDF</b>\n"
             "DOCX faylni PDF formatiga o'zgartirish\n\n"
-            "⚠️ Maksimal hajm: 20MB"
+            f"⚠️ Maksimal hajm: {MAX_FILE_SIZE_MB}MB"
         )
         keyboard = create_convert_keyboard()
     elif query.data == 'pdf_to_word':
@@ -187,7 +337,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "📄 <b>PDF → Word</b>\n\n"
             "Iltimos PDF faylni yuboring.\n"
             "Fayl DOCX formatiga o'zgartiriladi.\n\n"
-            "⚠️ Maksimal hajm: 20MB"
+            f"⚠️ Maksimal hajm: {MAX_FILE_SIZE_MB}MB"
         )
         keyboard = create_convert_keyboard()
     elif query.data == 'word_to_pdf':
@@ -196,7 +346,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "📝 <b>Word → PDF</b>\n\n"
             "Iltimos DOCX yoki DOC faylni yuboring.\n"
             "Fayl PDF formatiga o'zgartiriladi.\n\n"
-            "⚠️ Maksimal hajm: 20MB"
+            f"⚠️ Maksimal hajm: {MAX_FILE_SIZE_MB}MB"
         )
         keyboard = create_convert_keyboard()
     elif query.data == 'add_qr_to_word':
@@ -206,7 +356,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Iltimos DOCX yoki DOC faylni yuboring.\n"
             "Fayl ichiga QR kod qo'shiladi va qaytariladi.\n\n"
             "📱 QR kodni skanerlash orqali faylga kirish mumkin!\n\n"
-            "⚠️ Maksimal hajm: 20MB"
+            f"⚠️ Maksimal hajm: {MAX_FILE_SIZE_MB}MB"
         )
         keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Orqaga", callback_data='back_to_main')]])
     elif query.data == 'add_qr_to_pdf':
@@ -216,7 +366,17 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Iltimos PDF faylni yuboring.\n"
             "Fayl ichiga QR kod qo'shiladi va qaytariladi.\n\n"
             "📱 QR kodni skanerlash orqali faylga kirish mumkin!\n\n"
-            "⚠️ Maksimal hajm: 20MB"
+            f"⚠️ Maksimal hajm: {MAX_FILE_SIZE_MB}MB"
+        )
+        keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Orqaga", callback_data='back_to_main')]])
+    elif query.data == 'add_qr_to_office':
+        context.user_data['convert_mode'] = 'add_qr_to_office'
+        text = (
+            "📊 <b>Excel/PowerPoint faylga QR kod qo'shish</b>\n\n"
+            "Iltimos XLSX yoki PPTX faylni yuboring.\n"
+            "Excel da QR birinchi varaqqa, PowerPoint da oxirgi slaydga qo'shiladi.\n\n"
+            "📱 QR kodni skanerlash orqali faylga kirish mumkin!\n\n"
+            f"⚠️ Maksimal hajm: {MAX_FILE_SIZE_MB}MB"
         )
         keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Orqaga", callback_data='back_to_main')]])
     elif query.data == 'back_to_main':
@@ -257,227 +417,120 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         else:
             logger.error(f"Tugma bosilishida xatolik: {e}")
 
-async def convert_pdf_to_word(pdf_path, docx_path):
-    """Convert PDF to Word using pdf2docx"""
+async def convert_pdf_to_word(pdf_path, docx_path, progress=None, raise_transient=False):
+    """Convert PDF to Word using pdf2docx in the conversion pool; large PDFs
+    are split into page ranges converted in parallel.
+
+    With raise_transient=True a timeout or crashed pool worker (and in
+    convert_word_to_pdf LibreOfficeCrashed) propagates instead of returning
+    False, so the job worker can retry the attempt.
+    """
     try:
-        cv = Converter(pdf_path)
-        cv.convert(docx_path)
-        cv.close()
-        return True
+        return await parallel_pdf.convert_pdf_to_word(conversion_pool, pdf_path, docx_path, progress)
+    except (ConversionTimeout, BrokenProcessPool) as e:
+        if raise_transient:
+            raise
+        logger.error(f"PDF to Word konvertatsiya to'xtatildi: {e!r}")
+        return False
     except Exception as e:
         logger.error(f"PDF to Word konvertatsiya xatoligi: {e}")
         return False
 
-async def convert_word_to_pdf(docx_path, pdf_path):
-    """Convert Word to PDF using LibreOffice"""
+async def convert_word_to_pdf(docx_path, pdf_path, raise_transient=False):
+    """Convert Word to PDF using the LibreOffice pool (see convert_pdf_to_word for raise_transient)"""
     try:
-        output_dir = os.path.dirname(pdf_path)
-        
-        # LibreOffice yo'lini topish
-        soffice_paths = [
-            'soffice',  # System PATH da
-            '/usr/bin/soffice',  # Ubuntu/Debian
-            '/usr/local/bin/soffice',  # Local install
-            '/opt/libreoffice/program/soffice',  # LibreOffice
-            '/nix/store/s77ki6j3if918jk373md4aajqii531rd-libreoffice-24.8.7.2-wrapped/bin/soffice',  # Nix
-            '/app/.apt/usr/bin/soffice',  # Railway
-        ]
-        
-        soffice_path = None
-        for path in soffice_paths:
-            if os.path.exists(path) or path == 'soffice':
-                try:
-                    result = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=5)
-                    if result.returncode == 0:
-                        soffice_path = path
-                        print(f"LibreOffice topildi: {path}")
-                        break
-                except:
-                    continue
-        
-        if not soffice_path:
+        if not libreoffice_pool.available:
             print("LibreOffice topilmadi, python-docx2pdf ishlatamiz...")
             # Alternative: python-docx2pdf
             try:
                 from docx2pdf import convert
-                convert(docx_path, pdf_path)
+                await asyncio.to_thread(convert, docx_path, pdf_path)
                 return True
             except ImportError:
                 print("docx2pdf ham mavjud emas, fallback...")
                 return False
         
-        result = subprocess.run(
-            [soffice_path, '--headless', '--convert-to', 'pdf', '--outdir', output_dir, docx_path],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
-        if result.returncode == 0:
-            return True
-        else:
-            logger.error(f"LibreOffice xatoligi: {result.stderr}")
-            return False
-    except subprocess.TimeoutExpired:
-        logger.error("Word to PDF konvertatsiya vaqti tugadi")
+        output_path = await libreoffice_pool.convert_one(docx_path, 'pdf', os.path.dirname(pdf_path))
+        if output_path != pdf_path:
+            os.replace(output_path, pdf_path)
+        return True
+    except LibreOfficeError as e:
+        if raise_transient and isinstance(e, LibreOfficeCrashed):
+            raise
+        logger.error(f"Word to PDF konvertatsiya xatoligi: {e}")
         return False
     except Exception as e:
         logger.error(f"Word to PDF konvertatsiya xatoligi: {e}")
         return False
 
-async def add_qr_to_word_document(docx_path, qr_image_path, output_path):
-    """Add QR code to Word document, replace existing QR codes if found"""
+async def add_qr_to_word_document(docx_path, qr_image, output_path, raise_transient=False):
+    """Add QR code to Word document in the conversion pool"""
     try:
-        print(f"Word document ochilmoqda: {docx_path}")
-        doc = Document(docx_path)
-        print(f"Document ochildi, paragraflar soni: {len(doc.paragraphs)}")
-        
-        # Mavjud QR kodlarni topish va o'chirish
-        qr_replaced = False
-        
-        # Oddiy usul: Faqat rasm elementlarini o'chirish
-        print("Rasm elementlarini qidirish va o'chirish...")
-        
-        # Barcha paragraflardan rasm elementlarini o'chirish
-        for i, paragraph in enumerate(doc.paragraphs):
-            runs_to_remove = []
-            for j, run in enumerate(paragraph.runs):
-                if run._element.xpath('.//a:blip'):
-                    print(f"Paragraf {i}, run {j}: Rasm topildi va o'chirilmoqda...")
-                    runs_to_remove.append(j)
-                    qr_replaced = True
-            
-            # Rasm elementlarini teskari tartibda o'chirish
-            for j in reversed(runs_to_remove):
-                paragraph.runs[j].clear()
-        
-        # Barcha jadvallardan rasm elementlarini o'chirish
-        for table_idx, table in enumerate(doc.tables):
-            for row_idx, row in enumerate(table.rows):
-                for cell_idx, cell in enumerate(row.cells):
-                    for para_idx, paragraph in enumerate(cell.paragraphs):
-                        runs_to_remove = []
-                        for run_idx, run in enumerate(paragraph.runs):
-                            if run._element.xpath('.//a:blip'):
-                                print(f"Jadval {table_idx}, qator {row_idx}, katak {cell_idx}, paragraf {para_idx}, run {run_idx}: Rasm topildi va o'chirilmoqda...")
-                                runs_to_remove.append(run_idx)
-                                qr_replaced = True
-                        
-                        # Rasm elementlarini teskari tartibda o'chirish
-                        for run_idx in reversed(runs_to_remove):
-                            paragraph.runs[run_idx].clear()
-        
-        print(f"Rasm o'chirish tugadi. qr_replaced: {qr_replaced}")
-        
-        
-        # Yangi QR kod qo'shish
-        if qr_replaced:
-            print("Mavjud QR kod almashtirildi")
-            # Pastki o'ng burchakka qo'shish
-            from docx.enum.text import WD_ALIGN_PARAGRAPH
-            paragraph = doc.add_paragraph()
-            paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-            run = paragraph.add_run()
-            run.add_picture(qr_image_path, width=Inches(1), height=Inches(1))
-        else:
-            print("Mavjud QR kod topilmadi, yangi qo'shildi")
-            # Agar mavjud QR kod topilmagan bo'lsa, oddiy usulda qo'shish
-            if len(doc.paragraphs) > 0:
-                # Add QR to the last existing paragraph (right side)
-                last_paragraph = doc.paragraphs[-1]
-                # Add tab to move to right side
-                last_paragraph.add_run('\t')
-                run = last_paragraph.add_run()
-                run.add_picture(qr_image_path, width=Inches(1), height=Inches(1))
-            else:
-                # If document is empty, create new paragraph
-                from docx.enum.text import WD_ALIGN_PARAGRAPH
-                paragraph = doc.add_paragraph()
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-                run = paragraph.add_run()
-                run.add_picture(qr_image_path, width=Inches(1), height=Inches(1))
-        
-        # Add footer to the document (all sections)
-        from docx.enum.text import WD_ALIGN_PARAGRAPH
-        for section in doc.sections:
-            footer = section.footer
-            footer_paragraph = footer.paragraphs[0] if footer.paragraphs else footer.add_paragraph()
-            footer_paragraph.text = 'DIDOX.UZ Orqali tasdiqlandi!'
-            footer_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Save document
-        print(f"Document saqlanmoqda: {output_path}")
-        doc.save(output_path)
-        print(f"Document saqlandi, qr_replaced: {qr_replaced}")
-        return qr_replaced  # qr_replaced ni qaytarish
-    except Exception as e:
-        logger.error(f"Word faylga QR qo'shish xatoligi: {e}")
-        import traceback
-        traceback.print_exc()
+        return await run_conversion(documents.add_qr_to_word_document, docx_path, qr_image, output_path)
+    except (ConversionTimeout, BrokenProcessPool) as e:
+        if raise_transient:
+            raise
+        logger.error(f"Word faylga QR qo'shish to'xtatildi: {e!r}")
         return False
 
-async def add_qr_to_pdf_document(pdf_path, qr_image_path, output_path):
-    """Add QR code to PDF document, replace existing QR codes if found"""
+async def add_qr_to_pdf_document(pdf_path, qr_image, output_path, raise_transient=False):
+    """Add QR code to PDF document in the conversion pool"""
     try:
-        # Open PDF
-        pdf_document = fitz.open(pdf_path)
-        
-        # Mavjud QR kodlarni topish va o'chirish
-        qr_replaced = False
-        
-        # Barcha sahifalarni tekshirish
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            
-            # Sahifadagi barcha rasmlarni topish
-            image_list = page.get_images()
-            for img_index, img in enumerate(image_list):
-                # Rasm o'lchamini tekshirish (QR kod odatda kvadrat bo'ladi)
-                xref = img[0]
-                pix = fitz.Pixmap(pdf_document, xref)
-                if pix.width == pix.height and pix.width <= 100:  # QR kod o'lchami
-                    # Bu QR kod bo'lishi mumkin, uni o'chirish
-                    page.delete_image(xref)
-                    qr_replaced = True
-                    print(f"Sahifa {page_num + 1} da mavjud QR kod topildi va o'chirildi")
-                pix = None
-        
-        # Get last page
-        last_page = pdf_document[-1]
-        page_width = last_page.rect.width
-        page_height = last_page.rect.height
-        
-        # QR code size (1x1 inch = 72x72 points)
-        qr_size = 72
-        
-        # Position QR at bottom right (with 10pt margin)
-        qr_x = page_width - qr_size - 10
-        qr_y = page_height - qr_size - 10
-        
-        # Insert QR code image
-        qr_rect = fitz.Rect(qr_x, qr_y, qr_x + qr_size, qr_y + qr_size)
-        last_page.insert_image(qr_rect, filename=qr_image_path)
-        
-        if qr_replaced:
-            print("Mavjud QR kod almashtirildi")
-        else:
-            print("Mavjud QR kod topilmadi, yangi qo'shildi")
-        
-        # Add footer text
-        footer_text = "DIDOX.UZ Orqali tasdiqlandi!"
-        text_position = fitz.Point(page_width / 2, page_height - 5)
-        last_page.insert_text(text_position, footer_text, fontsize=10, 
-                             color=(0, 0, 0), fontname="helv")
-        
-        # Save PDF
-        pdf_document.save(output_path)
-        pdf_document.close()
-        return qr_replaced  # qr_replaced ni qaytarish
-    except Exception as e:
-        logger.error(f"PDF faylga QR qo'shish xatoligi: {e}")
-        import traceback
-        traceback.print_exc()
+        return await run_conversion(documents.add_qr_to_pdf_document, pdf_path, qr_image, output_path)
+    except (ConversionTimeout, BrokenProcessPool) as e:
+        if raise_transient:
+            raise
+        logger.error(f"PDF faylga QR qo'shish to'xtatildi: {e!r}")
         return False
 
+async def add_qr_to_office_document(source, qr_image, output_path, extension, raise_transient=False):
+    """Add QR code to an Excel/PowerPoint file in the conversion pool"""
+    try:
+        return await run_conversion(documents.add_qr_to_office_document, source, qr_image, output_path, extension)
+    except (ConversionTimeout, BrokenProcessPool) as e:
+        if raise_transient:
+            raise
+        logger.error(f"{extension} faylga QR qo'shish to'xtatildi: {e!r}")
+        return False
+
+# convert_mode -> (job operation, accepted extensions) for JOB_QUEUE mode
+QUEUED_MODES = {
+    'pdf_to_word': ('pdf_to_word', ('pdf',)),
+    'word_to_pdf': ('word_to_pdf', ('docx', 'doc')),
+    'add_qr_to_word': ('qr_to_word', ('docx', 'doc')),
+    'add_qr_to_pdf': ('qr_to_pdf', ('pdf',)),
+    'add_qr_to_office': ('qr_to_office', ('xlsx', 'pptx')),
+}
+
+async def enqueue_document(message, user, document, operation, file_extension):
+    """Store the upload in the blob store and queue it for worker.py"""
+    status_message = StatusMessage.send(message, "⏳ Fayl qabul qilinmoqda...")
+    source_keys = [f"u:{document.file_unique_id}"]
+    if await reply_from_result_cache(message, user, source_keys, operation, status_message,
+                                     create_back_keyboard(), count_miss=False):
+        return
+    
+    try:
+        file = await document.get_file()
+        sha256, size = await download_to_store(file, blob_store)
+        source_keys.append(f"h:{sha256}")
+        params = {
+            'source_keys': source_keys,
+            'extension': file_extension,
+            'base_name': os.path.splitext(document.file_name)[0],
+        }
+        job_id, position = await adb.enqueue_job(operation, sha256, size, params, user.id, message.chat_id,
+                                                 message.message_id, (await status_message.sent()).message_id,
+                                                 JOB_MAX_ATTEMPTS)
+        logger.info(f"Job {job_id} ({operation}) navbatga qo'yildi, user {user.id}")
+        await status_message.edit_text(f"⏳ Navbatga qo'yildi ({position}-o'rin). Tayyor bo'lganda yuboriladi.")
+    except Exception as e:
+        logger.error(f"Ishni navbatga qo'yishda xatolik ({operation}): {e}")
+        await status_message.edit_text(
+            f"❌ Xatolik yuz berdi: {str(e)}",
+            reply_markup=create_back_keyboard()
+        )
+
 @require_permission
 async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle document uploads"""
@@ -487,7 +540,7 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if document.file_size > MAX_FILE_SIZE:
         await message.reply_text(
-            "❌ Xatolik: Fayl hajmi 20MB dan oshmasligi kerak!",
+            f"❌ Xatolik: Fayl hajmi {MAX_FILE_SIZE_MB}MB dan oshmasligi kerak!",
             reply_markup=create_back_keyboard()
         )
         return
@@ -495,6 +548,13 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     file_extension = document.file_name.split('.')[-1].lower()
     convert_mode = context.user_data.get('convert_mode')
     
+    operation, extensions = QUEUED_MODES.get(convert_mode, (None, ()))
+    if JOB_QUEUE and file_extension in extensions:
+        # Noto'g'ri format bo'lsa pastdagi tegishli blok xato xabarini beradi
+        await enqueue_document(message, user, document, operation, file_extension)
+        context.user_data['convert_mode'] = None
+        return
+    
     if convert_mode == 'pdf_to_word':
         if file_extension != 'pdf':
             await message.reply_text(
@@ -503,7 +563,13 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         
-        status_message = await message.reply_text("⏳ PDF Word ga o'zgartrilmoqda...")
+        status_message = StatusMessage.send(message, "⏳ PDF Word ga o'zgartrilmoqda...")
+        
+        source_keys = [f"u:{document.file_unique_id}"]
+        if await reply_from_result_cache(message, user, source_keys, 'pdf_to_word', status_message,
+                                         create_convert_keyboard(), count_miss=False):
+            context.user_data['convert_mode'] = None
+            return
         
         pdf_path = None
         docx_path = None
@@ -513,39 +579,54 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             pdf_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}.pdf")
             docx_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}.docx")
             
-            await file.download_to_drive(pdf_path)
+            await download_to_path(file, pdf_path)
             
-            success = await convert_pdf_to_word(pdf_path, docx_path)
+            # Boshqa file_unique_id, lekin bir xil tarkib
+            source_keys.append(f"h:{await asyncio.to_thread(hash_file, pdf_path)}")
+            if await reply_from_result_cache(message, user, source_keys, 'pdf_to_word', status_message,
+                                             create_convert_keyboard()):
+                context.user_data['convert_mode'] = None
+                return
+            
+            async def report_progress(done, total):
+                await status_message.progress(f"⏳ PDF Word ga o'zgartrilmoqda... {done}/{total} qism")
+            
+            success = await convert_pdf_to_word(pdf_path, docx_path, report_progress)
             
             if success and os.path.exists(docx_path):
                 await status_message.edit_text("✅ Konvertatsiya muvaffaqiyatli!")
                 
                 # Create URL and save to database
                 docx_filename = f"{unique_id}.docx"
-                file_url = f"{get_base_url()}/files/{docx_filename}"
-                file_size = os.path.getsize(docx_path)
+                file_url = await public_url(docx_filename)
+                docx_path, blob, file_size = await publish_file(docx_path, docx_filename)
                 
                 try:
-                    add_file_record(
+                    await adb.add_file_record(
                         user_id=user.id,
                         file_name=f"{os.path.splitext(document.file_name)[0]}.docx",
                         file_path=docx_path,
                         file_url=file_url,
                         file_type='docx',
                         file_size=file_size,
-                        service_used='pdf_to_word'
+                        service_used='pdf_to_word',
+                        blob=blob
                     )
                     logger.info(f"PDF to Word conversion saved: {document.file_name} by user {user.id}")
                 except Exception as e:
                     logger.error(f"Failed to save PDF to Word record: {e}")
                 
-                with open(docx_path, 'rb') as docx_file:
-                    await message.reply_document(
+                result_name = f"{os.path.splitext(document.file_name)[0]}.docx"
+                caption_text = "✅ PDF Word formatiga o'zgartirildi\n🌐 Soliq.uz"
+                with upload_source(docx_path, result_name) as docx_file:
+                    sent = await message.reply_document(
                         document=docx_file,
-                        filename=f"{os.path.splitext(document.file_name)[0]}.docx",
-                        caption="✅ PDF Word formatiga o'zgartirildi\n🌐 Soliq.uz",
+                        filename=result_name,
+                        caption=caption_text,
                         reply_markup=create_convert_keyboard()
                     )
+                await remember_result(source_keys, 'pdf_to_word', sent, blob, docx_filename,
+                                      result_name, caption_text, file_size)
                 context.user_data['convert_mode'] = None
             else:
                 await status_message.edit_text(
@@ -572,7 +653,13 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         
-        status_message = await message.reply_text("⏳ Word PDF ga o'zgartrilmoqda...")
+        status_message = StatusMessage.send(message, "⏳ Word PDF ga o'zgartrilmoqda...")
+        
+        source_keys = [f"u:{document.file_unique_id}"]
+        if await reply_from_result_cache(message, user, source_keys, 'word_to_pdf', status_message,
+                                         create_convert_keyboard(), count_miss=False):
+            context.user_data['convert_mode'] = None
+            return
         
         docx_path = None
         pdf_path = None
@@ -583,7 +670,13 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             pdf_filename = f"{unique_id}.pdf"
             pdf_path = os.path.join(UPLOAD_FOLDER, pdf_filename)
             
-            await file.download_to_drive(docx_path)
+            await download_to_path(file, docx_path)
+            
+            source_keys.append(f"h:{await asyncio.to_thread(hash_file, docx_path)}")
+            if await reply_from_result_cache(message, user, source_keys, 'word_to_pdf', status_message,
+                                             create_convert_keyboard()):
+                context.user_data['convert_mode'] = None
+                return
             
             success = await convert_word_to_pdf(docx_path, pdf_path)
             
@@ -591,30 +684,35 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await status_message.edit_text("✅ Konvertatsiya muvaffaqiyatli!")
                 
                 # Create URL and save to database
-                file_url = f"{get_base_url()}/files/{pdf_filename}"
-                file_size = os.path.getsize(pdf_path)
+                file_url = await public_url(pdf_filename)
+                pdf_path, blob, file_size = await publish_file(pdf_path, pdf_filename)
                 
                 try:
-                    add_file_record(
+                    await adb.add_file_record(
                         user_id=user.id,
                         file_name=f"{os.path.splitext(document.file_name)[0]}.pdf",
                         file_path=pdf_path,
                         file_url=file_url,
                         file_type='pdf',
                         file_size=file_size,
-                        service_used='word_to_pdf'
+                        service_used='word_to_pdf',
+                        blob=blob
                     )
                     logger.info(f"Word to PDF conversion saved: {document.file_name} by user {user.id}")
                 except Exception as e:
                     logger.error(f"Failed to save Word to PDF record: {e}")
                 
-                with open(pdf_path, 'rb') as pdf_file:
-                    await message.reply_document(
+                result_name = f"{os.path.splitext(document.file_name)[0]}.pdf"
+                caption_text = "✅ Word PDF formatiga o'zgartirildi\n🌐 Soliq.uz"
+                with upload_source(pdf_path, result_name) as pdf_file:
+                    sent = await message.reply_document(
                         document=pdf_file,
-                        filename=f"{os.path.splitext(document.file_name)[0]}.pdf",
-                        caption="✅ Word PDF formatiga o'zgartirildi\n🌐 Soliq.uz",
+                        filename=result_name,
+                        caption=caption_text,
                         reply_markup=create_convert_keyboard()
                     )
+                await remember_result(source_keys, 'word_to_pdf', sent, blob, pdf_filename,
+                                      result_name, caption_text, file_size)
                 context.user_data['convert_mode'] = None
             else:
                 await status_message.edit_text(
@@ -641,64 +739,53 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         
-        status_message = await message.reply_text("⏳ Word faylga QR kod qo'shilmoqda...")
+        status_message = StatusMessage.send(message, "⏳ Word faylga QR kod qo'shilmoqda...")
+        
+        source_keys = [f"u:{document.file_unique_id}"]
+        if await reply_from_result_cache(message, user, source_keys, 'qr_to_word', status_message,
+                                         create_back_keyboard(), count_miss=False):
+            context.user_data['convert_mode'] = None
+            return
         
         original_file_path = None
         converted_docx_path = None
-        qr_image_path = None
         output_docx_path = None
         try:
             file = await context.bot.get_file(document.file_id)
             unique_id = str(uuid.uuid4())
             original_file_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_original.{file_extension}")
-            output_docx_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_with_qr.docx")
-            qr_image_path = os.path.join(QR_FOLDER, f"{unique_id}.png")
+            # Natija blob store yonida yoziladi - publish_file uni nusxalamasdan bog'laydi
+            output_docx_path = os.path.join(blob_store.tmp_dir, f"{unique_id}_with_qr.docx")
             
-            # Download original file
-            await file.download_to_drive(original_file_path)
+            # Download original file: DOCX xotiraga, DOC LibreOffice uchun diskka
+            if file_extension == 'doc':
+                await download_to_path(file, original_file_path)
+                working_docx = original_file_path
+            else:
+                working_docx = await download_source(file, document.file_size, original_file_path)
+            
+            source_keys.append(f"h:{await asyncio.to_thread(hash_source, working_docx)}")
+            if await reply_from_result_cache(message, user, source_keys, 'qr_to_word', status_message,
+                                             create_back_keyboard()):
+                context.user_data['convert_mode'] = None
+                return
             
             # If DOC, convert to DOCX first
             if file_extension == 'doc':
                 await status_message.edit_text("⏳ DOC faylni DOCX ga o'zgartirish...")
                 converted_docx_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_converted.docx")
                 
-                # LibreOffice yo'lini topish
-                soffice_paths = [
-                    'soffice',  # System PATH da
-                    '/usr/bin/soffice',  # Ubuntu/Debian
-                    '/usr/local/bin/soffice',  # Local install
-                    '/opt/libreoffice/program/soffice',  # LibreOffice
-                    '/nix/store/s77ki6j3if918jk373md4aajqii531rd-libreoffice-24.8.7.2-wrapped/bin/soffice',  # Nix
-                    '/app/.apt/usr/bin/soffice',  # Railway
-                ]
-                
-                soffice_path = None
-                for path in soffice_paths:
-                    if os.path.exists(path) or path == 'soffice':
-                        try:
-                            result = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=5)
-                            if result.returncode == 0:
-                                soffice_path = path
-                                print(f"LibreOffice topildi: {path}")
-                                break
-                        except:
-                            continue
-                
-                if not soffice_path:
+                if not libreoffice_pool.available:
                     await status_message.edit_text(
                         "❌ LibreOffice topilmadi. DOC faylni DOCX ga o'zgartirish mumkin emas.",
                         reply_markup=create_back_keyboard()
                     )
                     return
                 
-                result = subprocess.run(
-                    [soffice_path, '--headless', '--convert-to', 'docx', '--outdir', UPLOAD_FOLDER, original_file_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=60
-                )
-                
-                if result.returncode != 0:
+                try:
+                    await libreoffice_pool.convert_one(original_file_path, 'docx', UPLOAD_FOLDER)
+                except LibreOfficeError as e:
+                    logger.error(f"DOC -> DOCX xatoligi: {e}")
                     await status_message.edit_text(
                         "❌ DOC ni DOCX ga konvertatsiya qilishda xatolik.",
                         reply_markup=create_back_keyboard()
@@ -707,37 +794,23 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 
                 # LibreOffice creates file with same base name but .docx extension
                 converted_docx_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_original.docx")
-                working_docx_path = converted_docx_path
+                working_docx = converted_docx_path
                 await status_message.edit_text("⏳ QR kod qo'shilmoqda...")
-            else:
-                working_docx_path = original_file_path
             
             # Create permanent file link and QR code
             permanent_filename = f"{uuid.uuid4()}.docx"
-            permanent_file_path = os.path.join(UPLOAD_FOLDER, permanent_filename)
-            file_url = f"{get_base_url()}/files/{permanent_filename}"
+            file_url = await public_url(permanent_filename)
             
-            # Generate QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(file_url)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            img.save(qr_image_path)
+            # Generate QR code (vector or PNG bytes, no temp file)
+            qr_image = make_stamp_qr(file_url)
             
             # Add QR code to Word document
             print(f"QR kod qo'shish jarayoni boshlandi...")
-            print(f"Working docx: {working_docx_path}")
-            print(f"QR image: {qr_image_path}")
+            print(f"Working docx: {working_docx if isinstance(working_docx, str) else 'xotirada'}")
             print(f"Output: {output_docx_path}")
             
             try:
-                qr_replaced = await add_qr_to_word_document(working_docx_path, qr_image_path, output_docx_path)
+                qr_replaced = await add_qr_to_word_document(working_docx, qr_image, output_docx_path)
                 print(f"QR kod qo'shish natijasi: {qr_replaced}")
                 # qr_replaced True yoki False bo'lishi mumkin, lekin muvaffaqiyatli operatsiya
                 success = qr_replaced is not None  # None emas bo'lsa, muvaffaqiyatli
@@ -751,19 +824,19 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await status_message.edit_text("✅ QR kod muvaffaqiyatli qo'shildi!")
                 
                 # Save the file with QR code as the permanent file
-                os.rename(output_docx_path, permanent_file_path)
+                permanent_file_path, blob, file_size = await publish_file(output_docx_path, permanent_filename)
                 
                 # Save to database
-                file_size = os.path.getsize(permanent_file_path)
                 try:
-                    add_file_record(
+                    await adb.add_file_record(
                         user_id=user.id,
                         file_name=f"{os.path.splitext(document.file_name)[0]}_QR.docx",
                         file_path=permanent_file_path,
                         file_url=file_url,
                         file_type='docx',
                         file_size=file_size,
-                        service_used='qr_to_word'
+                        service_used='qr_to_word',
+                        blob=blob
                     )
                     logger.info(f"QR to Word saved: {document.file_name} by user {user.id}")
                 except Exception as e:
@@ -777,13 +850,16 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     caption_text += "➕ Yangi QR kod qo'shildi!\n\n"
                 caption_text += f"📥 Yuklab olish: {file_url}\n🌐 Soliq.uz"
                 
-                with open(permanent_file_path, 'rb') as docx_file:
-                    await message.reply_document(
+                result_name = f"{os.path.splitext(document.file_name)[0]}_QR.docx"
+                with upload_source(permanent_file_path, result_name) as docx_file:
+                    sent = await message.reply_document(
                         document=docx_file,
-                        filename=f"{os.path.splitext(document.file_name)[0]}_QR.docx",
+                        filename=result_name,
                         caption=caption_text,
                         reply_markup=create_back_keyboard()
                     )
+                await remember_result(source_keys, 'qr_to_word', sent, blob, permanent_filename,
+                                      result_name, caption_text, file_size)
                 context.user_data['convert_mode'] = None
             else:
                 await status_message.edit_text(
@@ -801,8 +877,6 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 os.remove(original_file_path)
             if converted_docx_path and os.path.exists(converted_docx_path):
                 os.remove(converted_docx_path)
-            if qr_image_path and os.path.exists(qr_image_path):
-                os.remove(qr_image_path)
             if output_docx_path and os.path.exists(output_docx_path):
                 os.remove(output_docx_path)
         return
@@ -815,47 +889,46 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         
-        status_message = await message.reply_text("⏳ PDF faylga QR kod qo'shilmoqda...")
+        status_message = StatusMessage.send(message, "⏳ PDF faylga QR kod qo'shilmoqda...")
+        
+        source_keys = [f"u:{document.file_unique_id}"]
+        if await reply_from_result_cache(message, user, source_keys, 'qr_to_pdf', status_message,
+                                         create_back_keyboard(), count_miss=False):
+            context.user_data['convert_mode'] = None
+            return
         
         original_pdf_path = None
-        qr_image_path = None
         output_pdf_path = None
         try:
             file = await context.bot.get_file(document.file_id)
             unique_id = str(uuid.uuid4())
             original_pdf_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_original.pdf")
-            output_pdf_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_with_qr.pdf")
-            qr_image_path = os.path.join(QR_FOLDER, f"{unique_id}.png")
+            # Natija blob store yonida yoziladi - publish_file uni nusxalamasdan bog'laydi
+            output_pdf_path = os.path.join(blob_store.tmp_dir, f"{unique_id}_with_qr.pdf")
             
-            # Download original file
-            await file.download_to_drive(original_pdf_path)
+            # Download original file (faqat katta fayllar diskka tushadi)
+            original_pdf = await download_source(file, document.file_size, original_pdf_path)
+            
+            source_keys.append(f"h:{await asyncio.to_thread(hash_source, original_pdf)}")
+            if await reply_from_result_cache(message, user, source_keys, 'qr_to_pdf', status_message,
+                                             create_back_keyboard()):
+                context.user_data['convert_mode'] = None
+                return
             
             # Create permanent file link and QR code
             permanent_filename = f"{uuid.uuid4()}.pdf"
-            permanent_file_path = os.path.join(UPLOAD_FOLDER, permanent_filename)
-            file_url = f"{get_base_url()}/files/{permanent_filename}"
-            
-            # Generate QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(file_url)
-            qr.make(fit=True)
+            file_url = await public_url(permanent_filename)
             
-            img = qr.make_image(fill_color="black", back_color="white")
-            img.save(qr_image_path)
+            # Generate QR code (vector or PNG bytes, no temp file)
+            qr_image = make_stamp_qr(file_url)
             
             # Add QR code to PDF document
             print(f"PDF QR kod qo'shish jarayoni boshlandi...")
-            print(f"Original PDF: {original_pdf_path}")
-            print(f"QR image: {qr_image_path}")
+            print(f"Original PDF: {original_pdf if isinstance(original_pdf, str) else 'xotirada'}")
             print(f"Output PDF: {output_pdf_path}")
             
             try:
-                qr_replaced = await add_qr_to_pdf_document(original_pdf_path, qr_image_path, output_pdf_path)
+                qr_replaced = await add_qr_to_pdf_document(original_pdf, qr_image, output_pdf_path)
                 print(f"PDF QR kod qo'shish natijasi: {qr_replaced}")
                 # qr_replaced True yoki False bo'lishi mumkin, lekin muvaffaqiyatli operatsiya
                 success = qr_replaced is not None  # None emas bo'lsa, muvaffaqiyatli
@@ -869,19 +942,19 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 await status_message.edit_text("✅ QR kod muvaffaqiyatli qo'shildi!")
                 
                 # Save the file with QR code as the permanent file
-                os.rename(output_pdf_path, permanent_file_path)
+                permanent_file_path, blob, file_size = await publish_file(output_pdf_path, permanent_filename)
                 
                 # Save to database
-                file_size = os.path.getsize(permanent_file_path)
                 try:
-                    add_file_record(
+                    await adb.add_file_record(
                         user_id=user.id,
                         file_name=f"{os.path.splitext(document.file_name)[0]}_QR.pdf",
                         file_path=permanent_file_path,
                         file_url=file_url,
                         file_type='pdf',
                         file_size=file_size,
-                        service_used='qr_to_pdf'
+                        service_used='qr_to_pdf',
+                        blob=blob
                     )
                     logger.info(f"QR to PDF saved: {document.file_name} by user {user.id}")
                 except Exception as e:
@@ -895,13 +968,16 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     caption_text += "➕ Yangi QR kod qo'shildi!\n\n"
                 caption_text += f"📥 Yuklab olish: {file_url}\n🌐 Soliq.uz"
                 
-                with open(permanent_file_path, 'rb') as pdf_file:
-                    await message.reply_document(
+                result_name = f"{os.path.splitext(document.file_name)[0]}_QR.pdf"
+                with upload_source(permanent_file_path, result_name) as pdf_file:
+                    sent = await message.reply_document(
                         document=pdf_file,
-                        filename=f"{os.path.splitext(document.file_name)[0]}_QR.pdf",
+                        filename=result_name,
                         caption=caption_text,
                         reply_markup=create_back_keyboard()
                     )
+                await remember_result(source_keys, 'qr_to_pdf', sent, blob, permanent_filename,
+                                      result_name, caption_text, file_size)
                 context.user_data['convert_mode'] = None
             else:
                 await status_message.edit_text(
@@ -917,12 +993,109 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
         finally:
             if original_pdf_path and os.path.exists(original_pdf_path):
                 os.remove(original_pdf_path)
-            if qr_image_path and os.path.exists(qr_image_path):
-                os.remove(qr_image_path)
             if output_pdf_path and os.path.exists(output_pdf_path):
                 os.remove(output_pdf_path)
         return
     
+    elif convert_mode == 'add_qr_to_office':
+        if file_extension not in ['xlsx', 'pptx']:
+            await message.reply_text(
+                "❌ Xatolik: Iltimos XLSX yoki PPTX fayl yuboring!",
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Orqaga", callback_data='back_to_main')]])
+            )
+            return
+        
+        status_message = StatusMessage.send(message, "⏳ Faylga QR kod qo'shilmoqda...")
+        
+        source_keys = [f"u:{document.file_unique_id}"]
+        if await reply_from_result_cache(message, user, source_keys, 'qr_to_office', status_message,
+                                         create_back_keyboard(), count_miss=False):
+            context.user_data['convert_mode'] = None
+            return
+        
+        original_path = None
+        output_path = None
+        try:
+            file = await context.bot.get_file(document.file_id)
+            unique_id = str(uuid.uuid4())
+            original_path = os.path.join(UPLOAD_FOLDER, f"{unique_id}_original.{file_extension}")
+            # Natija blob store yonida yoziladi - publish_file uni nusxalamasdan bog'laydi
+            output_path = os.path.join(blob_store.tmp_dir, f"{unique_id}_with_qr.{file_extension}")
+            
+            original = await download_source(file, document.file_size, original_path)
+            
+            source_keys.append(f"h:{await asyncio.to_thread(hash_source, original)}")
+            if await reply_from_result_cache(message, user, source_keys, 'qr_to_office', status_message,
+                                             create_back_keyboard()):
+                context.user_data['convert_mode'] = None
+                return
+            
+            # Create permanent file link and QR code
+            permanent_filename = f"{uuid.uuid4()}.{file_extension}"
+            file_url = await public_url(permanent_filename)
+            
+            # Jadval va slaydlarga QR doim PNG rasm sifatida qo'yiladi
+            qr_image = qr_render.render_png(qr_data(file_url))
+            
+            qr_replaced = await add_qr_to_office_document(original, qr_image, output_path, file_extension)
+            print(f"{file_extension} QR kod qo'shish natijasi: {qr_replaced}")
+            
+            if os.path.exists(output_path):
+                await status_message.edit_text("✅ QR kod muvaffaqiyatli qo'shildi!")
+                
+                permanent_file_path, blob, file_size = await publish_file(output_path, permanent_filename)
+                result_name = f"{os.path.splitext(document.file_name)[0]}_QR.{file_extension}"
+                
+                try:
+                    await adb.add_file_record(
+                        user_id=user.id,
+                        file_name=result_name,
+                        file_path=permanent_file_path,
+                        file_url=file_url,
+                        file_type=file_extension,
+                        file_size=file_size,
+                        service_used='qr_to_office',
+                        blob=blob
+                    )
+                    logger.info(f"QR to {file_extension} saved: {document.file_name} by user {user.id}")
+                except Exception as e:
+                    logger.error(f"Failed to save QR to {file_extension} record: {e}")
+                
+                caption_text = "✅ Faylga QR kod qo'shildi!\n\n"
+                if qr_replaced:
+                    caption_text += "🔄 Mavjud QR kod almashtirildi!\n\n"
+                else:
+                    caption_text += "➕ Yangi QR kod qo'shildi!\n\n"
+                caption_text += f"📥 Yuklab olish: {file_url}\n🌐 Soliq.uz"
+                
+                with upload_source(permanent_file_path, result_name) as result_file:
+                    sent = await message.reply_document(
+                        document=result_file,
+                        filename=result_name,
+                        caption=caption_text,
+                        reply_markup=create_back_keyboard()
+                    )
+                await remember_result(source_keys, 'qr_to_office', sent, blob, permanent_filename,
+                                      result_name, caption_text, file_size)
+                context.user_data['convert_mode'] = None
+            else:
+                await status_message.edit_text(
+                    "❌ QR kod qo'shishda xatolik. Iltimos qaytadan urinib ko'ring.",
+                    reply_markup=create_back_keyboard()
+                )
+        except Exception as e:
+            logger.error(f"{file_extension} faylga QR qo'shish handler xatoligi: {e}")
+            await status_message.edit_text(
+                f"❌ Xatolik yuz berdi: {str(e)}",
+                reply_markup=create_back_keyboard()
+            )
+        finally:
+            if original_path and os.path.exists(original_path):
+                os.remove(original_path)
+            if output_path and os.path.exists(output_path):
+                os.remove(output_path)
+        return
+    
     if file_extension not in ALLOWED_EXTENSIONS:
         await message.reply_text(
             f"❌ Xatolik: '{file_extension}' formatidagi fayllar qo'llab-quvvatlanmaydi!",
@@ -930,61 +1103,50 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    status_message = await message.reply_text("⏳ Fayl yuklanmoqda...")
+    status_message = StatusMessage.send(message, "⏳ Fayl yuklanmoqda...")
     
     try:
         file = await context.bot.get_file(document.file_id)
         unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
         
-        await file.download_to_drive(file_path)
+        # SHA-256 yuklab olish paytida hisoblanadi, bir xil fayl bir marta saqlanadi
+        blob, size = await download_to_store(file, blob_store)
+        await adb.add_alias(unique_filename, blob, size)
         
-        file_url = f"{get_base_url()}/files/{unique_filename}"
+        file_url = await public_url(unique_filename)
         
         # Save file record to database
         try:
-            add_file_record(
+            await adb.add_file_record(
                 user_id=user.id,
                 file_name=document.file_name,
-                file_path=file_path,
+                file_path=blob_store.path_for(blob),
                 file_url=file_url,
                 file_type=file_extension,
-                file_size=document.file_size
+                file_size=document.file_size,
+                blob=blob
             )
             logger.info(f"File record saved: {document.file_name} by user {user.id}")
         except Exception as e:
             logger.error(f"Failed to save file record: {e}")
         
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(file_url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
+        qr_png = qr_render.render_png(qr_data(file_url))
         
         await status_message.edit_text("✅ Fayl muvaffaqiyatly yuklandi!")
         
+        # Havola va QR bitta xabarda - bitta Bot API so'rovi
         success_text = (
             f"✅ <b>Faylingiz muvaffaqiyatli yuklandi!</b>\n\n"
-            f"📄 Fayl nomi: {document.file_name}\n"
+            f"📄 Fayl nomi: {html.escape(document.file_name)}\n"
             f"📊 Hajmi: {document.file_size / 1024:.2f} KB\n\n"
             f"🔗 <b>Faylga havola:</b>\n{file_url}\n\n"
-            f"📎 QR-kodni skaner qiling yoki havolani bosing:"
+            f"📱 QR-kodni skaner qiling yoki havolani bosing\n🌐 Soliq.uz"
         )
         
-        await message.reply_text(success_text, parse_mode='HTML')
-        
         await message.reply_photo(
-            photo=img_byte_arr,
-            caption=f"📱 QR-kodni skaner qilish orqali faylni oching\n🌐 Soliq.uz",
+            photo=qr_png,
+            caption=success_text,
+            parse_mode='HTML',
             reply_markup=create_back_keyboard()
         )
         
@@ -1003,50 +1165,38 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if photo.file_size > MAX_FILE_SIZE:
         await message.reply_text(
-            "❌ Xatolik: Rasm hajmi 20MB dan oshmasligi kerak!",
+            f"❌ Xatolik: Rasm hajmi {MAX_FILE_SIZE_MB}MB dan oshmasligi kerak!",
             reply_markup=create_back_keyboard()
         )
         return
     
-    status_message = await message.reply_text("⏳ Rasm yuklanmoqda...")
+    status_message = StatusMessage.send(message, "⏳ Rasm yuklanmoqda...")
     
     try:
         file = await context.bot.get_file(photo.file_id)
         unique_filename = f"{uuid.uuid4()}.jpg"
-        file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
         
-        await file.download_to_drive(file_path)
+        blob, size = await download_to_store(file, blob_store)
+        await adb.add_alias(unique_filename, blob, size)
         
-        file_url = f"{get_base_url()}/files/{unique_filename}"
+        file_url = await public_url(unique_filename)
         
         # Save file record to database
         try:
-            add_file_record(
+            await adb.add_file_record(
                 user_id=user.id,
                 file_name=f"photo_{unique_filename}",
-                file_path=file_path,
+                file_path=blob_store.path_for(blob),
                 file_url=file_url,
                 file_type='jpg',
-                file_size=photo.file_size
+                file_size=photo.file_size,
+                blob=blob
             )
             logger.info(f"Photo record saved: photo_{unique_filename} by user {user.id}")
         except Exception as e:
             logger.error(f"Failed to save photo record: {e}")
         
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(file_url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
+        qr_png = qr_render.render_png(qr_data(file_url))
         
         await status_message.edit_text("✅ Rasm muvaffaqiyatly yuklandi!")
         
@@ -1054,14 +1204,13 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"✅ <b>Rasmingiz muvaffaqiyatli yuklandi!</b>\n\n"
             f"📊 Hajmi: {photo.file_size / 1024:.2f} KB\n\n"
             f"🔗 <b>Rasmga havola:</b>\n{file_url}\n\n"
-            f"📎 QR-kodni skaner qiling yoki havolani bosing:"
+            f"📱 QR-kodni skaner qiling yoki havolani bosing\n🌐 Soliq.uz"
         )
         
-        await message.reply_text(success_text, parse_mode='HTML')
-        
         await message.reply_photo(
-            photo=img_byte_arr,
-            caption=f"📱 QR-kodni skaner qilish orqali rasmni oching\n🌐 Soliq.uz",
+            photo=qr_png,
+            caption=success_text,
+            parse_mode='HTML',
             reply_markup=create_back_keyboard()
         )
         
@@ -1092,7 +1241,7 @@ async def add_admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Add admin command - /add_admin <user_id> or reply to forwarded message"""
     user_id = update.effective_user.id
     
-    if not is_admin(user_id):
+    if not await adb.is_admin(user_id):
         await update.message.reply_text("❌ Bu buyruq faqat admin uchun!")
         return
     
@@ -1107,21 +1256,16 @@ async def add_admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         target_user_id = int(context.args[0])
         
         # Try to get user info from database
-        users = get_all_users()
-        target_user_info = None
-        for user in users:
-            if user[0] == target_user_id:
-                target_user_info = user
-                break
+        target_user_info = await adb.get_user(target_user_id)
         
         if not target_user_info:
             # User not in database, create basic entry
             target_username = "Unknown"
             target_full_name = "Unknown User"
-            add_or_update_user(target_user_id, target_username, target_full_name)
+            await adb.add_or_update_user(target_user_id, target_username, target_full_name)
         else:
-            target_username = target_user_info[1] or "No username"
-            target_full_name = target_user_info[2] or "No name"
+            target_username = target_user_info.username or "No username"
+            target_full_name = target_user_info.full_name or "No name"
     else:
         await update.message.reply_text(
             "❌ <b>Foydalanish:</b>\n\n"
@@ -1132,12 +1276,12 @@ async def add_admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Check if already admin
-    if is_admin(target_user_id):
+    if await adb.is_admin(target_user_id):
         await update.message.reply_text(f"ℹ️ <code>{target_user_id}</code> allaqachon admin!", parse_mode='HTML')
         return
     
     # Add as admin
-    add_admin(target_user_id, target_username, target_full_name, user_id)
+    await adb.add_admin(target_user_id, target_username, target_full_name, user_id)
     
     await update.message.reply_text(
         f"✅ <b>Admin qo'shildi!</b>\n\n"
@@ -1158,15 +1302,89 @@ async def add_admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         logger.error(f"Yangi admin'ga xabar yuborishda xato: {e}")
 
+# Map service names to Uzbek
+SERVICE_NAMES = {
+    'file_upload': '📤 Fayl yuklash',
+    'pdf_to_word': '📄 PDF → Word',
+    'word_to_pdf': '📄 Word → PDF',
+    'qr_to_word': '🔲 QR → Word',
+    'qr_to_pdf': '🔲 QR → PDF',
+    'qr_to_office': '🔲 QR → Excel/PowerPoint'
+}
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Detailed stats - /stats [days] or /stats check"""
+    user_id = update.effective_user.id
+    
+    if not await adb.is_admin(user_id):
+        await update.message.reply_text("❌ Bu buyruq faqat admin uchun!")
+        return
+    
+    if context.args and context.args[0] == 'check':
+        # Hisoblagichlarni to'liq qayta sanash bilan solishtirish va tuzatish
+        drift = await adb.check_stats(repair=True)
+        if not drift:
+            await update.message.reply_text("✅ Statistika hisoblagichlari to'g'ri.")
+            return
+        text = "🔧 <b>Statistika qayta hisoblandi</b>\n\n"
+        for name, (stored, actual) in sorted(drift.items())[:30]:
+            text += f"<code>{name}</code>: {stored} → {actual}\n"
+        await update.message.reply_text(text, parse_mode='HTML')
+        return
+    
+    days = int(context.args[0]) if context.args and context.args[0].isdigit() else 14
+    days = max(1, min(days, 90))
+    
+    stats = await adb.get_stats()
+    services = await adb.get_service_stats()
+    daily = await adb.get_daily_stats(days)
+    storage = await adb.get_storage_stats()
+    
+    text = (
+        "📊 <b>STATISTIKA</b>\n\n"
+        f"👥 Jami foydalanuvchilar: {stats['total_users']}\n"
+        f"✅ Ruxsat berilganlar: {stats['allowed_users']}\n"
+        f"👑 Jami adminlar: {stats['total_admins']}\n"
+        f"📁 Jami fayllar: {stats['total_files']}\n"
+        f"💾 Jami hajm: {stats['total_size'] / (1024*1024):.2f} MB\n"
+        f"🗄 Diskda (takrorlanmas): {storage['stored_bytes'] / (1024*1024):.2f} MB, {storage['blobs']} blob\n\n"
+    )
+    
+    if services:
+        text += "🔧 <b>Xizmatlar bo'yicha:</b>\n"
+        for service_used, files, size in services:
+            text += f"{SERVICE_NAMES.get(service_used, service_used)}: {files} ta, {size / (1024*1024):.2f} MB\n"
+        text += "\n"
+    
+    if JOB_QUEUE:
+        jobs = await adb.get_job_stats()
+        text += (
+            "🧵 <b>Navbat:</b>\n"
+            f"Kutmoqda: {jobs['queued']} ({jobs['retrying']} qayta urinish), bajarilmoqda: {jobs['running']}, "
+            f"eng eski: {jobs['oldest_wait']:.0f}s\n"
+            f"Oxirgi soat: {jobs['done']} tayyor, {jobs['failed']} xato\n"
+            f"Kutish: o'rt. {jobs['wait_avg']:.1f}s, maks. {jobs['wait_max']:.1f}s | "
+            f"Bajarilish: o'rt. {jobs['run_avg']:.1f}s, maks. {jobs['run_max']:.1f}s\n\n"
+        )
+    
+    text += f"📅 <b>Oxirgi {days} kun:</b>\n"
+    if not daily:
+        text += "Ma'lumot yo'q\n"
+    for day, new_users, files, size in daily:
+        text += f"<code>{day}</code> 👤 +{new_users} | 📁 {files} | 💾 {size / (1024*1024):.2f} MB\n"
+    
+    await update.message.reply_text(text, parse_mode='HTML')
+
 async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Admin panel - only for admin"""
     user_id = update.effective_user.id
     
-    if not is_admin(user_id):
+    if not await adb.is_admin(user_id):
         await update.message.reply_text("❌ Bu buyruq faqat admin uchun!")
         return
     
-    stats = get_stats()
+    stats = await adb.get_stats()
+    cache = await adb.get_result_cache_stats()
     
     text = (
         "🔱 <b>ADMIN PANEL</b>\n\n"
@@ -1174,7 +1392,9 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"✅ Ruxsat berilganlar: {stats['allowed_users']}\n"
         f"👑 Jami adminlar: {stats['total_admins']}\n"
         f"📁 Jami fayllar: {stats['total_files']}\n"
-        f"💾 Jami hajm: {stats['total_size'] / (1024*1024):.2f} MB\n\n"
+        f"💾 Jami hajm: {stats['total_size'] / (1024*1024):.2f} MB\n"
+        f"♻️ Natija keshi: {cache['hits']} hit / {cache['misses']} miss, "
+        f"{cache['entries']} yozuv, {cache['bytes'] / (1024*1024):.2f} MB\n\n"
         "Quyidagi amallardan birini tanlang:"
     )
     
@@ -1193,7 +1413,7 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def admin_list_admins(query, context):
     """Show admins list for admin"""
-    admins = get_all_admins()
+    admins = await adb.get_all_admins()
     
     if not admins:
         await query.edit_message_text(
@@ -1225,11 +1445,25 @@ async def admin_list_admins(query, context):
         parse_mode='HTML'
     )
 
-async def admin_users_list(query, context):
+def page_buttons(prefix: str, page) -> list:
+    """Prev/next inline buttons carrying the page cursors"""
+    row = []
+    if page.prev_cursor:
+        row.append(InlineKeyboardButton("⬅️ Oldingi", callback_data=f'{prefix}p_{page.prev_cursor}'))
+    if page.next_cursor:
+        row.append(InlineKeyboardButton("Keyingi ➡️", callback_data=f'{prefix}n_{page.next_cursor}'))
+    return [row] if row else []
+
+def parse_page_callback(data: str, prefix: str):
+    """'admin_users_page_n_<cursor>' -> ('<cursor>', False)"""
+    direction, cursor_token = data[len(prefix):].split('_', 1)
+    return cursor_token, direction == 'p'
+
+async def admin_users_list(query, context, cursor_token=None, backward=False):
     """Show users list for admin"""
-    users = get_all_users()
+    page = await adb.get_users_page(cursor_token, backward, limit=20)
     
-    if not users:
+    if not page.rows:
         await query.edit_message_text(
             "👥 Foydalanuvchilar ro'yxati bo'sh",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Orqaga", callback_data='admin_back')]])
@@ -1239,10 +1473,9 @@ async def admin_users_list(query, context):
     text = "👥 <b>Foydalanuvchilar ro'yxati:</b>\n\n"
     keyboard = []
     
-    for user in users[:20]:  # Show first 20 users
-        user_id_db, username, full_name, is_allowed, created_at = user
+    for user in page.rows:
+        user_id_db, username, full_name, is_allowed, created_at, is_admin_user = user
         status = "✅" if is_allowed else "❌"
-        is_admin_user = is_admin(user_id_db)
         admin_marker = " 👑" if is_admin_user else ""
         text += f"{status} <code>{user_id_db}</code> - {full_name} (@{username}){admin_marker}\n"
         
@@ -1253,6 +1486,7 @@ async def admin_users_list(query, context):
             # Add button to make user admin
             keyboard.append([InlineKeyboardButton(f"👑 {full_name[:15]} ni admin qilish", callback_data=f'admin_add_user_{user_id_db}')])
     
+    keyboard += page_buttons('admin_users_page_', page)
     keyboard.append([InlineKeyboardButton("◀️ Orqaga", callback_data='admin_back')])
     
     await query.edit_message_text(
@@ -1261,6 +1495,85 @@ async def admin_users_list(query, context):
         parse_mode='HTML'
     )
 
+async def admin_files_list(query, context, cursor_token=None, backward=False):
+    """Show uploaded files for admin, one page at a time"""
+    try:
+        page = await adb.get_files_page(cursor_token, backward, limit=15)
+        
+        if not page.rows:
+            await query.edit_message_text(
+                "📂 <b>Fayllar ro'yxati bo'sh</b>\n\n"
+                "ℹ️ Hali hech kim fayl yuklamagan.\n"
+                "Foydalanuvchilar fayl yuk lagach, bu yerda ko'rsatiladi.",
+                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Orqaga", callback_data='admin_back')]]),
+                parse_mode='HTML'
+            )
+            return
+        
+        text = "📂 <b>Yuklangan fayllar:</b>\n\n"
+        
+        for file in page.rows:
+            file_id, file_name, file_url, file_type, file_size, service_used, uploaded_at, username, full_name = file
+            size_mb = file_size / (1024 * 1024)
+            service_name = SERVICE_NAMES.get(service_used, service_used)
+            text += f"📄 <b>{file_name}</b>\n"
+            text += f"👤 {full_name} (@{username})\n"
+            text += f"🔧 Xizmat: {service_name}\n"
+            text += f"📊 {size_mb:.2f} MB | {file_type.upper()}\n"
+            text += f"🔗 {file_url}\n"
+            text += f"📅 {uploaded_at}\n\n"
+        
+        keyboard = page_buttons('admin_files_page_', page)
+        keyboard.append([InlineKeyboardButton("◀️ Orqaga", callback_data='admin_back')])
+        
+        await query.edit_message_text(
+            text,
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode='HTML'
+        )
+    except Exception as e:
+        logger.error(f"Admin files panel error: {e}")
+        await query.edit_message_text(
+            f"❌ Xatolik yuz berdi: {str(e)}",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Orqaga", callback_data='admin_back')]])
+        )
+
+async def admin_add_list(query, context, cursor_token=None, backward=False):
+    """Show non-admin users that can be promoted, one page at a time"""
+    page = await adb.get_users_page(cursor_token, backward, limit=15, exclude_admins=True)
+    
+    if not page.rows and cursor_token is None:
+        await query.edit_message_text(
+            "👥 Foydalanuvchilar topilmadi.\n\n"
+            "Admin qo'shish uchun quyidagi usullardan birini tanlang:\n\n"
+            "1️⃣ Foydalanuvchi xabarni forward qiling va javob bering: <code>/add_admin</code>\n"
+            "2️⃣ Yoki foydalanuvchi ID sini yuboring: <code>/add_admin 123456789</code>",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Orqaga", callback_data='admin_list')]]),
+            parse_mode='HTML'
+        )
+        return
+    
+    text = "👑 <b>Admin qo'shish - Foydalanuvchini tanlang:</b>\n\n"
+    keyboard = []
+    
+    if not page.rows:
+        text += "⚠️ Barcha foydalanuvchilar allaqachon admin!"
+    else:
+        for user in page.rows:
+            user_id_db, username, full_name, is_allowed, created_at, _ = user
+            text += f"👤 <code>{user_id_db}</code> - {full_name} (@{username})\n"
+            button_text = f"➕ {full_name[:20]} ni admin qilish"
+            keyboard.append([InlineKeyboardButton(button_text, callback_data=f'admin_add_user_{user_id_db}')])
+    
+    keyboard += page_buttons('admin_add_page_', page)
+    keyboard.append([InlineKeyboardButton("◀️ Orqaga", callback_data='admin_list')])
+    
+    await query.edit_message_text(
+        text,
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode='HTML'
+    )
+
 async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle admin panel callbacks"""
     query = update.callback_query
@@ -1268,7 +1581,7 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     user_id = query.from_user.id
     
-    if not is_admin(user_id):
+    if not await adb.is_admin(user_id):
         await query.edit_message_text("❌ Ruxsat yo'q!")
         return
     
@@ -1279,73 +1592,29 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await admin_users_list(query, context)
     
     elif query.data == 'admin_files':
-        try:
-            files = get_all_files()
-            logger.info(f"Admin panel - files count: {len(files)}")
-            
-            if not files:
-                await query.edit_message_text(
-                    "📂 <b>Fayllar ro'yxati bo'sh</b>\n\n"
-                    "ℹ️ Hali hech kim fayl yuklamagan.\n"
-                    "Foydalanuvchilar fayl yuk lagach, bu yerda ko'rsatiladi.",
-                    reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Orqaga", callback_data='admin_back')]]),
-                    parse_mode='HTML'
-                )
-                return
-            
-            text = "📂 <b>Yuklangan fayllar:</b>\n\n"
-            
-            # Map service names to Uzbek
-            service_names = {
-                'file_upload': '📤 Fayl yuklash',
-                'pdf_to_word': '📄 PDF → Word',
-                'word_to_pdf': '📄 Word → PDF',
-                'qr_to_word': '🔲 QR → Word',
-                'qr_to_pdf': '🔲 QR → PDF'
-            }
-            
-            for file in files[:15]:  # Show first 15 files
-                file_id, file_name, file_url, file_type, file_size, service_used, uploaded_at, username, full_name = file
-                size_mb = file_size / (1024 * 1024)
-                service_name = service_names.get(service_used, service_used)
-                text += f"📄 <b>{file_name}</b>\n"
-                text += f"👤 {full_name} (@{username})\n"
-                text += f"🔧 Xizmat: {service_name}\n"
-                text += f"📊 {size_mb:.2f} MB | {file_type.upper()}\n"
-                text += f"🔗 {file_url}\n"
-                text += f"📅 {uploaded_at}\n\n"
-            
-            keyboard = [[InlineKeyboardButton("◀️ Orqaga", callback_data='admin_back')]]
-            
-            await query.edit_message_text(
-                text,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode='HTML'
-            )
-        except Exception as e:
-            logger.error(f"Admin files panel error: {e}")
-            await query.edit_message_text(
-                f"❌ Xatolik yuz berdi: {str(e)}",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Orqaga", callback_data='admin_back')]])
-            )
+        await admin_files_list(query, context)
+    
+    elif query.data.startswith('admin_files_page_'):
+        await admin_files_list(query, context, *parse_page_callback(query.data, 'admin_files_page_'))
+    
+    elif query.data.startswith('admin_users_page_'):
+        await admin_users_list(query, context, *parse_page_callback(query.data, 'admin_users_page_'))
+    
+    elif query.data.startswith('admin_add_page_'):
+        await admin_add_list(query, context, *parse_page_callback(query.data, 'admin_add_page_'))
     
     elif query.data.startswith('admin_toggle_'):
         # Show user detail page
         target_user_id = int(query.data.split('_')[2])
         
         # Get user info from database
-        users = get_all_users()
-        user_info = None
-        for user in users:
-            if user[0] == target_user_id:
-                user_info = user
-                break
+        user_info = await adb.get_user(target_user_id)
         
         if not user_info:
             await query.answer("❌ Foydalanuvchi topilmadi!")
             return
         
-        user_id_db, username, full_name, is_allowed, created_at = user_info
+        user_id_db, username, full_name, is_allowed, created_at, _ = user_info
         status = "✅ Ruxsat berilgan" if is_allowed else "❌ Ruxsat yo'q"
         
         text = (
@@ -1375,13 +1644,13 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         target_user_id = int(query.data.split('_')[2])
         
         # Check current status
-        is_allowed_now = is_user_allowed(target_user_id)
+        is_allowed_now = await adb.is_user_allowed(target_user_id)
         
         if is_allowed_now:
             await query.answer("ℹ️ Foydalanuvchi allaqachon ruxsat berilgan!", show_alert=True)
         else:
             # Grant permission
-            set_user_permission(target_user_id, True)
+            await adb.set_user_permission(target_user_id, True)
             
             # Send notification to user
             try:
@@ -1405,13 +1674,13 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         target_user_id = int(query.data.split('_')[2])
         
         # Check current status
-        is_allowed_now = is_user_allowed(target_user_id)
+        is_allowed_now = await adb.is_user_allowed(target_user_id)
         
         if not is_allowed_now:
             await query.answer("ℹ️ Foydalanuvchi allaqachon rad etilgan!", show_alert=True)
         else:
             # Deny permission
-            set_user_permission(target_user_id, False)
+            await adb.set_user_permission(target_user_id, False)
             
             # Send notification to user
             try:
@@ -1431,69 +1700,29 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await admin_users_list(query, context)
     
     elif query.data == 'admin_add':
-        # Show users list to add as admin
-        users = get_all_users()
-        
-        if not users:
-            await query.edit_message_text(
-                "👥 Foydalanuvchilar topilmadi.\n\n"
-                "Admin qo'shish uchun quyidagi usullardan birini tanlang:\n\n"
-                "1️⃣ Foydalanuvchi xabarni forward qiling va javob bering: <code>/add_admin</code>\n"
-                "2️⃣ Yoki foydalanuvchi ID sini yuboring: <code>/add_admin 123456789</code>",
-                reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Orqaga", callback_data='admin_list')]]),
-                parse_mode='HTML'
-            )
-            return
-        
-        text = "👑 <b>Admin qo'shish - Foydalanuvchini tanlang:</b>\n\n"
-        keyboard = []
-        
-        # Show users who are not admins
-        non_admin_users = [u for u in users[:15] if not is_admin(u[0])]
-        
-        if not non_admin_users:
-            text += "⚠️ Barcha foydalanuvchilar allaqachon admin!"
-        else:
-            for user in non_admin_users:
-                user_id_db, username, full_name, is_allowed, created_at = user
-                text += f"👤 <code>{user_id_db}</code> - {full_name} (@{username})\n"
-                button_text = f"➕ {full_name[:20]} ni admin qilish"
-                keyboard.append([InlineKeyboardButton(button_text, callback_data=f'admin_add_user_{user_id_db}')])
-        
-        keyboard.append([InlineKeyboardButton("◀️ Orqaga", callback_data='admin_list')])
-        
-        await query.edit_message_text(
-            text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
-            parse_mode='HTML'
-        )
+        await admin_add_list(query, context)
     
     elif query.data.startswith('admin_add_user_'):
         # Add admin from user list
         target_user_id = int(query.data.split('_')[3])
         
         # Get user info
-        users = get_all_users()
-        user_info = None
-        for user in users:
-            if user[0] == target_user_id:
-                user_info = user
-                break
+        user_info = await adb.get_user(target_user_id)
         
         if not user_info:
             await query.answer("❌ Foydalanuvchi topilmadi!", show_alert=True)
             return
         
-        user_id_db, username, full_name, is_allowed, created_at = user_info
+        user_id_db, username, full_name = user_info.user_id, user_info.username, user_info.full_name
         
         # Check if already admin
-        if is_admin(user_id_db):
+        if user_info.is_admin:
             await query.answer("ℹ️ Bu foydalanuvchi allaqachon admin!", show_alert=True)
             await admin_list_admins(query, context)
             return
         
         # Add as admin
-        add_admin(user_id_db, username, full_name, user_id)
+        await adb.add_admin(user_id_db, username, full_name, user_id)
         
         await query.answer("✅ Admin qo'shildi!", show_alert=True)
         await admin_list_admins(query, context)
@@ -1503,20 +1732,21 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         target_user_id = int(query.data.split('_')[2])
         
         # Don't allow removing yourself if you're the only admin
-        admins = get_all_admins()
+        admins = await adb.get_all_admins()
         if len(admins) <= 1 and target_user_id == user_id:
             await query.answer("❌ Oxirgi adminni o'chirib bo'lmaydi!", show_alert=True)
             await admin_list_admins(query, context)
             return
         
         # Remove admin
-        remove_admin(target_user_id)
+        await adb.remove_admin(target_user_id)
         
         await query.answer("✅ Admin o'chirildi!", show_alert=True)
         await admin_list_admins(query, context)
     
     elif query.data == 'admin_back':
-        stats = get_stats()
+        stats = await adb.get_stats()
+        cache = await adb.get_result_cache_stats()
         
         text = (
             "🔱 <b>ADMIN PANEL</b>\n\n"
@@ -1524,7 +1754,9 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"✅ Ruxsat berilganlar: {stats['allowed_users']}\n"
             f"👑 Jami adminlar: {stats['total_admins']}\n"
             f"📁 Jami fayllar: {stats['total_files']}\n"
-            f"💾 Jami hajm: {stats['total_size'] / (1024*1024):.2f} MB\n\n"
+            f"💾 Jami hajm: {stats['total_size'] / (1024*1024):.2f} MB\n"
+            f"♻️ Natija keshi: {cache['hits']} hit / {cache['misses']} miss, "
+            f"{cache['entries']} yozuv, {cache['bytes'] / (1024*1024):.2f} MB\n\n"
             "Quyidagi amallardan birini tanlang:"
         )
         
@@ -1544,52 +1776,89 @@ async def admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif query.data == 'admin_close':
         await query.edit_message_text("✅ Admin panel yopildi")
 
-def main():
+async def on_startup(application: Application):
+    """Start long-lived workers before polling begins"""
+    if DB_WRITE_BEHIND:
+        start_write_behind()
+    if not JOB_QUEUE:
+        # Navbat rejimida konvertatsiyalarni worker.py bajaradi; kerak bo'lsa pool o'zi ishga tushadi
+        await libreoffice_pool.start()
+
+async def on_stop(application: Application):
+    """Let background status edits finish while the bot can still send them"""
+    await drain_replies()
+
+async def on_shutdown(application: Application):
+    """Stop background workers when the bot shuts down"""
+    conversion_pool.shutdown(wait=False)
+    await libreoffice_pool.stop()
+    stop_write_behind()
+    close_connections()
+
+def build_application() -> Application:
+    """Create the application with all handlers registered"""
+    builder = Application.builder().token(TELEGRAM_BOT_TOKEN)
+    settings = bot_api_settings()
+    if settings:
+        # O'z telegram-bot-api serverimiz: get_file diskdagi yo'lni beradi
+        builder = (builder.base_url(settings['base_url']).base_file_url(settings['base_file_url'])
+                   .local_mode(settings['local_mode']))
+    application = (
+        builder
+        .concurrent_updates(ChatOrderedUpdateProcessor())
+        .rate_limiter(rate_limiter())
+        .post_init(on_startup)
+        .post_stop(on_stop)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+    
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("admin", admin_panel))
+    application.add_handler(CommandHandler("add_admin", add_admin_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(CallbackQueryHandler(button_callback))
+    application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
+    application.add_handler(MessageHandler(filters.PHOTO, handle_photo))
+    
+    application.add_error_handler(error_handler)
+    return application
+
+def main(mode: str = BOT_MODE):
     """Main function to run the bot"""
-    print(f"Bot main() funksiyasi ishga tushdi...")
+    print(f"Bot main() funksiyasi ishga tushdi ({mode} rejimi)...")
     print(f"TELEGRAM_BOT_TOKEN: {TELEGRAM_BOT_TOKEN[:10] if TELEGRAM_BOT_TOKEN else 'None'}...")
     
-    # File server ni alohida thread da ishga tushirish
-    import threading
-    import time
+    has_token = TELEGRAM_BOT_TOKEN and TELEGRAM_BOT_TOKEN != 'YOUR_BOT_TOKEN_HERE'
+    if mode == 'webhook':
+        import web_server
+        
+        if not has_token:
+            print("XATOLIK: TELEGRAM_BOT_TOKEN topilmadi, faqat file server ishlaydi")
+            web_server.serve(port=PORT)
+            return
+        
+        # Bitta aiohttp server: webhook va /files bir portda
+        webhook_url = WEBHOOK_URL or f"{get_base_url()}{WEBHOOK_PATH}"
+        print(f"Bot ishga tushdi! Webhook: {webhook_url}, port: {PORT}")
+        asyncio.run(web_server.run(build_application(), webhook_url, port=PORT))
+        return
     
-    def start_file_server():
-        """File server ni ishga tushirish"""
-        print("File server ishga tushmoqda...")
-        try:
-            # PORT ni to'g'ridan-to'g'ri olish
-            port = int(os.getenv('PORT', '5000'))
-            print(f"File server port: {port}")
-            
-            import file_server
-            file_server.app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
-        except Exception as e:
-            print(f"File server xatoligi: {e}")
-            import traceback
-            traceback.print_exc()
+    # File server ni alohida jarayonda ishga tushirish (gunicorn, bir nechta worker)
+    import time
+    import file_server
     
-    # File server ni background da ishga tushirish
-    file_server_thread = threading.Thread(target=start_file_server, daemon=True)
-    file_server_thread.start()
+    print(f"File server port: {PORT}")
+    file_server.start_background(PORT)
     time.sleep(2)
     
-    if not TELEGRAM_BOT_TOKEN or TELEGRAM_BOT_TOKEN == 'YOUR_BOT_TOKEN_HERE':
+    if not has_token:
         print("XATOLIK: TELEGRAM_BOT_TOKEN muhit o'zgaruvchisi topilmadi!")
         print("Botni ishga tushirish uchun Telegram Bot Token kerak.")
         print("config.py faylida TELEGRAM_BOT_TOKEN ni o'rnating.")
         return
     
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-    
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("admin", admin_panel))
-    application.add_handler(CommandHandler("add_admin", add_admin_command))
-    application.add_handler(CallbackQueryHandler(button_callback))
-    application.add_handler(MessageHandler(filters.Document.ALL, handle_document))
-    application.add_handler(MessageHandler(filters.PHOTO, handle_photo))
-    
-    application.add_error_handler(error_handler)
-    
+    application = build_application()
     print("Bot ishga tushdi! Fayllarni qabul qilish uchun tayyor...")
     application.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
 
@@ -0,0 +1,69 @@
+"""
+Kichik in-memory LRU kesh (ixtiyoriy TTL bilan)
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with an optional time-to-live per entry.
+
+    ``version`` is bumped on every invalidation. A caller that loads a value
+    from the database can pass the version it saw before the load to
+    ``set``; the value is dropped if an invalidation happened in between, so
+    a slow reader cannot resurrect stale data.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, version: int = None) -> bool:
+        with self._lock:
+            if version is not None and version != self.version:
+                return False
+            expires = time.monotonic() + self.ttl if self.ttl else None
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return True
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self.version += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.version += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
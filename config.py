@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -25,15 +26,93 @@ HOST = os.getenv('HOST', '0.0.0.0')
 if RAILWAY_URL:
     PORT = int(os.getenv('PORT', '5000'))
 
+# Bot mode: polling (long-poll + gunicorn file server) or webhook (one
+# aiohttp server on PORT for both Telegram updates and /files)
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # empty = public domain + WEBHOOK_PATH
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')  # empty = derived from the bot token
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
 # Database Configuration
 DB_FILE = os.getenv('DB_FILE', 'bot_database.db')
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))  # page cache per connection
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)))
+DB_THREADS = int(os.getenv('DB_THREADS', '4'))  # threads behind the async facade
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', '10000'))  # cached users
+AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', '300'))  # seconds
+
+# Write-behind queue for user upserts and file records
+DB_WRITE_BEHIND = os.getenv('DB_WRITE_BEHIND', 'true').lower() == 'true'
+DB_FLUSH_INTERVAL_MS = int(os.getenv('DB_FLUSH_INTERVAL_MS', '200'))
+DB_FLUSH_MAX_ROWS = int(os.getenv('DB_FLUSH_MAX_ROWS', '500'))
+DB_WRITE_JOURNAL_DIR = os.getenv('DB_WRITE_JOURNAL_DIR', 'db_journal')  # empty = no crash journal
+DB_JOURNAL_FSYNC = os.getenv('DB_JOURNAL_FSYNC', 'false').lower() == 'true'
+
+# Self-hosted telegram-bot-api server started with --local, e.g. http://localhost:8081
+# (must share the filesystem with the bot). Empty = cloud Bot API.
+LOCAL_BOT_API_URL = os.getenv('LOCAL_BOT_API_URL', '').rstrip('/')
 
 # File Upload Configuration
-MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', '20971520'))  # 20MB
+# Cloud Bot API serves downloads up to 20MB, a local server up to 2000MB
+MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', str((2000 if LOCAL_BOT_API_URL else 20) * 1024 * 1024)))
 UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
 QR_FOLDER = os.getenv('QR_FOLDER', 'qr_codes')
+# Draw stamped QR codes as vector paths/shapes instead of embedding a PNG
+QR_VECTOR = os.getenv('QR_VECTOR', 'true').lower() == 'true'
+QR_CACHE_SIZE = int(os.getenv('QR_CACHE_SIZE', '512'))  # rendered QR codes kept in memory
+# Confirm old QR images by actually decoding them (needs OpenCV)
+QR_DETECT_DECODE = os.getenv('QR_DETECT_DECODE', 'true').lower() == 'true'
+# QR stamping works on in-memory bytes; larger inputs are spilled to disk
+PIPELINE_SPILL_BYTES = int(os.getenv('PIPELINE_SPILL_BYTES', str(10 * 1024 * 1024)))
+# Content-addressed storage (sha256), on the same volume as UPLOAD_FOLDER
+BLOB_FOLDER = os.getenv('BLOB_FOLDER', os.path.join(UPLOAD_FOLDER, '.blobs'))
+# Unreferenced blobs stored (or stored again) more recently than this are not deleted:
+# an upload of the same content may be about to reference them
+BLOB_GC_GRACE_SECONDS = int(os.getenv('BLOB_GC_GRACE_SECONDS', '3600'))
+# Converted/QR results reused when the same document is sent again
+# (the limit covers outputs only the cache refers to; published files keep their links)
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+# Links and QR codes use /f/<code> instead of /files/<uuid>.<ext>
+SHORT_URLS = os.getenv('SHORT_URLS', 'true').lower() == 'true'
+SHORT_CODE_LENGTH = int(os.getenv('SHORT_CODE_LENGTH', '9'))  # 36^9 ~ 1e14 codes
 
 # Allowed File Extensions
 ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 
     'pdf,docx,doc,xlsx,xls,jpg,jpeg,png,gif,bmp,zip,rar,7z,txt,pptx,ppt'
 ).split(','))
+
+# Conversion Pool Configuration
+CONVERSION_WORKERS = int(os.getenv('CONVERSION_WORKERS', str(min(4, os.cpu_count() or 1))))
+CONVERSION_TIMEOUT = int(os.getenv('CONVERSION_TIMEOUT', '300'))  # seconds per job
+CONVERSION_MAX_TASKS_PER_WORKER = int(os.getenv('CONVERSION_MAX_TASKS_PER_WORKER', '20'))
+# PDF -> Word: shu sahifadan ko'p PDF lar sahifa oraliqlariga bo'linib parallel konvertatsiya qilinadi
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '30'))
+PDF_CHUNK_PAGES = int(os.getenv('PDF_CHUNK_PAGES', '10'))
+
+# Update processing: different chats in parallel, each chat's updates in order
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '32'))
+# Hujjat/rasm update lari (konvertatsiya, QR) uchun alohida chegara
+HEAVY_UPDATE_CONCURRENCY = int(os.getenv('HEAVY_UPDATE_CONCURRENCY', str(CONVERSION_WORKERS * 2)))
+UPDATE_MAX_PENDING = int(os.getenv('UPDATE_MAX_PENDING', '1024'))
+
+# Replies: status edits go out in the background, progress edits at most once per interval
+STATUS_EDIT_INTERVAL = float(os.getenv('STATUS_EDIT_INTERVAL', '1.5'))  # seconds
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))  # 429 RetryAfter retries
+
+# Job queue: with JOB_QUEUE=true the bot only enqueues conversions and
+# `python worker.py` processes (one or more, on any machine sharing DB_FILE and BLOB_FOLDER)
+JOB_QUEUE = os.getenv('JOB_QUEUE', 'false').lower() == 'true'
+JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', str(CONVERSION_WORKERS)))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '60'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', '5'))
+JOB_RETRY_MAX_SECONDS = float(os.getenv('JOB_RETRY_MAX_SECONDS', '300'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))
+
+# LibreOffice Pool Configuration
+LIBREOFFICE_INSTANCES = int(os.getenv('LIBREOFFICE_INSTANCES', '2'))
+LIBREOFFICE_MODE = os.getenv('LIBREOFFICE_MODE', 'auto')  # auto, uno, cli
+LIBREOFFICE_BASE_PORT = int(os.getenv('LIBREOFFICE_BASE_PORT', '2002'))
+LIBREOFFICE_TIMEOUT = int(os.getenv('LIBREOFFICE_TIMEOUT', '60'))  # seconds per file
+LIBREOFFICE_PROFILE_DIR = os.getenv('LIBREOFFICE_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'soffice_pool'))
@@ -0,0 +1,150 @@
+"""
+Konvertatsiya jarayonlari uchun process pool
+
+pdf2docx, PyMuPDF va python-docx ishlari to'liq sinxron va CPU ni band qiladi.
+Ular bot event loop ichida bajarilsa, boshqa foydalanuvchilarning tugmalari
+ham kutib qoladi. Shu sababli bu ishlar cheklangan ProcessPoolExecutor ga
+yuboriladi:
+
+- har bir ish uchun vaqt chegarasi (worker ichida SIGALRM, tashqarida
+  asyncio.wait_for zaxira sifatida)
+- har N ta ishdan keyin worker qayta yaratiladi (pdf2docx xotira o'sishini
+  cheklash uchun)
+- worker qulasa (BrokenProcessPool) pool avtomatik qayta yaratiladi
+"""
+import asyncio
+import logging
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import (
+    CONVERSION_WORKERS, CONVERSION_TIMEOUT, CONVERSION_MAX_TASKS_PER_WORKER
+)
+
+logger = logging.getLogger(__name__)
+
+# Worker ichidagi SIGALRM ishlamay qolsa (masalan, C kod ichida osilib qolsa),
+# event loop shuncha soniya ko'proq kutadi va keyin poolni qayta yaratadi
+TIMEOUT_GRACE = 10
+
+
+class ConversionTimeout(Exception):
+    """Raised when a job exceeds its time limit"""
+
+
+class _AlarmExpired(BaseException):
+    """SIGALRM inside a worker.
+
+    Derives from BaseException so that broad ``except Exception`` blocks in
+    pdf2docx (ignore_page_error) cannot swallow it and keep converting;
+    _run_with_timeout turns it into ConversionTimeout for the caller.
+    """
+
+
+def _raise_timeout(signum, frame):
+    raise _AlarmExpired()
+
+
+def _run_with_timeout(func, timeout, args, kwargs):
+    """Run func inside the worker process with a SIGALRM based time limit"""
+    use_alarm = timeout and hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.alarm(int(timeout))
+    try:
+        return func(*args, **kwargs)
+    except _AlarmExpired:
+        raise ConversionTimeout() from None
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+class ConversionPool:
+    """Bounded process pool for CPU-heavy document jobs"""
+
+    def __init__(self, max_workers: int, max_tasks_per_child: int, timeout: int):
+        self.max_workers = max(1, max_workers)
+        self.max_tasks_per_child = max_tasks_per_child or None
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # max_tasks_per_child fork bilan ishlamaydi, spawn esa thread'lar
+        # (file server, asyncio) bor jarayonda ham xavfsiz
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            max_tasks_per_child=self.max_tasks_per_child,
+        )
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+                logger.info(
+                    f"Conversion pool ishga tushdi: {self.max_workers} worker, "
+                    f"har {self.max_tasks_per_child} ishdan keyin qayta yaratiladi"
+                )
+            return self._executor
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replace a broken or hung executor and kill its processes"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = None
+        processes = list((getattr(broken, '_processes', None) or {}).values())
+        broken.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.kill()
+        logger.warning("Conversion pool qayta yaratildi")
+
+    async def run(self, func, *args, timeout: int = None, **kwargs):
+        """Run func(*args, **kwargs) in a worker process and await the result"""
+        timeout = self.timeout if timeout is None else timeout
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_run_with_timeout, func, timeout, args, kwargs)
+        except BrokenProcessPool:
+            self._restart(executor)
+            executor = self._get_executor()
+            future = executor.submit(_run_with_timeout, func, timeout, args, kwargs)
+
+        try:
+            if timeout:
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout + TIMEOUT_GRACE)
+            return await asyncio.wrap_future(future)
+        except asyncio.TimeoutError:
+            logger.error(f"{func.__name__} {timeout}s ichida tugamadi, worker to'xtatilmoqda")
+            self._restart(executor)
+            raise ConversionTimeout()
+        except BrokenProcessPool:
+            logger.error(f"{func.__name__} bajarilayotganda worker qulab tushdi")
+            self._restart(executor)
+            raise
+
+    def shutdown(self, wait: bool = True):
+        """Stop all workers (called on bot shutdown)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+pool = ConversionPool(
+    max_workers=CONVERSION_WORKERS,
+    max_tasks_per_child=CONVERSION_MAX_TASKS_PER_WORKER,
+    timeout=CONVERSION_TIMEOUT,
+)
+
+
+async def run_conversion(func, *args, **kwargs):
+    """Run a document job in the shared conversion pool"""
+    return await pool.run(func, *args, **kwargs)
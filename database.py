@@ -1,16 +1,213 @@
 import sqlite3
 import os
 import shutil
+import asyncio
+import atexit
+import functools
+import json
+import re
+import secrets
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, List, Tuple
+from collections import namedtuple
+from typing import Callable, Optional, List, Tuple, Dict
 
-DB_FILE = 'bot_database.db'
+from config import (
+    DB_FILE, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_THREADS,
+    AUTH_CACHE_SIZE, AUTH_CACHE_TTL,
+    DB_FLUSH_INTERVAL_MS, DB_FLUSH_MAX_ROWS, DB_WRITE_JOURNAL_DIR, DB_JOURNAL_FSYNC,
+    RESULT_CACHE_MAX_BYTES, SHORT_CODE_LENGTH
+)
+from cache import LRUCache
+from db_writer import WriteBehindWriter
 
-def init_database():
-    """Initialize database with required tables"""
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
+# Per-connection pragmas. WAL lets readers run while a write commits and
+# synchronous=NORMAL only fsyncs at checkpoints, which is still durable
+# against application crashes in WAL mode.
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}',
+    f'PRAGMA mmap_size={DB_MMAP_SIZE}',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+# Compiled statements kept per connection (sqlite3 reuses them by SQL text)
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+
+def get_connection() -> sqlite3.Connection:
+    """Return this thread's long-lived connection, opening it on first use"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB_FILE:
+        conn = sqlite3.connect(DB_FILE, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        _local.conn = conn
+        _local.path = DB_FILE
+        with _connections_lock:
+            _connections.append(conn)
+    elif conn.in_transaction:
+        # Oldingi chaqiruv xatolik bilan tugagan - yarim tranzaksiyani bekor qilish
+        conn.rollback()
+    return conn
+
+def close_connections():
+    """Close every pooled connection (on shutdown)"""
+    with _connections_lock:
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.__dict__.clear()
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix='db')
+
+class AsyncDatabase:
+    """Awaitable facade over this module's functions.
+
+    ``await adb.is_admin(user_id)`` runs ``is_admin`` on a small dedicated
+    thread pool whose threads each hold a pooled connection, so handlers
+    never block the event loop on SQLite.
+    """
+
+    def __getattr__(self, name):
+        func = globals().get(name)
+        if name.startswith('_') or not callable(func):
+            raise AttributeError(name)
+
+        @functools.wraps(func)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
+
+        setattr(self, name, call)
+        return call
+
+adb = AsyncDatabase()
+
+# Write-behind queue for user upserts and file records (see db_writer.py).
+# While it is running those writes are batched; everything else stays direct.
+_writer = None
+
+def start_write_behind() -> WriteBehindWriter:
+    """Start batching user upserts and file inserts (replays the journal first)"""
+    global _writer
+    if _writer is None:
+        _writer = WriteBehindWriter(
+            get_connection,
+            flush_interval_ms=DB_FLUSH_INTERVAL_MS,
+            max_rows=DB_FLUSH_MAX_ROWS,
+            journal_dir=DB_WRITE_JOURNAL_DIR,
+            journal_fsync=DB_JOURNAL_FSYNC,
+        )
+        _writer.start()
+        atexit.register(stop_write_behind)
+    return _writer
+
+def stop_write_behind():
+    """Flush queued writes and stop the background writer"""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+
+def flush_writes():
+    """Write queued rows now, so a following direct write sees them"""
+    if _writer is not None:
+        _writer.flush()
+
+# Authorization cache: user_id -> AuthEntry. Permissions change a few times
+# a day, so require_permission answers from memory and only touches SQLite
+# on a miss, on expiry, or when the user's profile name changed.
+AuthEntry = namedtuple('AuthEntry', 'username full_name is_allowed is_admin')
+_auth_cache = LRUCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+# Admin lookups by id: user_id -> UserRow, invalidated together with the
+# auth cache on every write touching the user.
+UserRow = namedtuple('UserRow', 'user_id username full_name is_allowed created_at is_admin')
+_user_cache = LRUCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+def _invalidate_user(user_id: int):
+    """Drop cached state for a user after a write"""
+    _auth_cache.invalidate(user_id)
+    _user_cache.invalidate(user_id)
+
+# Triggers keeping stats, stats_service and stats_daily in step with every
+# write path (including the write-behind flusher and manual SQL). Upserts
+# must use ON CONFLICT DO UPDATE: INSERT OR REPLACE skips DELETE triggers.
+STATS_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_users_insert AFTER INSERT ON users BEGIN
+        UPDATE stats SET total_users = total_users + 1,
+                         allowed_users = allowed_users + (NEW.is_allowed IS 1)
+        WHERE id = 1;
+        INSERT INTO stats_daily (day, new_users) VALUES (date(NEW.created_at), 1)
+        ON CONFLICT(day) DO UPDATE SET new_users = new_users + 1;
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_users_delete AFTER DELETE ON users BEGIN
+        UPDATE stats SET total_users = total_users - 1,
+                         allowed_users = allowed_users - (OLD.is_allowed IS 1)
+        WHERE id = 1;
+        UPDATE stats_daily SET new_users = new_users - 1 WHERE day = date(OLD.created_at);
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_users_allowed AFTER UPDATE OF is_allowed ON users
+    WHEN (NEW.is_allowed IS 1) != (OLD.is_allowed IS 1) BEGIN
+        UPDATE stats SET allowed_users = allowed_users + (NEW.is_allowed IS 1) - (OLD.is_allowed IS 1)
+        WHERE id = 1;
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_admins_insert AFTER INSERT ON admins BEGIN
+        UPDATE stats SET total_admins = total_admins + 1 WHERE id = 1;
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_admins_delete AFTER DELETE ON admins BEGIN
+        UPDATE stats SET total_admins = total_admins - 1 WHERE id = 1;
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_files_insert AFTER INSERT ON files BEGIN
+        UPDATE stats SET total_files = total_files + 1,
+                         total_size = total_size + IFNULL(NEW.file_size, 0)
+        WHERE id = 1;
+        INSERT INTO stats_service (service_used, files, bytes)
+        VALUES (IFNULL(NEW.service_used, 'file_upload'), 1, IFNULL(NEW.file_size, 0))
+        ON CONFLICT(service_used) DO UPDATE SET files = files + 1, bytes = bytes + excluded.bytes;
+        INSERT INTO stats_daily (day, files, bytes) VALUES (date(NEW.uploaded_at), 1, IFNULL(NEW.file_size, 0))
+        ON CONFLICT(day) DO UPDATE SET files = files + 1, bytes = bytes + excluded.bytes;
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_files_delete AFTER DELETE ON files BEGIN
+        UPDATE stats SET total_files = total_files - 1,
+                         total_size = total_size - IFNULL(OLD.file_size, 0)
+        WHERE id = 1;
+        UPDATE stats_service SET files = files - 1, bytes = bytes - IFNULL(OLD.file_size, 0)
+        WHERE service_used = IFNULL(OLD.service_used, 'file_upload');
+        UPDATE stats_daily SET files = files - 1, bytes = bytes - IFNULL(OLD.file_size, 0)
+        WHERE day = date(OLD.uploaded_at);
+    END;
+    ''',
+]
+
+def _migration_initial_schema(cursor):
+    """Base tables (no-op on databases created before versioning)"""
     # Users table - track who can use the bot
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -44,25 +241,240 @@ def init_database():
             file_url TEXT,
             file_type TEXT,
             file_size INTEGER,
-            service_used TEXT DEFAULT 'file_upload',
             uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users (user_id)
         )
     ''')
-    
-    # Migration: Add service_used column if it doesn't exist
+
+def _migration_service_used(cursor):
+    """files.service_used column"""
     try:
-        cursor.execute("PRAGMA table_info(files)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'service_used' not in columns:
-            cursor.execute('ALTER TABLE files ADD COLUMN service_used TEXT DEFAULT "file_upload"')
-            # Backfill existing records
-            cursor.execute('UPDATE files SET service_used = "file_upload" WHERE service_used IS NULL')
+        cursor.execute("ALTER TABLE files ADD COLUMN service_used TEXT DEFAULT 'file_upload'")
+    except sqlite3.OperationalError as e:
+        # Versiyalashdan oldin yaratilgan bazalarda ustun allaqachon bor
+        if 'duplicate column' not in str(e):
+            raise
+    # Backfill existing records
+    cursor.execute("UPDATE files SET service_used = 'file_upload' WHERE service_used IS NULL")
+
+def _migration_indexes(cursor):
+    """Indexes for per-user history, admin listings and stats"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_files_user_uploaded ON files (user_id, uploaded_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_files_uploaded ON files (uploaded_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_files_service ON files (service_used)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_allowed ON users (is_allowed)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_admins_added ON admins (added_at)')
+
+def _migration_stats(cursor):
+    """Summary counters kept current by triggers"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_users INTEGER NOT NULL DEFAULT 0,
+            allowed_users INTEGER NOT NULL DEFAULT 0,
+            total_admins INTEGER NOT NULL DEFAULT 0,
+            total_files INTEGER NOT NULL DEFAULT 0,
+            total_size INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_service (
+            service_used TEXT PRIMARY KEY,
+            files INTEGER NOT NULL DEFAULT 0,
+            bytes INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_daily (
+            day TEXT PRIMARY KEY,
+            new_users INTEGER NOT NULL DEFAULT 0,
+            files INTEGER NOT NULL DEFAULT 0,
+            bytes INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for trigger in STATS_TRIGGERS:
+        cursor.execute(trigger)
+    _rebuild_stats(cursor)
+
+def _migration_blobs(cursor):
+    """Content-addressed blobs, public name aliases and files.blob"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS aliases (
+            name TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (sha256) REFERENCES blobs (sha256)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_aliases_sha256 ON aliases (sha256)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_blobs_ref_count ON blobs (ref_count)')
+    # Har bir alias blob'ga bitta havola
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS blobs_ref_insert AFTER INSERT ON aliases BEGIN
+            UPDATE blobs SET ref_count = ref_count + 1 WHERE sha256 = NEW.sha256;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS blobs_ref_delete AFTER DELETE ON aliases BEGIN
+            UPDATE blobs SET ref_count = ref_count - 1 WHERE sha256 = OLD.sha256;
+        END
+    ''')
+    try:
+        cursor.execute('ALTER TABLE files ADD COLUMN blob TEXT')
+    except sqlite3.OperationalError as e:
+        if 'duplicate column' not in str(e):
+            raise
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_files_blob ON files (blob)')
+
+def _migration_result_cache(cursor):
+    """Processed-result cache; each entry holds a reference on its blob"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS result_cache (
+            source_key TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            options TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            public_name TEXT NOT NULL,
+            file_name TEXT,
+            tg_file_id TEXT,
+            caption TEXT,
+            size INTEGER NOT NULL DEFAULT 0,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source_key, operation, options),
+            FOREIGN KEY (sha256) REFERENCES blobs (sha256)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_result_cache_used ON result_cache (last_used_at)')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS result_cache_ref_insert AFTER INSERT ON result_cache BEGIN
+            UPDATE blobs SET ref_count = ref_count + 1 WHERE sha256 = NEW.sha256;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS result_cache_ref_delete AFTER DELETE ON result_cache BEGIN
+            UPDATE blobs SET ref_count = ref_count - 1 WHERE sha256 = OLD.sha256;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS result_cache_ref_update AFTER UPDATE OF sha256 ON result_cache
+        WHEN NEW.sha256 != OLD.sha256 BEGIN
+            UPDATE blobs SET ref_count = ref_count - 1 WHERE sha256 = OLD.sha256;
+            UPDATE blobs SET ref_count = ref_count + 1 WHERE sha256 = NEW.sha256;
+        END
+    ''')
+
+def _migration_jobs(cursor):
+    """Durable conversion job queue; a queued or running job holds a
+    reference on its input blob"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            operation TEXT NOT NULL,
+            input_blob TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',
+            user_id INTEGER,
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER,
+            status_message_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            run_after REAL NOT NULL,
+            lease_owner TEXT,
+            lease_expires_at REAL,
+            enqueued_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            error TEXT,
+            FOREIGN KEY (input_blob) REFERENCES blobs (sha256)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, run_after)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at)')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS jobs_ref_insert AFTER INSERT ON jobs BEGIN
+            UPDATE blobs SET ref_count = ref_count + 1 WHERE sha256 = NEW.input_blob;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS jobs_ref_release AFTER UPDATE OF status ON jobs
+        WHEN NEW.status IN ('done', 'failed') AND OLD.status NOT IN ('done', 'failed') BEGIN
+            UPDATE blobs SET ref_count = ref_count - 1 WHERE sha256 = NEW.input_blob;
+        END
+    ''')
+
+def _migration_short_codes(cursor):
+    """Short codes for /f/<code> links to public file names"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS short_codes (
+            code TEXT PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+
+def _migration_counters(cursor):
+    """Counters shared by every process (bot and job workers)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+
+# Schema migrations, applied in order. PRAGMA user_version stores the last
+# applied version. Append new entries here; never edit an applied one.
+MIGRATIONS = [
+    (1, 'initial schema', _migration_initial_schema),
+    (2, 'files.service_used column', _migration_service_used),
+    (3, 'indexes for files, users and admins', _migration_indexes),
+    (4, 'stats summary tables and triggers', _migration_stats),
+    (5, 'blobs, aliases and files.blob', _migration_blobs),
+    (6, 'result cache', _migration_result_cache),
+    (7, 'job queue', _migration_jobs),
+    (8, 'short codes', _migration_short_codes),
+    (9, 'shared counters', _migration_counters),
+]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the last applied migration version"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn: sqlite3.Connection):
+    """Apply pending migrations, each in its own transaction"""
+    for version, description, apply in MIGRATIONS:
+        if version <= get_schema_version(conn):
+            continue
+        # IMMEDIATE - bir vaqtda ishga tushgan jarayonlar navbat bilan migratsiya qiladi
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version <= get_schema_version(conn):
+                conn.rollback()
+                continue
+            apply(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {version}')
             conn.commit()
-            print("✅ Migration: Added service_used column to files table")
-    except Exception as e:
-        print(f"⚠️ Migration warning: {e}")
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"✅ Migration {version}: {description}")
+
+def init_database():
+    """Initialize database with required tables"""
+    conn = get_connection()
+    migrate(conn)
+    cursor = conn.cursor()
     
     # Migration: Add initial admin from config if admins table is empty
     try:
@@ -82,11 +494,15 @@ def init_database():
         print(f"⚠️ Migration warning for admins: {e}")
     
     conn.commit()
-    conn.close()
 
 def add_or_update_user(user_id: int, username: str, full_name: str):
     """Add or update user in database"""
-    conn = sqlite3.connect(DB_FILE)
+    if _writer is not None:
+        _writer.upsert_user(user_id, username, full_name)
+        _invalidate_user(user_id)
+        return
+    
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -98,22 +514,64 @@ def add_or_update_user(user_id: int, username: str, full_name: str):
     ''', (user_id, username, full_name))
     
     conn.commit()
-    conn.close()
+    _invalidate_user(user_id)
+
+def peek_user_access(user_id: int, username: str, full_name: str) -> Optional[Tuple[bool, bool]]:
+    """Return cached (is_allowed, is_admin) without touching the database.
+
+    Returns None on a cache miss or when the profile name changed, in which
+    case the caller should fall back to get_user_access.
+    """
+    entry = _auth_cache.get(user_id)
+    if entry is None or entry.username != username or entry.full_name != full_name:
+        return None
+    return entry.is_allowed, entry.is_admin
+
+def _load_access(cursor, user_id: int):
+    """Read the user's profile row and admin flag"""
+    cursor.execute('SELECT username, full_name, is_allowed FROM users WHERE user_id = ?', (user_id,))
+    row = cursor.fetchone()
+    cursor.execute('SELECT EXISTS(SELECT 1 FROM admins WHERE user_id = ?)', (user_id,))
+    return row, cursor.fetchone()[0] == 1
+
+def get_user_access(user_id: int, username: str, full_name: str) -> Tuple[bool, bool]:
+    """Return (is_allowed, is_admin), upserting the user only if the profile changed"""
+    access = peek_user_access(user_id, username, full_name)
+    if access is not None:
+        return access
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    version = _auth_cache.version
+    row, admin = _load_access(cursor, user_id)
+    if row is None or row[0] != username or row[1] != full_name:
+        add_or_update_user(user_id, username, full_name)
+        version = _auth_cache.version
+        row, admin = _load_access(cursor, user_id)
+    
+    allowed = row is not None and row[2] == 1
+    _auth_cache.set(user_id, AuthEntry(username, full_name, allowed, admin), version=version)
+    return allowed, admin
 
 def is_user_allowed(user_id: int) -> bool:
     """Check if user has permission to use the bot"""
-    conn = sqlite3.connect(DB_FILE)
+    entry = _auth_cache.get(user_id)
+    if entry is not None:
+        return entry.is_allowed
+    
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('SELECT is_allowed FROM users WHERE user_id = ?', (user_id,))
     result = cursor.fetchone()
-    conn.close()
     
     return result[0] == 1 if result else False
 
 def set_user_permission(user_id: int, allowed: bool):
     """Grant or revoke user permission"""
-    conn = sqlite3.connect(DB_FILE)
+    flush_writes()
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -121,11 +579,11 @@ def set_user_permission(user_id: int, allowed: bool):
     ''', (1 if allowed else 0, user_id))
     
     conn.commit()
-    conn.close()
+    _invalidate_user(user_id)
 
 def get_all_users() -> List[Tuple]:
     """Get all users from database"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -135,27 +593,73 @@ def get_all_users() -> List[Tuple]:
     ''')
     
     users = cursor.fetchall()
-    conn.close()
     
     return users
 
+USER_ROW_SQL = '''
+    SELECT u.user_id, u.username, u.full_name, u.is_allowed, u.created_at,
+           a.user_id IS NOT NULL AS is_admin
+    FROM users u
+    LEFT JOIN admins a ON a.user_id = u.user_id
+'''
+
+def _user_row(row) -> UserRow:
+    user_id, username, full_name, is_allowed, created_at, admin = row
+    return UserRow(user_id, username, full_name, is_allowed == 1, created_at, admin == 1)
+
+def get_user(user_id: int) -> Optional[UserRow]:
+    """Look up one user by id (primary key), with the admin flag"""
+    return get_users([user_id]).get(user_id)
+
+def get_users(user_ids) -> Dict[int, UserRow]:
+    """Look up several users by id; missing ids are left out of the result"""
+    found = {}
+    missing = []
+    for user_id in dict.fromkeys(user_ids):
+        row = _user_cache.get(user_id)
+        if row is None:
+            missing.append(user_id)
+        else:
+            found[user_id] = row
+    if not missing:
+        return found
+    
+    # Navbatdagi upsert'lar ham ko'rinishi uchun
+    flush_writes()
+    version = _user_cache.version
+    conn = get_connection()
+    cursor = conn.cursor()
+    # SQLite bitta so'rovda 999 tagacha parametr qabul qiladi
+    for start in range(0, len(missing), 500):
+        chunk = missing[start:start + 500]
+        cursor.execute(f"{USER_ROW_SQL} WHERE u.user_id IN ({', '.join('?' * len(chunk))})", chunk)
+        for row in cursor.fetchall():
+            user = _user_row(row)
+            found[user.user_id] = user
+            _user_cache.set(user.user_id, user, version=version)
+    return found
+
 def add_file_record(user_id: int, file_name: str, file_path: str, file_url: str, 
-                   file_type: str, file_size: int, service_used: str = 'file_upload'):
+                   file_type: str, file_size: int, service_used: str = 'file_upload',
+                   blob: Optional[str] = None):
     """Add file upload record to database"""
-    conn = sqlite3.connect(DB_FILE)
+    if _writer is not None:
+        _writer.add_file_record(user_id, file_name, file_path, file_url, file_type, file_size, service_used, blob)
+        return
+    
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
-        INSERT INTO files (user_id, file_name, file_path, file_url, file_type, file_size, service_used)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (user_id, file_name, file_path, file_url, file_type, file_size, service_used))
+        INSERT INTO files (user_id, file_name, file_path, file_url, file_type, file_size, service_used, blob)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, file_name, file_path, file_url, file_type, file_size, service_used, blob))
     
     conn.commit()
-    conn.close()
 
 def get_all_files() -> List[Tuple]:
     """Get all files with user info"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -167,13 +671,12 @@ def get_all_files() -> List[Tuple]:
     ''')
     
     files = cursor.fetchall()
-    conn.close()
     
     return files
 
 def get_user_files(user_id: int) -> List[Tuple]:
     """Get all files uploaded by specific user"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -184,50 +687,155 @@ def get_user_files(user_id: int) -> List[Tuple]:
     ''', (user_id,))
     
     files = cursor.fetchall()
-    conn.close()
     
     return files
 
+# Keyset pagination. A cursor is the (timestamp, id) of a boundary row; it
+# is encoded compactly so it fits in Telegram's 64-byte callback_data.
+Page = namedtuple('Page', 'rows next_cursor prev_cursor')
+
+# CURRENT_TIMESTAMP and utc_timestamp() text, optionally with fractional seconds
+CURSOR_TIMESTAMP = re.compile(r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(\.\d+)?$')
+CURSOR_TYPES = {'s': str, 'f': float, 'i': int}
+
+def encode_cursor(timestamp, key: int) -> str:
+    """'2025-10-09 12:30:45', 42 -> '20251009123045.42'
+
+    The stored value must come back exactly, or rows at a page boundary
+    are skipped or repeated: fractional seconds stay as extra digits and
+    anything else travels tagged with its type ('f42:1728477045.25').
+    Tokens go into callback_data, so the usual case stays short.
+    """
+    if isinstance(timestamp, str) and CURSOR_TIMESTAMP.match(timestamp):
+        return f"{''.join(ch for ch in timestamp if ch.isdigit())}.{key}"
+    tag = {float: 'f', int: 'i'}.get(type(timestamp), 's')
+    value = repr(timestamp) if tag == 'f' else str(timestamp)
+    return f"{tag}{key}:{value}"
+
+def decode_cursor(token: str) -> Tuple[object, int]:
+    """Inverse of encode_cursor"""
+    if token[0] in CURSOR_TYPES:
+        key, value = token[1:].split(':', 1)
+        return CURSOR_TYPES[token[0]](value), int(key)
+    digits, key = token.split('.')
+    timestamp = f"{digits[0:4]}-{digits[4:6]}-{digits[6:8]} {digits[8:10]}:{digits[10:12]}:{digits[12:14]}"
+    if len(digits) > 14:
+        timestamp += f".{digits[14:]}"
+    return timestamp, int(key)
+
+def _keyset_page(cursor, select_sql: str, where: List[str], order_columns: Tuple[str, str],
+                 cursor_token: Optional[str], backward: bool, limit: int, cursor_of) -> Page:
+    """Fetch one page ordered newest first, before/after cursor_token"""
+    conditions = list(where)
+    params = []
+    columns = f"({order_columns[0]}, {order_columns[1]})"
+    if cursor_token:
+        conditions.append(f"{columns} {'>' if backward else '<'} (?, ?)")
+        params.extend(decode_cursor(cursor_token))
+    direction = 'ASC' if backward else 'DESC'
+    sql = select_sql
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += f' ORDER BY {order_columns[0]} {direction}, {order_columns[1]} {direction} LIMIT ?'
+    params.append(limit + 1)
+    
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    if not rows:
+        return Page([], None, None)
+    
+    first, last = cursor_of(rows[0]), cursor_of(rows[-1])
+    if backward:
+        return Page(rows, last if cursor_token else None, first if has_more else None)
+    return Page(rows, last if has_more else None, first if cursor_token else None)
+
+def get_files_page(cursor_token: Optional[str] = None, backward: bool = False, limit: int = 15) -> Page:
+    """One page of files with uploader info, newest first (keyset on uploaded_at, id)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    return _keyset_page(
+        cursor,
+        '''
+        SELECT f.id, f.file_name, f.file_url, f.file_type, f.file_size,
+               f.service_used, f.uploaded_at, u.username, u.full_name
+        FROM files f
+        JOIN users u ON f.user_id = u.user_id
+        ''',
+        [], ('f.uploaded_at', 'f.id'),
+        cursor_token, backward, limit,
+        lambda row: encode_cursor(row[6], row[0])
+    )
+
+def get_users_page(cursor_token: Optional[str] = None, backward: bool = False, limit: int = 20,
+                   exclude_admins: bool = False) -> Page:
+    """One page of users as UserRow, newest first (keyset on created_at, user_id).
+
+    The admin flag comes from a LEFT JOIN instead of one is_admin() per row.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    page = _keyset_page(
+        cursor, USER_ROW_SQL,
+        ['a.user_id IS NULL'] if exclude_admins else [], ('u.created_at', 'u.user_id'),
+        cursor_token, backward, limit,
+        lambda row: encode_cursor(row[4], row[0])
+    )
+    return page._replace(rows=[_user_row(row) for row in page.rows])
+
 def is_admin(user_id: int) -> bool:
     """Check if user is admin"""
-    conn = sqlite3.connect(DB_FILE)
+    entry = _auth_cache.get(user_id)
+    if entry is not None:
+        return entry.is_admin
+    
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('SELECT COUNT(*) FROM admins WHERE user_id = ?', (user_id,))
     result = cursor.fetchone()[0]
-    conn.close()
     
     return result > 0
 
 def add_admin(user_id: int, username: str, full_name: str, added_by: int):
     """Add admin to database"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection()
     cursor = conn.cursor()
     
     # First ensure user exists in users table
     add_or_update_user(user_id, username, full_name)
+    flush_writes()
     
     cursor.execute('''
-        INSERT OR REPLACE INTO admins (user_id, username, full_name, added_by)
+        INSERT INTO admins (user_id, username, full_name, added_by)
         VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            username = excluded.username,
+            full_name = excluded.full_name,
+            added_by = excluded.added_by
     ''', (user_id, username, full_name, added_by))
     
     conn.commit()
-    conn.close()
+    _invalidate_user(user_id)
 
 def remove_admin(user_id: int):
     """Remove admin from database"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('DELETE FROM admins WHERE user_id = ?', (user_id,))
     
     conn.commit()
-    conn.close()
+    _invalidate_user(user_id)
 
 def get_all_admins() -> List[Tuple]:
     """Get all admins from database"""
-    conn = sqlite3.connect(DB_FILE)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -237,38 +845,627 @@ def get_all_admins() -> List[Tuple]:
     ''')
     
     admins = cursor.fetchall()
-    conn.close()
     
     return admins
 
-def get_stats() -> dict:
-    """Get database statistics"""
-    conn = sqlite3.connect(DB_FILE)
+# Public file name -> sha256. An alias never points elsewhere once created,
+# so resolved names are cached without a TTL.
+_alias_cache = LRUCache(maxsize=AUTH_CACHE_SIZE)
+
+def add_alias(name: str, sha256: str, size: int):
+    """Register a stored blob (if new) and a public name pointing at it"""
+    conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT COUNT(*) FROM users')
-    total_users = cursor.fetchone()[0]
+    cursor.execute('INSERT OR IGNORE INTO blobs (sha256, size) VALUES (?, ?)', (sha256, size))
+    cursor.execute('INSERT INTO aliases (name, sha256) VALUES (?, ?)', (name, sha256))
     
-    cursor.execute('SELECT COUNT(*) FROM users WHERE is_allowed = 1')
-    allowed_users = cursor.fetchone()[0]
+    conn.commit()
+
+def resolve_alias(name: str) -> Optional[str]:
+    """Return the sha256 behind a public file name, or None"""
+    sha256 = _alias_cache.get(name)
+    if sha256 is not None:
+        return sha256
     
-    cursor.execute('SELECT COUNT(*) FROM files')
-    total_files = cursor.fetchone()[0]
+    conn = get_connection()
+    cursor = conn.cursor()
     
-    cursor.execute('SELECT SUM(file_size) FROM files')
-    total_size = cursor.fetchone()[0] or 0
+    cursor.execute('SELECT sha256 FROM aliases WHERE name = ?', (name,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    _alias_cache.set(name, row[0])
+    return row[0]
+
+def remove_alias(name: str):
+    """Drop a public name; the blob's ref_count goes down by one"""
+    conn = get_connection()
+    cursor = conn.cursor()
     
+    cursor.execute('DELETE FROM aliases WHERE name = ?', (name,))
+    
+    conn.commit()
+    _alias_cache.invalidate(name)
+
+# Short codes never change or get reused, so both directions are cached
+# without a TTL
+_short_code_cache = LRUCache(maxsize=AUTH_CACHE_SIZE)
+_short_name_cache = LRUCache(maxsize=AUTH_CACHE_SIZE)
+# Upper case only: an upper-cased short link fits QR alphanumeric mode
+SHORT_CODE_ALPHABET = string.digits + string.ascii_uppercase
+
+def new_short_code(length: int = SHORT_CODE_LENGTH) -> str:
+    """Random code of digits and upper-case letters"""
+    return ''.join(secrets.choice(SHORT_CODE_ALPHABET) for _ in range(length))
+
+def short_code(name: str) -> str:
+    """Short code for a public file name, created on first use.
+
+    The name does not have to be registered yet: stamped documents need
+    their link before the result is stored.
+    """
+    code = _short_code_cache.get(name)
+    if code is not None:
+        return code
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT code FROM short_codes WHERE name = ?', (name,))
+    row = cursor.fetchone()
+    while row is None:
+        # Tasodifiy kod: ketma-ket raqamlardan farqli, havolalarni sanab chiqib bo'lmaydi
+        cursor.execute('INSERT OR IGNORE INTO short_codes (code, name) VALUES (?, ?)', (new_short_code(), name))
+        conn.commit()
+        cursor.execute('SELECT code FROM short_codes WHERE name = ?', (name,))
+        row = cursor.fetchone()
+    _short_code_cache.set(name, row[0])
+    _short_name_cache.set(row[0], name)
+    return row[0]
+
+def resolve_short_code(code: str) -> Optional[str]:
+    """Public file name behind a short code (any letter case), or None"""
+    code = code.upper()
+    name = _short_name_cache.get(code)
+    if name is not None:
+        return name
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT name FROM short_codes WHERE code = ?', (code,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    _short_name_cache.set(code, row[0])
+    return row[0]
+
+def set_file_blob(old_path: str, sha256: str, new_path: str) -> int:
+    """Point files rows stored at old_path to a blob; returns rows updated"""
+    flush_writes()
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('UPDATE files SET blob = ?, file_path = ? WHERE file_path = ?', (sha256, new_path, old_path))
+    
+    conn.commit()
+    return cursor.rowcount
+
+def get_orphan_blobs() -> List[Tuple]:
+    """(sha256, size) of blobs no alias points at any more"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT sha256, size FROM blobs WHERE ref_count <= 0')
+    
+    return cursor.fetchall()
+
+def _delete_orphan_blobs(cursor, sha256s, remove_file: Callable[[str], bool]) -> List[Tuple]:
+    """Delete the rows among sha256s that are still unreferenced.
+
+    Runs inside the caller's IMMEDIATE transaction, so no alias or job can
+    take a reference between the check and the unlink. remove_file(sha256)
+    unlinks the file and returns False to keep a blob that was just stored
+    again. Returns (sha256, size) of the blobs deleted.
+    """
+    deleted = []
+    for sha256 in sha256s:
+        cursor.execute('SELECT size FROM blobs WHERE sha256 = ? AND ref_count <= 0', (sha256,))
+        row = cursor.fetchone()
+        if row is None or not remove_file(sha256):
+            continue
+        cursor.execute('DELETE FROM blobs WHERE sha256 = ?', (sha256,))
+        deleted.append((sha256, row[0]))
+    return deleted
+
+def collect_orphan_blobs(remove_file: Callable[[str], bool]) -> List[Tuple]:
+    """Delete every unreferenced blob (see _delete_orphan_blobs); returns (sha256, size) deleted"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute('SELECT sha256 FROM blobs WHERE ref_count <= 0')
+        deleted = _delete_orphan_blobs(cursor, [row[0] for row in cursor.fetchall()], remove_file)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return deleted
+
+def delete_blob(sha256: str):
+    """Forget an unreferenced blob row (the caller removes the file)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('DELETE FROM blobs WHERE sha256 = ? AND ref_count <= 0', (sha256,))
+    
+    conn.commit()
+    return cursor.rowcount > 0
+
+def get_storage_stats() -> dict:
+    """Bytes on disk (unique blobs) next to the logical total of all uploads"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT COUNT(*), IFNULL(SUM(size), 0) FROM blobs')
+    blob_count, stored_bytes = cursor.fetchone()
+    
+    return {'blobs': blob_count, 'stored_bytes': stored_bytes}
+
+# Result cache: (source, operation, options) -> an already produced output
+# and the Telegram file_id it was sent as. source_key is "u:<file_unique_id>"
+# or "h:<sha256 of the input>". Hit/miss counters live in the counters
+# table, so lookups in job workers show up in /admin too.
+CachedResult = namedtuple('CachedResult', 'sha256 public_name file_name tg_file_id caption size')
+
+RESULT_COLUMNS = 'sha256, public_name, file_name, tg_file_id, caption, size'
+
+def get_cached_result(source_keys: List[str], operation: str, options: str,
+                      count_miss: bool = True) -> Optional[CachedResult]:
+    """Return the cached output for the first matching key.
+
+    A hit on a later key (e.g. the content hash) is copied to the earlier
+    keys, so the next resend is found by file_unique_id without a download.
+    count_miss=False is for a first, cheap lookup that will be retried.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    for index, source_key in enumerate(source_keys):
+        cursor.execute(f'''
+            SELECT {RESULT_COLUMNS} FROM result_cache
+            WHERE source_key = ? AND operation = ? AND options = ?
+        ''', (source_key, operation, options))
+        row = cursor.fetchone()
+        if row is None:
+            continue
+        
+        result = CachedResult(*row)
+        cursor.execute('''
+            UPDATE result_cache SET hits = hits + 1, last_used_at = CURRENT_TIMESTAMP
+            WHERE source_key = ? AND operation = ? AND options = ?
+        ''', (source_key, operation, options))
+        for earlier_key in source_keys[:index]:
+            _put_result(cursor, earlier_key, operation, options, result)
+        _bump_counter(cursor, 'result_cache_hits')
+        conn.commit()
+        return result
+    
+    if count_miss:
+        _bump_counter(cursor, 'result_cache_misses')
+        conn.commit()
+    return None
+
+def _bump_counter(cursor, name: str):
+    cursor.execute('''
+        INSERT INTO counters (name, value) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET value = value + 1
+    ''', (name,))
+
+def _put_result(cursor, source_key: str, operation: str, options: str, result: CachedResult):
+    cursor.execute(f'''
+        INSERT INTO result_cache (source_key, operation, options, {RESULT_COLUMNS})
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(source_key, operation, options) DO UPDATE SET
+            sha256 = excluded.sha256,
+            public_name = excluded.public_name,
+            file_name = excluded.file_name,
+            tg_file_id = excluded.tg_file_id,
+            caption = excluded.caption,
+            size = excluded.size,
+            last_used_at = CURRENT_TIMESTAMP
+    ''', (source_key, operation, options) + tuple(result))
+
+def save_cached_result(source_keys: List[str], operation: str, options: str, result: CachedResult,
+                       max_bytes: int = RESULT_CACHE_MAX_BYTES,
+                       remove_blob: Optional[Callable[[str], bool]] = None) -> List[str]:
+    """Store a result under every key, then evict least recently used entries.
+
+    With remove_blob (BlobStore.delete_unused) evicted blobs left without
+    any reference are deleted in the same transaction; returns their sha256.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    for source_key in source_keys:
+        _put_result(cursor, source_key, operation, options, result)
+    deleted = _evict_results(cursor, max_bytes, remove_blob)
+    
+    conn.commit()
+    return deleted
+
+def forget_cached_result(source_keys: List[str], operation: str, options: str):
+    """Drop entries whose Telegram file_id stopped working"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.executemany('''
+        DELETE FROM result_cache WHERE source_key = ? AND operation = ? AND options = ?
+    ''', [(source_key, operation, options) for source_key in source_keys])
+    
+    conn.commit()
+
+def _evict_results(cursor, max_bytes: int, remove_blob: Optional[Callable[[str], bool]]) -> List[str]:
+    """Delete the oldest entries until the cache-only bytes fit in max_bytes.
+
+    Published outputs keep their alias (the links and QR codes point at
+    them), so evicting them frees no disk space. Only outputs whose every
+    reference comes from the cache count against the budget.
+    """
+    cursor.execute('''
+        SELECT rc.sha256, MAX(rc.last_used_at) AS used, MAX(rc.size) FROM result_cache rc
+        JOIN blobs b ON b.sha256 = rc.sha256
+        GROUP BY rc.sha256 HAVING MAX(b.ref_count) <= COUNT(*)
+        ORDER BY used ASC
+    ''')
+    candidates = cursor.fetchall()
+    total = sum(size for _, _, size in candidates)
+    if total <= max_bytes:
+        return []
+    
+    evicted = []
+    for sha256, _, size in candidates:
+        if total <= max_bytes:
+            break
+        evicted.append(sha256)
+        total -= size
+    
+    cursor.executemany('DELETE FROM result_cache WHERE sha256 = ?', [(sha256,) for sha256 in evicted])
+    if remove_blob is None:
+        return []
+    return [sha256 for sha256, _ in _delete_orphan_blobs(cursor, evicted, remove_blob)]
+
+def get_result_cache_stats() -> dict:
+    """Hit/miss counters of all processes plus entries and bytes held"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT COUNT(*), COUNT(DISTINCT sha256),
+               IFNULL((SELECT SUM(size) FROM (SELECT size FROM result_cache GROUP BY sha256)), 0)
+        FROM result_cache
+    ''')
+    entries, outputs, size = cursor.fetchone()
+    cursor.execute("SELECT name, value FROM counters WHERE name IN ('result_cache_hits', 'result_cache_misses')")
+    counters = dict(cursor.fetchall())
+    
+    return {'hits': counters.get('result_cache_hits', 0), 'misses': counters.get('result_cache_misses', 0),
+            'entries': entries, 'outputs': outputs, 'bytes': size}
+
+STATS_FIELDS = ('total_users', 'allowed_users', 'total_admins', 'total_files', 'total_size')
+
+def _compute_stats(cursor) -> dict:
+    """Aggregate every counter from the base tables (full scans)"""
+    cursor.execute('''
+        SELECT COUNT(*), IFNULL(SUM(is_allowed IS 1), 0) FROM users
+    ''')
+    total_users, allowed_users = cursor.fetchone()
     cursor.execute('SELECT COUNT(*) FROM admins')
     total_admins = cursor.fetchone()[0]
+    cursor.execute('SELECT COUNT(*), IFNULL(SUM(file_size), 0) FROM files')
+    total_files, total_size = cursor.fetchone()
+    
+    cursor.execute('''
+        SELECT IFNULL(service_used, 'file_upload'), COUNT(*), IFNULL(SUM(file_size), 0)
+        FROM files GROUP BY 1
+    ''')
+    services = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
     
-    conn.close()
+    cursor.execute('''
+        SELECT day, SUM(new_users), SUM(files), SUM(bytes) FROM (
+            SELECT date(created_at) AS day, 1 AS new_users, 0 AS files, 0 AS bytes FROM users
+            UNION ALL
+            SELECT date(uploaded_at), 0, 1, IFNULL(file_size, 0) FROM files
+        ) GROUP BY day
+    ''')
+    daily = {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+    
+    return {
+        'totals': dict(zip(STATS_FIELDS, (total_users, allowed_users, total_admins, total_files, total_size))),
+        'services': services,
+        'daily': daily,
+    }
+
+def _stored_stats(cursor) -> dict:
+    """Read the trigger-maintained counters in the same shape as _compute_stats"""
+    cursor.execute(f"SELECT {', '.join(STATS_FIELDS)} FROM stats WHERE id = 1")
+    row = cursor.fetchone() or (0,) * len(STATS_FIELDS)
+    cursor.execute('SELECT service_used, files, bytes FROM stats_service WHERE files != 0 OR bytes != 0')
+    services = {r[0]: (r[1], r[2]) for r in cursor.fetchall()}
+    cursor.execute('''
+        SELECT day, new_users, files, bytes FROM stats_daily
+        WHERE new_users != 0 OR files != 0 OR bytes != 0
+    ''')
+    daily = {r[0]: (r[1], r[2], r[3]) for r in cursor.fetchall()}
+    return {'totals': dict(zip(STATS_FIELDS, row)), 'services': services, 'daily': daily}
+
+def _rebuild_stats(cursor):
+    """Recompute the summary tables from scratch (caller commits)"""
+    computed = _compute_stats(cursor)
+    cursor.execute('DELETE FROM stats')
+    cursor.execute('DELETE FROM stats_service')
+    cursor.execute('DELETE FROM stats_daily')
+    cursor.execute(f"INSERT INTO stats (id, {', '.join(STATS_FIELDS)}) VALUES (1, ?, ?, ?, ?, ?)",
+                   tuple(computed['totals'][field] for field in STATS_FIELDS))
+    cursor.executemany('INSERT INTO stats_service (service_used, files, bytes) VALUES (?, ?, ?)',
+                       [(service, files, size) for service, (files, size) in computed['services'].items()])
+    cursor.executemany('INSERT INTO stats_daily (day, new_users, files, bytes) VALUES (?, ?, ?, ?)',
+                       [(day,) + values for day, values in computed['daily'].items()])
+
+def check_stats(repair: bool = False) -> dict:
+    """Compare the counters with a full recount.
+
+    Returns {name: (stored, actual)} for every counter that drifted; with
+    repair=True the summary tables are rebuilt in the same transaction.
+    """
+    flush_writes()
+    conn = get_connection()
+    cursor = conn.cursor()
+    # Bir tranzaksiyada - sanash va qayta qurish orasida yozuv tushmasligi uchun
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        stored = _stored_stats(cursor)
+        actual = _compute_stats(cursor)
+        drift = {}
+        for section in ('totals', 'services', 'daily'):
+            for key in stored[section].keys() | actual[section].keys():
+                before, after = stored[section].get(key), actual[section].get(key)
+                if before != after:
+                    drift[f"{section}.{key}"] = (before, after)
+        if drift and repair:
+            _rebuild_stats(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return drift
+
+def get_stats() -> dict:
+    """Get database statistics"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(f"SELECT {', '.join(STATS_FIELDS)} FROM stats WHERE id = 1")
+    row = cursor.fetchone() or (0,) * len(STATS_FIELDS)
+    
+    return dict(zip(STATS_FIELDS, row))
+
+def get_service_stats() -> List[Tuple]:
+    """(service_used, files, bytes) per service, busiest first"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT service_used, files, bytes FROM stats_service
+        WHERE files > 0
+        ORDER BY files DESC
+    ''')
+    
+    return cursor.fetchall()
+
+def get_daily_stats(days: int = 14) -> List[Tuple]:
+    """(day, new_users, files, bytes) for the last `days` days, newest first"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT day, new_users, files, bytes FROM stats_daily
+        WHERE day >= date('now', ?)
+        ORDER BY day DESC
+    ''', (f'-{days - 1} days',))
+    
+    return cursor.fetchall()
+
+# Job queue: handlers enqueue, worker.py processes (possibly on other
+# machines sharing the database and blob storage). A claimed job is leased
+# to one worker; if the lease runs out (worker died) another worker takes
+# it over. Times are unix seconds.
+Job = namedtuple('Job', 'id operation input_blob params user_id chat_id message_id status_message_id '
+                        'attempts max_attempts enqueued_at')
+JOB_COLUMNS = ('id, operation, input_blob, params, user_id, chat_id, message_id, status_message_id, '
+               'attempts, max_attempts, enqueued_at')
+
+def _job_row(row) -> Job:
+    job = Job(*row)
+    return job._replace(params=json.loads(job.params))
+
+def enqueue_job(operation: str, input_blob: str, input_size: int, params: dict, user_id: int,
+                chat_id: int, message_id: int, status_message_id: int, max_attempts: int = 3) -> Tuple[int, int]:
+    """Queue a job; returns (job id, its position among queued jobs)"""
+    now = time.time()
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('INSERT OR IGNORE INTO blobs (sha256, size) VALUES (?, ?)', (input_blob, input_size))
+    cursor.execute('''
+        INSERT INTO jobs (operation, input_blob, params, user_id, chat_id, message_id, status_message_id,
+                          max_attempts, run_after, enqueued_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (operation, input_blob, json.dumps(params), user_id, chat_id, message_id, status_message_id,
+          max_attempts, now, now))
+    job_id = cursor.lastrowid
+    cursor.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND id <= ?", (job_id,))
+    position = cursor.fetchone()[0]
+    
+    conn.commit()
+    return job_id, position
+
+def claim_job(worker_id: str, lease_seconds: float) -> Optional[Job]:
+    """Lease the oldest runnable job: queued and due, or running with an
+    expired lease. Returns None when there is nothing to do.
+
+    A job whose lease expired on its last allowed attempt is failed instead
+    of reclaimed: its input may be what keeps killing the worker.
+    """
+    now = time.time()
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    # IMMEDIATE - ikki worker bitta ishni bir vaqtda ola olmaydi
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute('''
+            UPDATE jobs SET status = 'failed', finished_at = ?, lease_owner = NULL, lease_expires_at = NULL,
+                            error = 'Worker ' || attempts || ' marta ish paytida to''xtadi'
+            WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts
+        ''', (now, now))
+        if cursor.rowcount:
+            print(f"⚠️ {cursor.rowcount} ta ish urinishlari tugagani uchun failed qilindi (worker o'lgan)")
+        # Ikki alohida so'rov: OR bilan ORDER BY indeksdan foydalana olmaydi
+        cursor.execute(f'''
+            SELECT {JOB_COLUMNS} FROM jobs
+            WHERE status = 'running' AND lease_expires_at < ? AND attempts < max_attempts LIMIT 1
+        ''', (now,))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(f'''
+                SELECT {JOB_COLUMNS} FROM jobs
+                WHERE status = 'queued' AND run_after <= ?
+                ORDER BY run_after, id LIMIT 1
+            ''', (now,))
+            row = cursor.fetchone()
+        if row is None:
+            # Yuqoridagi failed belgilari saqlanishi kerak
+            conn.commit()
+            return None
+        cursor.execute('''
+            UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?,
+                            lease_expires_at = ?, started_at = ?
+            WHERE id = ?
+        ''', (worker_id, now + lease_seconds, now, row[0]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    job = _job_row(row)
+    return job._replace(attempts=job.attempts + 1)
+
+def renew_job_lease(job_id: int, worker_id: str, lease_seconds: float) -> bool:
+    """Extend a running job's lease; False if the job is no longer ours"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        UPDATE jobs SET lease_expires_at = ?
+        WHERE id = ? AND lease_owner = ? AND status = 'running'
+    ''', (time.time() + lease_seconds, job_id, worker_id))
+    
+    conn.commit()
+    return cursor.rowcount > 0
+
+def complete_job(job_id: int, worker_id: str) -> bool:
+    """Mark a job done; False if its lease had passed to another worker"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        UPDATE jobs SET status = 'done', finished_at = ?, lease_owner = NULL, lease_expires_at = NULL,
+                        error = NULL
+        WHERE id = ? AND lease_owner = ? AND status = 'running'
+    ''', (time.time(), job_id, worker_id))
+    
+    conn.commit()
+    return cursor.rowcount > 0
+
+def fail_job(job_id: int, worker_id: str, error: str, retry_delay: Optional[float]) -> Optional[str]:
+    """Record a failed attempt. With retry_delay and attempts left the job is
+    queued again after the delay, otherwise it fails for good.
+
+    Returns the new status ('queued' or 'failed'), or None if the job is no
+    longer ours.
+    """
+    now = time.time()
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        UPDATE jobs SET
+            status = CASE WHEN ? IS NOT NULL AND attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+            run_after = ? + IFNULL(?, 0),
+            finished_at = CASE WHEN ? IS NOT NULL AND attempts < max_attempts THEN NULL ELSE ? END,
+            lease_owner = NULL, lease_expires_at = NULL, error = ?
+        WHERE id = ? AND lease_owner = ? AND status = 'running'
+        RETURNING status
+    ''', (retry_delay, now, retry_delay, retry_delay, now, error[:1000], job_id, worker_id))
+    row = cursor.fetchone()
+    
+    conn.commit()
+    return row[0] if row else None
+
+def prune_jobs(keep_seconds: float, remove_blob: Optional[Callable[[str], bool]] = None) -> int:
+    """Delete finished jobs older than keep_seconds; returns rows deleted.
+
+    Queue uploads have no alias, so a finished job's input blob is usually
+    left without any reference. With remove_blob (BlobStore.delete_unused)
+    those blobs are deleted in the same transaction.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        where = "status IN ('done', 'failed') AND finished_at < ?"
+        cutoff = time.time() - keep_seconds
+        cursor.execute(f'SELECT DISTINCT input_blob FROM jobs WHERE {where}', (cutoff,))
+        inputs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'DELETE FROM jobs WHERE {where}', (cutoff,))
+        pruned = cursor.rowcount
+        if remove_blob is not None:
+            _delete_orphan_blobs(cursor, inputs, remove_blob)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return pruned
+
+def get_job_stats(window_seconds: int = 3600) -> dict:
+    """Queue depth, running and failed counts, plus wait time (enqueue to
+    last start) and run time of jobs finished within the window"""
+    now = time.time()
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT IFNULL(SUM(status = 'queued'), 0), IFNULL(SUM(status = 'queued' AND run_after > ?), 0),
+               IFNULL(SUM(status = 'running'), 0), MIN(CASE WHEN status = 'queued' THEN enqueued_at END)
+        FROM jobs WHERE status IN ('queued', 'running')
+    ''', (now,))
+    queued, retrying, running, oldest = cursor.fetchone()
+    cursor.execute('''
+        SELECT IFNULL(SUM(status = 'done'), 0), IFNULL(SUM(status = 'failed'), 0),
+               AVG(started_at - enqueued_at), MAX(started_at - enqueued_at),
+               AVG(CASE WHEN status = 'done' THEN finished_at - started_at END),
+               MAX(CASE WHEN status = 'done' THEN finished_at - started_at END)
+        FROM jobs WHERE finished_at >= ?
+    ''', (now - window_seconds,))
+    done, failed, wait_avg, wait_max, run_avg, run_max = cursor.fetchone()
     
     return {
-        'total_users': total_users,
-        'allowed_users': allowed_users,
-        'total_files': total_files,
-        'total_size': total_size,
-        'total_admins': total_admins
+        'queued': queued, 'retrying': retrying, 'running': running,
+        'oldest_wait': now - oldest if oldest else 0.0,
+        'done': done, 'failed': failed,
+        'wait_avg': wait_avg or 0.0, 'wait_max': wait_max or 0.0,
+        'run_avg': run_avg or 0.0, 'run_max': run_max or 0.0,
     }
 
 # Initialize database on import
@@ -0,0 +1,323 @@
+"""
+Write-behind yozuvchi - foydalanuvchi upsert'lari va fayl yozuvlarini
+to'plab, bitta tranzaksiyada yozadi
+
+Har bir update'da commit qilish o'rniga yozuvlar xotirada navbatga qo'yiladi:
+
+- bir xil user_id uchun upsert'lar birlashtiriladi (faqat oxirgisi yoziladi)
+- har flush_interval_ms yoki max_rows ta yozuvda bitta tranzaksiya bilan
+  executemany orqali yoziladi
+- close() da qolgan yozuvlar to'liq yoziladi
+
+Crash-safe rejim (journal_dir berilgan bo'lsa): har bir yozuv avval
+append-only journal segmentiga yoziladi. Segment faqat uning yozuvlari
+commit bo'lgandan keyin o'chiriladi, bot qayta ishga tushganda qolgan
+segmentlar replay qilinadi.
+
+Bot va worker.py jarayonlari bitta journal_dir dan foydalanadi, shuning
+uchun har bir jarayon o'z papkasiga (journal_dir/<pid>-<tasodifiy>) yozadi
+va undagi owner.lock ni ishlash davomida flock bilan ushlab turadi. Replay
+faqat qulfi bo'sh (egasi o'lgan) papkalarni oladi - tirik jarayonning
+journali o'qilmaydi va o'chirilmaydi.
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from file_lock import try_lock
+
+logger = logging.getLogger(__name__)
+
+UPSERT_USER_SQL = '''
+    INSERT INTO users (user_id, username, full_name)
+    VALUES (?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        username = excluded.username,
+        full_name = excluded.full_name
+'''
+
+INSERT_FILE_SQL = '''
+    INSERT INTO files (user_id, file_name, file_path, file_url, file_type, file_size, service_used, uploaded_at, blob)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Replay paytida yozuv ikki marta qo'shilmasligi uchun (commit bo'lib,
+# segment o'chirilmasdan crash bo'lgan holat)
+REPLAY_FILE_SQL = '''
+    INSERT INTO files (user_id, file_name, file_path, file_url, file_type, file_size, service_used, uploaded_at, blob)
+    SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?
+    WHERE NOT EXISTS (SELECT 1 FROM files WHERE file_path = ? AND uploaded_at = ?)
+'''
+
+FILE_FIELDS = ('user_id', 'file_name', 'file_path', 'file_url', 'file_type', 'file_size',
+               'service_used', 'uploaded_at', 'blob')
+
+
+LOCK_NAME = 'owner.lock'
+
+
+def journal_segments(directory: str):
+    """(number, path) of the journal segments in directory, oldest first"""
+    paths = sorted(glob.glob(os.path.join(directory, 'writes.*.log')))
+    return [(int(os.path.basename(p).split('.')[1]), p) for p in paths]
+
+
+def utc_timestamp() -> str:
+    """Current time in the format of SQLite's CURRENT_TIMESTAMP"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class WriteBehindWriter:
+    """Coalesces user upserts and file inserts into periodic batched transactions"""
+
+    def __init__(self, connect, flush_interval_ms: int = 200, max_rows: int = 500,
+                 journal_dir: str = None, journal_fsync: bool = False):
+        self._connect = connect
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+        self.journal_dir = journal_dir or None
+        self.journal_fsync = journal_fsync
+
+        self._users = {}
+        self._files = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+        self._segment = 0
+        self._journal = None
+        self._owner_dir = None
+        self._owner_lock = None
+
+        self.flushed_rows = 0
+        self.flush_count = 0
+
+    # --- journal ---
+
+    def _segment_path(self, segment):
+        return os.path.join(self._owner_dir, f"writes.{segment:012d}.log")
+
+    def _open_segment(self, segment):
+        self._segment = segment
+        self._journal = open(self._segment_path(segment), 'a', encoding='utf-8')
+
+    def _journal_append(self, record):
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._journal.flush()
+        if self.journal_fsync:
+            os.fsync(self._journal.fileno())
+
+    def _existing_segments(self):
+        return journal_segments(self._owner_dir)
+
+    def _claim_journal(self):
+        """Create and lock this process's journal directory"""
+        name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # Qulf olingunicha papka '.' bilan boshlanadi - replay uni tashlab ketadi
+        tmp_dir = os.path.join(self.journal_dir, f".{name}")
+        os.makedirs(tmp_dir)
+        self._owner_lock = open(os.path.join(tmp_dir, LOCK_NAME), 'a')
+        if not try_lock(self._owner_lock):
+            raise RuntimeError(f"Journal qulfini olib bo'lmadi: {tmp_dir}")
+        self._owner_dir = os.path.join(self.journal_dir, name)
+        os.rename(tmp_dir, self._owner_dir)
+
+    def _release_journal(self):
+        """Unlock the journal; remove it when nothing is left to replay"""
+        empty = not self._existing_segments()
+        self._owner_lock.close()
+        self._owner_lock = None
+        if empty:
+            try:
+                os.remove(os.path.join(self._owner_dir, LOCK_NAME))
+                os.rmdir(self._owner_dir)
+            except OSError:
+                pass
+
+    def replay(self):
+        """Apply journals left behind by crashed processes.
+
+        Only directories whose owner lock is free are replayed; journals of
+        running processes are left alone. Segments written directly into
+        journal_dir by older versions are replayed too.
+        """
+        if not self.journal_dir:
+            return 0
+        os.makedirs(self.journal_dir, exist_ok=True)
+        directories = [self.journal_dir] + sorted(
+            entry.path for entry in os.scandir(self.journal_dir)
+            if entry.is_dir() and not entry.name.startswith('.'))
+        return sum(self._replay_directory(directory) for directory in directories)
+
+    def _replay_directory(self, directory):
+        if directory == self.journal_dir and not journal_segments(directory):
+            return 0
+        try:
+            handle = open(os.path.join(directory, LOCK_NAME), 'a')
+        except FileNotFoundError:
+            # Boshqa jarayon shu paytda replay qilib o'chirdi
+            return 0
+        try:
+            if not try_lock(handle):
+                return 0
+            segments = journal_segments(directory)
+            count = self._apply_segments(segments) if segments else 0
+            for _, path in segments:
+                os.remove(path)
+        finally:
+            handle.close()
+        if directory != self.journal_dir:
+            try:
+                os.remove(os.path.join(directory, LOCK_NAME))
+                os.rmdir(directory)
+            except OSError:
+                pass
+        return count
+
+    def _apply_segments(self, segments):
+        users = {}
+        files = []
+        for _, path in segments:
+            with open(path, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Crash paytida yarim yozilgan oxirgi qator
+                        continue
+                    if record['kind'] == 'user':
+                        users[record['user_id']] = (record['username'], record['full_name'])
+                    elif record['kind'] == 'file':
+                        # Eski segmentlarda 'blob' maydoni yo'q
+                        files.append(tuple(record.get(field) for field in FILE_FIELDS))
+
+        conn = self._connect()
+        with conn:
+            conn.executemany(UPSERT_USER_SQL, [(uid, u, n) for uid, (u, n) in users.items()])
+            conn.executemany(REPLAY_FILE_SQL, [row + (row[2], row[7]) for row in files])
+        logger.info(f"Write-behind journal replay: {len(users)} user, {len(files)} fayl")
+        return len(users) + len(files)
+
+    # --- queue ---
+
+    def start(self):
+        """Replay leftovers and start the background flusher"""
+        if self._thread is not None:
+            return
+        self.replay()
+        if self.journal_dir:
+            self._claim_journal()
+            self._open_segment(0)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    @property
+    def running(self):
+        return self._running
+
+    def pending(self):
+        with self._lock:
+            return len(self._users) + len(self._files)
+
+    def upsert_user(self, user_id: int, username: str, full_name: str):
+        """Queue an insert-or-update of a user profile"""
+        with self._lock:
+            self._journal_append({'kind': 'user', 'user_id': user_id,
+                                  'username': username, 'full_name': full_name})
+            self._users[user_id] = (username, full_name)
+            self._notify_if_full()
+
+    def add_file_record(self, user_id: int, file_name: str, file_path: str, file_url: str,
+                        file_type: str, file_size: int, service_used: str = 'file_upload', blob: str = None):
+        """Queue a files row; uploaded_at is captured now, not at flush time"""
+        row = (user_id, file_name, file_path, file_url, file_type, file_size, service_used, utc_timestamp(), blob)
+        with self._lock:
+            record = dict(zip(FILE_FIELDS, row))
+            record['kind'] = 'file'
+            self._journal_append(record)
+            self._files.append(row)
+            self._notify_if_full()
+
+    def _notify_if_full(self):
+        if len(self._users) + len(self._files) >= self.max_rows:
+            self._wakeup.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._running and len(self._users) + len(self._files) < self.max_rows:
+                    self._wakeup.wait(self.flush_interval)
+                running = self._running
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush xatoligi: {e}")
+            if not running:
+                return
+
+    def flush(self):
+        """Write everything queued so far in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                users, self._users = self._users, {}
+                files, self._files = self._files, []
+                if not users and not files:
+                    return 0
+                flushed_segment = None
+                if self._journal is not None:
+                    # Yangi yozuvlar keyingi segmentga tushadi
+                    self._journal.close()
+                    flushed_segment = self._segment
+                    self._open_segment(self._segment + 1)
+
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.executemany(UPSERT_USER_SQL, [(uid, u, n) for uid, (u, n) in users.items()])
+                    conn.executemany(INSERT_FILE_SQL, files)
+            except Exception:
+                # Yozilmaganlarni navbatga qaytarish; journal segmentlari
+                # keyingi muvaffaqiyatli flush gacha saqlanadi
+                with self._lock:
+                    for user_id, profile in users.items():
+                        self._users.setdefault(user_id, profile)
+                    self._files[:0] = files
+                raise
+
+            if flushed_segment is not None:
+                for segment, path in self._existing_segments():
+                    if segment <= flushed_segment:
+                        os.remove(path)
+
+            self.flushed_rows += len(users) + len(files)
+            self.flush_count += 1
+            return len(users) + len(files)
+
+    def close(self):
+        """Stop the flusher thread after writing everything still queued"""
+        thread = self._thread
+        if thread is None:
+            return
+        with self._lock:
+            self._running = False
+            self._wakeup.notify()
+        thread.join()
+        self._thread = None
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+        if self._owner_dir is not None:
+            for _, path in self._existing_segments():
+                if os.path.getsize(path) == 0:
+                    os.remove(path)
+            self._release_journal()
@@ -0,0 +1,234 @@
+"""
+Hujjatlarga ishlov berish - PDF/Word konvertatsiya va QR kod qo'shish
+
+Bu funksiyalar sinxron va CPU ni band qiladi, shuning uchun bot ularni
+conversion_pool orqali alohida jarayonlarda ishga tushiradi.
+
+QR funksiyalari kirish hujjati va QR rasmni fayl yo'li yoki bytes sifatida
+qabul qiladi - kichik hujjatlar vaqtinchalik faylsiz, xotiradan o'qiladi.
+QR o'rniga qr_render.QRMatrix berilsa, QR vektor sifatida chiziladi.
+Natija esa to'g'ridan-to'g'ri output_path ga yoziladi (PyMuPDF xotiraga
+saqlashda diskdagidan ~10 marta sekinroq).
+"""
+import io
+import logging
+import fitz  # PyMuPDF
+from pdf2docx import Converter
+from docx import Document
+from docx.shared import Inches
+
+from qr_render import QRMatrix, QR_MARKER, draw_qr_pdf, hide_marked_qr_layers, add_qr_shape
+from qr_detect import find_pdf_qr_images, find_word_qr_drawings
+import ooxml_stamp
+
+logger = logging.getLogger(__name__)
+
+def _as_stream(source):
+    """python-docx wants a file-like object for in-memory data"""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+def _open_pdf(source):
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype='pdf')
+    return fitz.open(source)
+
+def _add_qr(run, qr_image):
+    if isinstance(qr_image, QRMatrix):
+        add_qr_shape(run, qr_image, Inches(1))
+    else:
+        picture = run.add_picture(_as_stream(qr_image), width=Inches(1), height=Inches(1))
+        # Keyingi safar shu belgi bo'yicha topiladi
+        picture._inline.docPr.set('name', QR_MARKER)
+
+def convert_pdf_to_word(pdf_path, docx_path):
+    """Convert PDF to Word using pdf2docx"""
+    try:
+        cv = Converter(pdf_path)
+        cv.convert(docx_path)
+        cv.close()
+        return True
+    except Exception as e:
+        logger.error(f"PDF to Word konvertatsiya xatoligi: {e}")
+        return False
+
+def pdf_page_count(pdf_path):
+    """Number of pages in a PDF"""
+    with fitz.open(pdf_path) as pdf_document:
+        return len(pdf_document)
+
+def parse_pdf_pages(pdf_path, start, end, json_path):
+    """Parse pages [start, end) with pdf2docx and store the layout as JSON"""
+    cv = Converter(pdf_path)
+    try:
+        settings = cv.default_settings
+        cv.load_pages(start, end).parse_document(**settings).parse_pages(**settings)
+        cv.serialize(json_path)
+    finally:
+        cv.close()
+    return end - start
+
+def make_docx_from_parsed(pdf_path, json_paths, docx_path):
+    """Build one DOCX from page layouts stored by parse_pdf_pages"""
+    cv = Converter(pdf_path)
+    try:
+        for json_path in json_paths:
+            cv.deserialize(json_path)
+        cv.make_docx(docx_path, **cv.default_settings)
+        return True
+    except Exception as e:
+        logger.error(f"PDF to Word yig'ish xatoligi: {e}")
+        return False
+    finally:
+        cv.close()
+
+def add_qr_to_word_document(docx_path, qr_image_path, output_path):
+    """Add QR code to Word document, replace existing QR codes if found"""
+    try:
+        # Faqat o'zgaradigan XML qismlar qayta yoziladi, qolgani xom ko'chiriladi
+        return ooxml_stamp.stamp_docx(docx_path, qr_image_path, output_path)
+    except Exception as e:
+        logger.warning(f"OOXML patch ishlamadi, python-docx orqali: {e}")
+        return _add_qr_to_word_dom(docx_path, qr_image_path, output_path)
+
+def _add_qr_to_word_dom(docx_path, qr_image_path, output_path):
+    """Add QR code to Word document through the python-docx DOM"""
+    try:
+        print(f"Word document ochilmoqda: {docx_path if isinstance(docx_path, str) else 'xotiradan'}")
+        doc = Document(_as_stream(docx_path))
+        print(f"Document ochildi, paragraflar soni: {len(doc.paragraphs)}")
+        
+        # Mavjud QR kodlarni topish va o'chirish
+        qr_replaced = False
+        
+        # Avval qo'shilgan QR larni belgi bo'yicha topish: asosiy matn,
+        # jadvallar, text box, header va footer - bitta XPath bilan
+        print("QR kodlarni qidirish va o'chirish...")
+        for drawing in find_word_qr_drawings(doc):
+            drawing.getparent().remove(drawing)
+            qr_replaced = True
+        
+        print(f"Rasm o'chirish tugadi. qr_replaced: {qr_replaced}")
+        
+        
+        # Yangi QR kod qo'shish
+        if qr_replaced:
+            print("Mavjud QR kod almashtirildi")
+            # Pastki o'ng burchakka qo'shish
+            from docx.enum.text import WD_ALIGN_PARAGRAPH
+            paragraph = doc.add_paragraph()
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+            run = paragraph.add_run()
+            _add_qr(run, qr_image_path)
+        else:
+            print("Mavjud QR kod topilmadi, yangi qo'shildi")
+            # Agar mavjud QR kod topilmagan bo'lsa, oddiy usulda qo'shish
+            if len(doc.paragraphs) > 0:
+                # Add QR to the last existing paragraph (right side)
+                last_paragraph = doc.paragraphs[-1]
+                # Add tab to move to right side
+                last_paragraph.add_run('\t')
+                run = last_paragraph.add_run()
+                _add_qr(run, qr_image_path)
+            else:
+                # If document is empty, create new paragraph
+                from docx.enum.text import WD_ALIGN_PARAGRAPH
+                paragraph = doc.add_paragraph()
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+                run = paragraph.add_run()
+                _add_qr(run, qr_image_path)
+        
+        # Add footer to the document (all sections)
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        for section in doc.sections:
+            footer = section.footer
+            footer_paragraph = footer.paragraphs[0] if footer.paragraphs else footer.add_paragraph()
+            footer_paragraph.text = 'DIDOX.UZ Orqali tasdiqlandi!'
+            footer_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # Save document
+        print(f"Document saqlanmoqda: {output_path}")
+        doc.save(output_path)
+        print(f"Document saqlandi, qr_replaced: {qr_replaced}")
+        return qr_replaced  # qr_replaced ni qaytarish
+    except Exception as e:
+        logger.error(f"Word faylga QR qo'shish xatoligi: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def add_qr_to_pdf_document(pdf_path, qr_image_path, output_path):
+    """Add QR code to PDF document, replace existing QR codes if found"""
+    try:
+        # Open PDF
+        pdf_document = _open_pdf(pdf_path)
+        
+        # Mavjud QR kodlarni topish va o'chirish
+        qr_replaced = False
+        
+        # Rasm metadata si bo'yicha QR nomzodlarini topish (piksellar
+        # faqat kvadrat nomzodlar uchun dekodlanadi)
+        for xref, page_numbers in find_pdf_qr_images(pdf_document).items():
+            # Bitta xref barcha sahifalarda umumiy - bir marta o'chirish yetarli
+            pdf_document[page_numbers[0]].delete_image(xref)
+            qr_replaced = True
+            print(f"Sahifa {', '.join(str(n + 1) for n in page_numbers)} da mavjud QR kod topildi va o'chirildi")
+        
+        # Avval qo'shilgan vektor QR qatlamini o'chirish
+        if hide_marked_qr_layers(pdf_document):
+            qr_replaced = True
+            print("Avvalgi QR qatlami o'chirildi")
+        
+        # Get last page
+        last_page = pdf_document[-1]
+        page_width = last_page.rect.width
+        page_height = last_page.rect.height
+        
+        # QR code size (1x1 inch = 72x72 points)
+        qr_size = 72
+        
+        # Position QR at bottom right (with 10pt margin)
+        qr_x = page_width - qr_size - 10
+        qr_y = page_height - qr_size - 10
+        
+        # Insert QR code image
+        qr_rect = fitz.Rect(qr_x, qr_y, qr_x + qr_size, qr_y + qr_size)
+        if isinstance(qr_image_path, QRMatrix):
+            draw_qr_pdf(last_page, qr_rect, qr_image_path, oc=pdf_document.add_ocg(QR_MARKER, on=1))
+        elif isinstance(qr_image_path, (bytes, bytearray)):
+            last_page.insert_image(qr_rect, stream=qr_image_path)
+        else:
+            last_page.insert_image(qr_rect, filename=qr_image_path)
+        
+        if qr_replaced:
+            print("Mavjud QR kod almashtirildi")
+        else:
+            print("Mavjud QR kod topilmadi, yangi qo'shildi")
+        
+        # Add footer text
+        footer_text = "DIDOX.UZ Orqali tasdiqlandi!"
+        text_position = fitz.Point(page_width / 2, page_height - 5)
+        last_page.insert_text(text_position, footer_text, fontsize=10, 
+                             color=(0, 0, 0), fontname="helv")
+        
+        # Save PDF
+        pdf_document.save(output_path)
+        pdf_document.close()
+        return qr_replaced  # qr_replaced ni qaytarish
+    except Exception as e:
+        logger.error(f"PDF faylga QR qo'shish xatoligi: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def add_qr_to_office_document(source, qr_image, output_path, extension):
+    """Add QR code to an Excel (.xlsx) or PowerPoint (.pptx) file"""
+    try:
+        # Jadval va slaydlarga QR faqat rasm (PNG) sifatida qo'yiladi
+        qr_replaced = ooxml_stamp.STAMPERS[extension](source, qr_image, output_path)
+        print(f"{extension} saqlandi, qr_replaced: {qr_replaced}")
+        return qr_replaced
+    except Exception as e:
+        logger.error(f"{extension} faylga QR qo'shish xatoligi: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
@@ -0,0 +1,23 @@
+"""
+Jarayonlararo fayl qulfi - bir xil papkadan foydalanadigan bot va worker lar uchun
+
+Qulf ochiq fayl bilan bog'liq: jarayon o'lsa (crash, SIGKILL) OS uni
+o'zi bo'shatadi, shuning uchun "egasi tirikmi?" savoliga ishonchli javob.
+"""
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def try_lock(handle) -> bool:
+    """Take an exclusive lock on an open file without waiting"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
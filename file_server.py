@@ -1,5 +1,8 @@
+import mimetypes
 import os
-from flask import Flask, send_from_directory, abort
+from flask import Flask, Response, abort, request
+from werkzeug.http import http_date, parse_date, quote_header_value
+from werkzeug.security import safe_join
 
 app = Flask(__name__)
 
@@ -7,24 +10,15 @@ app = Flask(__name__)
 UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
 PORT = int(os.getenv('PORT', '5000'))
 HOST = os.getenv('HOST', '0.0.0.0')
+# Production rejimi (gunicorn): worker jarayonlar va har biridagi threadlar soni
+FILE_SERVER_WORKERS = int(os.getenv('FILE_SERVER_WORKERS', str(min(4, 2 * (os.cpu_count() or 1) + 1))))
+FILE_SERVER_THREADS = int(os.getenv('FILE_SERVER_THREADS', '16'))
 
-print(f"File server - PORT: {PORT}, HOST: {HOST}, UPLOAD_FOLDER: {UPLOAD_FOLDER}")
-
-# Create upload folder
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Fayl nomlari UUID - bir marta yozilgan fayl hech qachon o'zgarmaydi
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+CHUNK_SIZE = 64 * 1024
 
-@app.route('/files/<filename>')
-def serve_file(filename):
-    """Serve uploaded files"""
-    try:
-        return send_from_directory(UPLOAD_FOLDER, filename, as_attachment=True)
-    except FileNotFoundError:
-        abort(404)
-
-@app.route('/')
-def home():
-    """Home page"""
-    return '''
+HOME_PAGE = '''
     <!DOCTYPE html>
     <html>
     <head>
@@ -60,8 +54,172 @@ def home():
         </div>
     </body>
     </html>
-    '''
+'''
+
+print(f"File server - PORT: {PORT}, HOST: {HOST}, UPLOAD_FOLDER: {UPLOAD_FOLDER}")
+
+# Create upload folder
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+def file_etag(stat: os.stat_result) -> str:
+    """Strong ETag from inode, size and mtime (files are written once)"""
+    return f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+def _resolve(filename: str):
+    """Map a public file name to (path, etag or None).
+
+    Content-addressed uploads are found through the aliases table; names
+    without an alias are legacy files stored directly in UPLOAD_FOLDER.
+    database is imported here, in the worker, so no SQLite connection is
+    inherited across gunicorn's fork.
+    """
+    import database
+    from blob_store import store
+    
+    sha256 = database.resolve_alias(filename)
+    if sha256 is not None:
+        return store.path_for(sha256), f'"{sha256}"'
+    return safe_join(UPLOAD_FOLDER, filename), None
+
+def _not_modified(etag: str, mtime: int) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since (RFC 9110 13.2.2)"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag.strip('"'))
+    since = request.if_modified_since
+    return since is not None and int(since.timestamp()) >= mtime
+
+def _range_applies(etag: str, last_modified: str) -> bool:
+    """If-Range: serve a partial response only if the validator still matches"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    date = parse_date(if_range)
+    return date is not None and http_date(date) == last_modified
+
+def _iter_file(file, length: int):
+    """Yield exactly `length` bytes from the current position, then close"""
+    try:
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+@app.route('/files/<filename>')
+def serve_file(filename):
+    """Serve uploaded files with Range, conditional GET and immutable caching"""
+    return _send_file(filename)
+
+# QR ichidagi havola katta harflarda (alphanumeric rejim): /F/<CODE>
+@app.route('/f/<code>')
+@app.route('/F/<code>')
+def serve_short(code):
+    """Serve a file by its short code, like /files/<name>"""
+    import database
+    
+    filename = database.resolve_short_code(code)
+    if filename is None:
+        abort(404)
+    return _send_file(filename)
+
+def _send_file(filename):
+    path, etag = _resolve(filename)
+    if path is None:
+        abort(404)
+    try:
+        file = open(path, 'rb')
+    except (FileNotFoundError, IsADirectoryError):
+        abort(404)
+    
+    stat = os.fstat(file.fileno())
+    size = stat.st_size
+    mtime = int(stat.st_mtime)
+    etag = etag or file_etag(stat)
+    last_modified = http_date(mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': last_modified,
+        'Cache-Control': CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+    }
+    
+    if _not_modified(etag, mtime):
+        file.close()
+        return Response(status=304, headers=headers)
+    
+    status = 200
+    start, length = 0, size
+    if request.range and _range_applies(etag, last_modified):
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            file.close()
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+        start, end = byte_range
+        length = end - start
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    
+    file.seek(start)
+    headers['Content-Length'] = str(length)
+    headers['Content-Disposition'] = f'attachment; filename={quote_header_value(filename)}'
+    
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper is not None:
+        # gunicorn/waitress: sendfile() joriy pozitsiyadan Content-Length bayt yuboradi
+        body = file_wrapper(file, CHUNK_SIZE)
+    else:
+        body = _iter_file(file, length)
+    
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    return Response(body, status=status, headers=headers, mimetype=mimetype, direct_passthrough=True)
+
+@app.route('/')
+def home():
+    """Home page"""
+    return HOME_PAGE
+
+def serve(host: str = HOST, port: int = PORT, workers: int = FILE_SERVER_WORKERS,
+          threads: int = FILE_SERVER_THREADS):
+    """Run the file server under gunicorn (sendfile, several workers).
+
+    Falls back to the threaded Flask server where gunicorn is not installed.
+    Must be called from the main thread of a process.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("⚠️ gunicorn topilmadi, Flask server ishlatiladi")
+        app.run(host=host, port=port, debug=False, use_reloader=False, threaded=True)
+        return
+    
+    class FileServerApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{host}:{port}")
+            self.cfg.set('workers', workers)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', threads)
+            self.cfg.set('keepalive', 5)
+            self.cfg.set('accesslog', None)
+        
+        def load(self):
+            return app
+    
+    print(f"File server ishga tushdi: http://{host}:{port} ({workers} worker x {threads} thread)")
+    FileServerApplication().run()
+
+def start_background(port: int = PORT):
+    """Start serve() in its own process (gunicorn needs a main thread)"""
+    import multiprocessing
+    process = multiprocessing.get_context('spawn').Process(
+        target=serve, kwargs={'port': port}, name='file-server', daemon=True)
+    process.start()
+    return process
 
 if __name__ == '__main__':
-    print(f"File server ishga tushdi: http://{HOST}:{PORT}")
-    app.run(host=HOST, port=PORT)
+    serve()
@@ -0,0 +1,347 @@
+"""
+LibreOffice (soffice) worker pool - Word -> PDF va DOC -> DOCX konvertatsiya
+
+Har so'rovda soffice yo'lini qidirish va yangi headless LibreOffice ishga
+tushirish bir necha soniya oladi. Bu modul:
+
+- soffice yo'lini bot ishga tushganda bir marta topadi
+- har bir instance uchun alohida profil (-env:UserInstallation) ishlatadi,
+  shuning uchun parallel konvertatsiyalar bir-birining profil lock'ini buzmaydi
+- bot va worker.py jarayonlari bitta mashinada ishlasa, har bir pool flock
+  bilan o'z "slot"ini oladi (LIBREOFFICE_PROFILE_DIR/slot_N): profillar va
+  UNO portlari jarayonlar orasida to'qnashmaydi, isitilgan profillar esa
+  qayta ishga tushirishda qayta ishlatiladi
+- pyuno mavjud bo'lsa, instance'lar oldindan ishga tushiriladi va UNO socket
+  orqali boshqariladi (sub-second konvertatsiya) - bu asosiy, tavsiya
+  etilgan rejim (README: python3-uno)
+- pyuno bo'lmasa (CLI rejimi) faqat profil oldindan "isitiladi": har bir
+  konvertatsiya baribir yangi soffice jarayonini ishga tushiradi, pool esa
+  profillarni ajratadi va parallel jarayonlar sonini cheklaydi. Bot ishga
+  tushganda bu haqda ogohlantiriladi
+- instance'lar band bo'lsa, so'rovlar navbatda kutadi
+- instance qulasa yoki health check o'tmasa, qayta ishga tushiriladi
+- bir chaqiruvda bir nechta faylni konvertatsiya qilish mumkin
+"""
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+from config import (
+    LIBREOFFICE_INSTANCES, LIBREOFFICE_MODE, LIBREOFFICE_BASE_PORT,
+    LIBREOFFICE_TIMEOUT, LIBREOFFICE_PROFILE_DIR
+)
+from file_lock import try_lock
+
+logger = logging.getLogger(__name__)
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+
+# LibreOffice yo'llari
+SOFFICE_PATHS = [
+    'soffice',  # System PATH da
+    '/usr/bin/soffice',  # Ubuntu/Debian
+    '/usr/local/bin/soffice',  # Local install
+    '/opt/libreoffice/program/soffice',  # LibreOffice
+    '/nix/store/s77ki6j3if918jk373md4aajqii531rd-libreoffice-24.8.7.2-wrapped/bin/soffice',  # Nix
+    '/app/.apt/usr/bin/soffice',  # Railway
+]
+
+# UNO storeToURL filtrlari
+EXPORT_FILTERS = {
+    'pdf': 'writer_pdf_Export',
+    'docx': 'MS Word 2007 XML',
+}
+
+_soffice_path = None
+_soffice_searched = False
+
+
+class LibreOfficeError(Exception):
+    """Raised when LibreOffice is missing or a conversion fails"""
+
+
+class LibreOfficeCrashed(LibreOfficeError):
+    """The instance timed out or its bridge died; the same file may convert on retry"""
+
+
+def find_soffice():
+    """Locate a working soffice binary (probed only once per process)"""
+    global _soffice_path, _soffice_searched
+    if _soffice_searched:
+        return _soffice_path
+
+    for path in SOFFICE_PATHS:
+        if path == 'soffice':
+            path = shutil.which('soffice')
+            if not path:
+                continue
+        if not os.path.exists(path):
+            continue
+        try:
+            result = subprocess.run([path, '--version'], capture_output=True, text=True, timeout=5)
+            if result.returncode == 0:
+                _soffice_path = path
+                print(f"LibreOffice topildi: {path}")
+                break
+        except (OSError, subprocess.SubprocessError):
+            continue
+
+    _soffice_searched = True
+    return _soffice_path
+
+
+def _output_path(source, fmt, outdir):
+    """Path LibreOffice writes for source converted to fmt in outdir"""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(outdir, f"{stem}.{fmt}")
+
+
+class SofficeInstance:
+    """One soffice process with its own user profile"""
+
+    def __init__(self, soffice_path, index, use_uno, slot=0, slot_size=1):
+        self.soffice_path = soffice_path
+        self.index = index
+        self.use_uno = use_uno
+        self.port = LIBREOFFICE_BASE_PORT + slot * slot_size + index
+        self.profile_dir = os.path.join(LIBREOFFICE_PROFILE_DIR, f"slot_{slot}", f"instance_{index}")
+        self.process = None
+        self._desktop = None
+        self.jobs_done = 0
+
+    @property
+    def profile_url(self):
+        return 'file://' + os.path.abspath(self.profile_dir)
+
+    def _base_args(self):
+        return [
+            self.soffice_path,
+            f'-env:UserInstallation={self.profile_url}',
+            '--headless', '--invisible', '--nologo', '--norestore',
+            '--nodefault', '--nolockcheck',
+        ]
+
+    def start(self):
+        """Start (or warm up) the instance; blocks until it is usable"""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if not self.use_uno:
+            # Profilni oldindan yaratish - birinchi ishga tushirishning eng
+            # qimmat qismi shu
+            try:
+                subprocess.run(self._base_args() + ['--terminate_after_init'],
+                               capture_output=True, timeout=LIBREOFFICE_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                raise LibreOfficeCrashed(f"soffice #{self.index} profili {LIBREOFFICE_TIMEOUT}s ichida tayyorlanmadi")
+            return
+
+        accept = f'socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext'
+        self.process = subprocess.Popen(
+            self._base_args() + [f'--accept={accept}'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + LIBREOFFICE_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise LibreOfficeError(f"soffice #{self.index} ishga tushmadi (kod {self.process.returncode})")
+            try:
+                self._connect()
+                logger.info(f"soffice #{self.index} tayyor (port {self.port})")
+                return
+            except Exception:
+                time.sleep(0.25)
+        self.stop()
+        raise LibreOfficeError(f"soffice #{self.index} {LIBREOFFICE_TIMEOUT}s ichida javob bermadi")
+
+    def _connect(self):
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local)
+        ctx = resolver.resolve(
+            f'uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext'
+        )
+        self._desktop = ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+
+    def is_healthy(self):
+        """Check that the instance can accept work"""
+        if not self.use_uno:
+            # CLI: jarayon yo'q - soffice va isitilgan profil joyida bo'lishi kerak
+            # (masalan, /tmp tozalagich profilni o'chirgan bo'lsa qayta yaratiladi)
+            return (os.access(self.soffice_path, os.X_OK)
+                    and os.path.isdir(os.path.join(self.profile_dir, 'user')))
+        if self.process is None or self.process.poll() is not None or self._desktop is None:
+            return False
+        try:
+            self._desktop.getComponents()
+            return True
+        except Exception:
+            return False
+
+    def stop(self):
+        """Terminate the soffice process"""
+        self._desktop = None
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def convert(self, sources, fmt, outdir):
+        """Convert every file in sources to fmt inside outdir, return output paths"""
+        if self.use_uno:
+            outputs = [self._convert_uno(source, fmt, outdir) for source in sources]
+        else:
+            outputs = self._convert_cli(sources, fmt, outdir)
+        self.jobs_done += len(sources)
+        return outputs
+
+    def _convert_uno(self, source, fmt, outdir):
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name = name
+            p.Value = value
+            return p
+
+        output = _output_path(source, fmt, outdir)
+        doc = self._desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(source)), '_blank', 0,
+            (prop('Hidden', True), prop('ReadOnly', True))
+        )
+        if doc is None:
+            raise LibreOfficeError(f"LibreOffice faylni ocha olmadi: {source}")
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(output)),
+                           (prop('FilterName', EXPORT_FILTERS[fmt]),))
+        finally:
+            doc.close(True)
+        return output
+
+    def _convert_cli(self, sources, fmt, outdir):
+        result = subprocess.run(
+            self._base_args() + ['--convert-to', fmt, '--outdir', outdir] + list(sources),
+            capture_output=True,
+            text=True,
+            timeout=LIBREOFFICE_TIMEOUT * len(sources)
+        )
+        if result.returncode != 0:
+            raise LibreOfficeError(f"LibreOffice xatoligi: {result.stderr}")
+        return [_output_path(source, fmt, outdir) for source in sources]
+
+
+def claim_slot():
+    """Lock the first free pool slot; returns (slot, open lock file).
+
+    The lock is held while the process lives, so pools of different
+    processes on one machine never share profiles or ports.
+    """
+    os.makedirs(LIBREOFFICE_PROFILE_DIR, exist_ok=True)
+    slot = 0
+    while True:
+        handle = open(os.path.join(LIBREOFFICE_PROFILE_DIR, f"slot_{slot}.lock"), 'a')
+        if try_lock(handle):
+            return slot, handle
+        handle.close()
+        slot += 1
+
+
+class LibreOfficePool:
+    """Queue of warm soffice instances shared by all handlers"""
+
+    def __init__(self, size):
+        self.size = max(1, size)
+        self.instances = []
+        self._idle = None
+        self._start_lock = asyncio.Lock()
+        self._slot_lock = None
+
+    @property
+    def available(self):
+        return find_soffice() is not None
+
+    async def start(self):
+        """Discover soffice and start all instances (idempotent)"""
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            soffice_path = await asyncio.to_thread(find_soffice)
+            if not soffice_path:
+                print("LibreOffice topilmadi, Word -> PDF uchun docx2pdf ishlatiladi")
+                return
+
+            use_uno = uno is not None and LIBREOFFICE_MODE != 'cli'
+            if uno is None and LIBREOFFICE_MODE != 'cli':
+                logger.warning(f"LIBREOFFICE_MODE={LIBREOFFICE_MODE}, lekin pyuno topilmadi - CLI rejimi: "
+                               "har bir konvertatsiya yangi soffice jarayonini ishga tushiradi "
+                               "(python3-uno o'rnating)")
+
+            slot, self._slot_lock = await asyncio.to_thread(claim_slot)
+            self.instances = [SofficeInstance(soffice_path, i, use_uno, slot, self.size) for i in range(self.size)]
+            results = await asyncio.gather(
+                *(asyncio.to_thread(instance.start) for instance in self.instances),
+                return_exceptions=True
+            )
+            self._idle = asyncio.Queue()
+            for instance, result in zip(self.instances, results):
+                if isinstance(result, Exception):
+                    logger.error(f"soffice #{instance.index} ishga tushmadi: {result}")
+                self._idle.put_nowait(instance)
+            print(f"LibreOffice pool tayyor: {self.size} instance, {'UNO' if use_uno else 'CLI'} rejimi, slot {slot}")
+
+    async def convert(self, sources, fmt, outdir):
+        """Convert one or more files to fmt; waits in queue if all instances are busy"""
+        if fmt not in EXPORT_FILTERS:
+            raise ValueError(f"Qo'llab-quvvatlanmaydigan format: {fmt}")
+        await self.start()
+        if self._idle is None:
+            raise LibreOfficeError("LibreOffice topilmadi")
+
+        instance = await self._idle.get()
+        try:
+            if not instance.is_healthy():
+                logger.warning(f"soffice #{instance.index} javob bermayapti, qayta ishga tushirilmoqda")
+                await asyncio.to_thread(instance.restart)
+            try:
+                outputs = await asyncio.to_thread(instance.convert, list(sources), fmt, outdir)
+            except subprocess.TimeoutExpired:
+                await asyncio.to_thread(instance.restart)
+                raise LibreOfficeCrashed("LibreOffice konvertatsiya vaqti tugadi")
+            except LibreOfficeError:
+                raise
+            except Exception as e:
+                # UNO bridge uzilgan bo'lishi mumkin - instance ni yangilaymiz
+                await asyncio.to_thread(instance.restart)
+                raise LibreOfficeCrashed(f"LibreOffice konvertatsiya xatoligi: {e}")
+        finally:
+            self._idle.put_nowait(instance)
+
+        missing = [path for path in outputs if not os.path.exists(path)]
+        if missing:
+            raise LibreOfficeError(f"LibreOffice natija fayl yaratmadi: {', '.join(missing)}")
+        return outputs
+
+    async def convert_one(self, source, fmt, outdir):
+        """Convert a single file and return the output path"""
+        outputs = await self.convert([source], fmt, outdir)
+        return outputs[0]
+
+    async def stop(self):
+        """Terminate all instances (called on bot shutdown)"""
+        await asyncio.gather(*(asyncio.to_thread(instance.stop) for instance in self.instances))
+        self._idle = None
+        if self._slot_lock is not None:
+            self._slot_lock.close()
+            self._slot_lock = None
+
+
+pool = LibreOfficePool(LIBREOFFICE_INSTANCES)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+UPLOAD_FOLDER dagi eski fayllarni content-addressed blob store ga ko'chirish
+
+Har bir <uuid>.<ext> fayl SHA-256 bo'yicha blob store ga ko'chiriladi,
+ommaviy nomi aliases jadvaliga yoziladi (havolalar o'zgarmaydi) va files
+jadvalidagi yozuvlar blob ga bog'lanadi. Bir xil tarkibli fayllar bitta
+blob bo'lib qoladi. Oxirida qancha joy bo'shaganligi haqida hisobot.
+
+Bot yoki worker ishlab turganda ham xavfsiz: ularning vaqtinchalik
+fayllari (<uuid>_original.<ext>, konvertatsiya natijalari) ko'chirilmaydi -
+nomi <uuid>.<ext> bo'lmagan va --min-age dan yangi fayllar o'tkazib
+yuboriladi. GC blob qatorini tranzaksiya ichida havolasi yo'qligini qayta
+tekshirib o'chiradi.
+
+Ishlatish:
+    python migrate_blobs.py [--dry-run] [--gc] [--min-age SECONDS]
+
+    --dry-run   hech narsa o'zgartirmasdan faqat hisobot
+    --gc        hech qaysi alias yoki ish ko'rsatmaydigan blob'larni o'chirish
+    --min-age   shundan yangi fayllarga tegilmaydi (standart BLOB_GC_GRACE_SECONDS)
+"""
+import argparse
+import os
+import re
+import time
+
+import database
+from blob_store import store, hash_file
+from config import UPLOAD_FOLDER, BLOB_GC_GRACE_SECONDS
+
+PUBLIC_NAME = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.[A-Za-z0-9]+$')
+
+
+def legacy_files(folder, min_age):
+    """Public <uuid>.<ext> files directly in UPLOAD_FOLDER older than min_age
+    seconds (the blob store lives in a hidden subfolder)"""
+    cutoff = time.time() - min_age
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if not entry.is_file(follow_symlinks=False) or not PUBLIC_NAME.match(entry.name):
+            continue
+        # Yangi fayl - ishlanayotgan konvertatsiyaning oraliq fayli bo'lishi mumkin
+        if entry.stat().st_mtime > cutoff:
+            continue
+        yield entry
+
+
+def migrate(dry_run, min_age):
+    scanned = 0
+    bytes_before = 0
+    bytes_reclaimed = 0
+    linked_rows = 0
+    seen = set()
+
+    for entry in legacy_files(UPLOAD_FOLDER, min_age):
+        size = entry.stat().st_size
+        sha256 = hash_file(entry.path)
+        scanned += 1
+        bytes_before += size
+        if sha256 in seen or store.exists(sha256):
+            bytes_reclaimed += size
+        seen.add(sha256)
+        if dry_run:
+            continue
+
+        store.put_file(entry.path, move=True)
+        if database.resolve_alias(entry.name) is None:
+            database.add_alias(entry.name, sha256, size)
+        linked_rows += database.set_file_blob(entry.path, sha256, store.path_for(sha256))
+
+    print(f"📂 Ko'rilgan fayllar: {scanned} ({bytes_before / (1024*1024):.2f} MB)")
+    print(f"🧬 Takrorlanmas tarkib: {len(seen)} blob")
+    print(f"♻️ Bo'shagan joy: {bytes_reclaimed / (1024*1024):.2f} MB")
+    if not dry_run:
+        print(f"🔗 files jadvalida bog'langan yozuvlar: {linked_rows}")
+    else:
+        print("ℹ️ --dry-run: hech narsa o'zgartirilmadi")
+
+
+def collect_garbage(dry_run, min_age):
+    orphans = database.get_orphan_blobs()
+    if dry_run:
+        deleted = orphans
+    else:
+        # Qator va fayl bitta yozish tranzaksiyasida o'chiriladi - orada
+        # parallel yuklash shu blob'ga alias qo'sha olmaydi
+        deleted = database.collect_orphan_blobs(lambda sha256: store.delete_unused(sha256, min_age))
+    freed = sum(size for _, size in deleted)
+    print(f"🗑 Havolasiz blob'lar: {len(orphans)}, o'chirildi: {len(deleted)}, "
+          f"bo'shagan joy: {freed / (1024*1024):.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--gc', action='store_true')
+    parser.add_argument('--min-age', type=float, default=BLOB_GC_GRACE_SECONDS)
+    args = parser.parse_args()
+
+    migrate(args.dry_run, args.min_age)
+    if args.gc:
+        collect_garbage(args.dry_run, args.min_age)
+    database.close_connections()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,562 @@
+"""
+OOXML (DOCX/XLSX/PPTX) fayllarga QR qo'shish - python-docx DOM siz
+
+Hujjat zip arxiv: QR qo'shish uchun faqat bir nechta XML qism (asosiy
+matn, rels, footer, [Content_Types].xml) o'zgaradi. Qolgan a'zolar
+(rasmlar, shriftlar, boshqa qismlar) chiqish arxiviga qayta siqilmasdan,
+bayt-ma-bayt ko'chiriladi. O'zgaradigan qismlar lxml bilan o'qiladi va
+yoziladi, yangi QR rasm alohida a'zo sifatida qo'shiladi.
+
+    DOCX - QR asosiy matn oxiriga (qr_render vektor shakli yoki PNG),
+           footer ga "DIDOX.UZ Orqali tasdiqlandi!"
+    XLSX - birinchi ko'rinadigan varaqda ma'lumotlardan o'ngda PNG QR,
+           chop etish footer i
+    PPTX - oxirgi slaydning pastki o'ng burchagida PNG QR va pastda matn
+
+Avval qo'yilgan QR (DIDOX_QR nomli) olib tashlanadi.
+"""
+import copy
+import io
+import os
+import posixpath
+import re
+import zipfile
+
+from lxml import etree
+
+import qr_render
+from qr_detect import WORD_QR_XPATH
+from qr_render import QRMatrix, QR_MARKER
+
+FOOTER_TEXT = 'DIDOX.UZ Orqali tasdiqlandi!'
+FOOTER_MARKER = 'DIDOX_FOOTER'
+QR_EMU = 914400  # 1 inch
+MARGIN_EMU = 127000  # 10pt
+
+NS = {
+    'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
+    'wp': 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing',
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    's': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'xdr': 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing',
+    'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+    'ct': 'http://schemas.openxmlformats.org/package/2006/content-types',
+}
+
+REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+RT_OFFICE_DOCUMENT = f'{REL}/officeDocument'
+RT_IMAGE = f'{REL}/image'
+RT_FOOTER = f'{REL}/footer'
+RT_DRAWING = f'{REL}/drawing'
+RT_WORD_STORIES = tuple(f'{REL}/{name}' for name in ('header', 'footer', 'footnotes', 'endnotes'))
+
+CT_FOOTER = 'application/vnd.openxmlformats-officedocument.wordprocessingml.footer+xml'
+CT_DRAWING = 'application/vnd.openxmlformats-officedocument.drawing+xml'
+
+
+class OoxmlError(Exception):
+    """The package is not a document this stamper understands"""
+
+
+def _tag(prefix, name):
+    return f'{{{NS[prefix]}}}{name}'
+
+
+def _insert_before(parent, child, successors):
+    """Insert child before the first existing element named in successors
+    (schema order), or append it"""
+    for index, existing in enumerate(parent):
+        if etree.QName(existing).localname in successors:
+            parent.insert(index, child)
+            return
+    parent.append(child)
+
+
+class Package:
+    """An OOXML zip opened for patching.
+
+    XML parts are parsed on demand; only parts marked with touch() and
+    parts added with add_part() are written, everything else is copied raw.
+    """
+
+    def __init__(self, source):
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        self.zip = zipfile.ZipFile(source)
+        self.names = set(self.zip.namelist())
+        self._xml = {}
+        self._dirty = set()
+        self._added = {}
+        self._removed = set()
+
+    # --- parts ---
+
+    def has(self, name):
+        return name in self.names or name in self._added
+
+    def xml(self, name):
+        """Parsed root element of a part (cached)"""
+        if name not in self._xml:
+            if name in self._added:
+                self._xml[name] = etree.fromstring(self._added.pop(name))
+                self._dirty.add(name)
+            else:
+                self._xml[name] = etree.fromstring(self.zip.read(name))
+        return self._xml[name]
+
+    def touch(self, name):
+        """Mark a parsed part as modified"""
+        self._dirty.add(name)
+
+    def add_part(self, name, data: bytes, content_type: str = None):
+        self._added[name] = data
+        if content_type:
+            types = self.xml('[Content_Types].xml')
+            override = etree.SubElement(types, _tag('ct', 'Override'))
+            override.set('PartName', '/' + name)
+            override.set('ContentType', content_type)
+            self.touch('[Content_Types].xml')
+
+    def free_name(self, pattern: str) -> str:
+        """First unused part name for a pattern like 'word/media/qr{}.png'"""
+        index = 1
+        while self.has(pattern.format(index)) or pattern.format(index) in self._removed:
+            index += 1
+        return pattern.format(index)
+
+    def ensure_default(self, extension: str, content_type: str):
+        types = self.xml('[Content_Types].xml')
+        for default in types.iterfind('ct:Default', NS):
+            if default.get('Extension', '').lower() == extension:
+                return
+        default = etree.Element(_tag('ct', 'Default'))
+        default.set('Extension', extension)
+        default.set('ContentType', content_type)
+        types.insert(0, default)
+        self.touch('[Content_Types].xml')
+
+    # --- relationships ---
+
+    @staticmethod
+    def rels_name(part: str) -> str:
+        directory, base = posixpath.split(part)
+        return posixpath.join(directory, '_rels', base + '.rels')
+
+    def rels(self, part: str):
+        name = self.rels_name(part)
+        if not self.has(name):
+            self.add_part(name, f'<Relationships xmlns="{NS["rel"]}"/>'.encode())
+        return self.xml(name)
+
+    def relationships(self, part: str):
+        """[(rId, reltype, absolute target part)] of internal relationships"""
+        if not self.has(self.rels_name(part)):
+            return []
+        result = []
+        for rel in self.rels(part).iterfind('rel:Relationship', NS):
+            if rel.get('TargetMode') == 'External':
+                continue
+            target = rel.get('Target')
+            if target.startswith('/'):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+            result.append((rel.get('Id'), rel.get('Type'), target))
+        return result
+
+    def target(self, part: str, rid: str) -> str:
+        for rel_id, _, target in self.relationships(part):
+            if rel_id == rid:
+                return target
+        raise OoxmlError(f"{part}: {rid} topilmadi")
+
+    def add_rel(self, part: str, reltype: str, target_part: str) -> str:
+        rels = self.rels(part)
+        ids = [int(m.group(1)) for rel in rels
+               for m in [re.fullmatch(r'rId(\d+)', rel.get('Id', ''))] if m]
+        rid = f"rId{max(ids, default=0) + 1}"
+        rel = etree.SubElement(rels, _tag('rel', 'Relationship'))
+        rel.set('Id', rid)
+        rel.set('Type', reltype)
+        rel.set('Target', posixpath.relpath(target_part, posixpath.dirname(part)))
+        self.touch(self.rels_name(part))
+        return rid
+
+    def drop_images(self, part: str, element):
+        """Remove the image relationships of a deleted QR element; media
+        parts this stamper added are dropped from the package too"""
+        rids = set(element.xpath('.//a:blip/@r:embed', namespaces=NS))
+        if not rids:
+            return
+        rels = self.rels(part)
+        for rel in list(rels):
+            if rel.get('Id') in rids and rel.get('Type') == RT_IMAGE:
+                target = self.target(part, rel.get('Id'))
+                rels.remove(rel)
+                if posixpath.basename(target).startswith('didox_qr'):
+                    self._removed.add(target)
+        self.touch(self.rels_name(part))
+
+    def main_part(self) -> str:
+        for _, reltype, target in self.relationships(''):
+            if reltype == RT_OFFICE_DOCUMENT:
+                return target
+        raise OoxmlError("officeDocument qismi topilmadi")
+
+    def add_image(self, part: str, png: bytes, prefix: str) -> str:
+        """Add a PNG media part related to part; returns its rId"""
+        self.ensure_default('png', 'image/png')
+        name = self.free_name(f'{prefix}/media/didox_qr{{}}.png')
+        self.add_part(name, png)
+        return self.add_rel(part, RT_IMAGE, name)
+
+    # --- output ---
+
+    def save(self, output_path: str):
+        """Write the patched package: untouched members are copied raw"""
+        infos = self.zip.infolist()
+        offsets = sorted(info.header_offset for info in infos)
+        ends = dict(zip(offsets, offsets[1:] + [self.zip.start_dir]))
+        try:
+            with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as out:
+                for info in infos:
+                    if info.filename in self._removed:
+                        continue
+                    if info.filename in self._dirty:
+                        self._write(out, info.filename, info.date_time)
+                    else:
+                        self._copy_raw(out, info, ends[info.header_offset])
+                for name in sorted(self._dirty - self.names):
+                    self._write(out, name)
+                for name, data in self._added.items():
+                    # PNG allaqachon siqilgan
+                    compress = zipfile.ZIP_STORED if name.endswith('.png') else zipfile.ZIP_DEFLATED
+                    out.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), data,
+                                 compress_type=compress)
+        except BaseException:
+            # Yarim yozilgan arxiv natija sifatida yuborilmasin
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+
+    def _write(self, out, name, date_time=(1980, 1, 1, 0, 0, 0)):
+        data = etree.tostring(self._xml[name], xml_declaration=True, encoding='UTF-8', standalone=True)
+        out.writestr(zipfile.ZipInfo(name, date_time=date_time), data, compress_type=zipfile.ZIP_DEFLATED)
+
+    def _copy_raw(self, out, info, end):
+        """Copy a member's local header and compressed data unchanged"""
+        self.zip.fp.seek(info.header_offset)
+        data = self.zip.fp.read(end - info.header_offset)
+        copied = copy.copy(info)
+        copied.header_offset = out.fp.tell()
+        out.fp.write(data)
+        # zipfile da xom a'zo yozish uchun ochiq API yo'q: markaziy
+        # katalog close() da filelist dan yoziladi
+        out.filelist.append(copied)
+        out.NameToInfo[copied.filename] = copied
+        out.start_dir = out.fp.tell()
+        out._didModify = True
+
+    def close(self):
+        self.zip.close()
+
+
+# --- DOCX ---
+
+PPR_AFTER_JC = {'textDirection', 'textAlignment', 'textboxTightWrap', 'outlineLvl', 'divId',
+                'cnfStyle', 'rPr', 'sectPr', 'pPrChange'}
+
+
+def _w(name):
+    return _tag('w', name)
+
+
+def _set_paragraph(paragraph, text, alignment):
+    """Like python-docx paragraph.text = text plus alignment"""
+    ppr = paragraph.find('w:pPr', NS)
+    for child in list(paragraph):
+        if child is not ppr:
+            paragraph.remove(child)
+    if ppr is None:
+        ppr = etree.SubElement(paragraph, _w('pPr'))
+    for jc in ppr.findall('w:jc', NS):
+        ppr.remove(jc)
+    jc = etree.Element(_w('jc'))
+    jc.set(_w('val'), alignment)
+    _insert_before(ppr, jc, PPR_AFTER_JC)
+    run = etree.SubElement(paragraph, _w('r'))
+    etree.SubElement(run, _w('t')).text = text
+
+
+def _new_paragraph(alignment):
+    paragraph = etree.Element(_w('p'))
+    ppr = etree.SubElement(paragraph, _w('pPr'))
+    etree.SubElement(ppr, _w('jc')).set(_w('val'), alignment)
+    return paragraph
+
+
+def _stamp_word_footers(pkg, doc_part, body):
+    """Put the footer text into every section's default footer"""
+    patched = set()
+    for index, sect_pr in enumerate(body.iter(_w('sectPr'))):
+        reference = sect_pr.find('w:footerReference[@w:type="default"]', NS)
+        if reference is not None:
+            footer_part = pkg.target(doc_part, reference.get(_tag('r', 'id')))
+        elif index == 0:
+            # python-docx ham birinchi section uchun yangi footer yaratadi
+            footer_part = pkg.free_name('word/footer{}.xml')
+            pkg.add_part(footer_part, (
+                f'<w:ftr xmlns:w="{NS["w"]}" xmlns:r="{NS["r"]}">'
+                '<w:p><w:pPr><w:pStyle w:val="Footer"/></w:pPr></w:p></w:ftr>'
+            ).encode(), CT_FOOTER)
+            reference = etree.Element(_w('footerReference'))
+            reference.set(_w('type'), 'default')
+            reference.set(_tag('r', 'id'), pkg.add_rel(doc_part, RT_FOOTER, footer_part))
+            sect_pr.insert(0, reference)
+        else:
+            continue  # oldingi section footer i bilan bog'langan
+        if footer_part in patched:
+            continue
+        patched.add(footer_part)
+        footer = pkg.xml(footer_part)
+        paragraph = footer.find('w:p', NS)
+        if paragraph is None:
+            paragraph = etree.SubElement(footer, _w('p'))
+        _set_paragraph(paragraph, FOOTER_TEXT, 'center')
+        pkg.touch(footer_part)
+
+
+def stamp_docx(source, qr_image, output_path: str) -> bool:
+    """Add the QR (QRMatrix or PNG) and footer to a DOCX; returns True if an
+    earlier QR was replaced"""
+    pkg = Package(source)
+    try:
+        doc_part = pkg.main_part()
+        root = pkg.xml(doc_part)
+        body = root.find('w:body', NS)
+        if body is None:
+            raise OoxmlError("w:body topilmadi")
+
+        qr_replaced = False
+        stories = [doc_part] + [part for _, reltype, part in pkg.relationships(doc_part)
+                                if reltype in RT_WORD_STORIES and pkg.has(part)]
+        for part in dict.fromkeys(stories):
+            for drawing in WORD_QR_XPATH(pkg.xml(part)):
+                drawing.getparent().remove(drawing)
+                pkg.drop_images(part, drawing)
+                qr_replaced = True
+                pkg.touch(part)
+
+        ids = [int(value) for value in root.xpath('.//wp:docPr/@id', namespaces=NS) if value.isdigit()]
+        shape_id = max(ids, default=0) + 1
+        if isinstance(qr_image, QRMatrix):
+            drawing_xml = qr_render.word_shape_xml(qr_image, QR_EMU, shape_id)
+        else:
+            rid = pkg.add_image(doc_part, _read_image(qr_image), 'word')
+            drawing_xml = qr_render.word_picture_xml(rid, QR_EMU, shape_id)
+        run = etree.Element(_w('r'))
+        run.append(etree.fromstring(drawing_xml))
+
+        paragraphs = body.findall('w:p', NS)
+        if qr_replaced or not paragraphs:
+            # Pastki o'ng burchak: yangi paragraf, sectPr dan oldin
+            paragraph = _new_paragraph('right')
+            paragraph.append(run)
+            body_sect_pr = body.find('w:sectPr', NS)
+            if body_sect_pr is not None:
+                body_sect_pr.addprevious(paragraph)
+            else:
+                body.append(paragraph)
+        else:
+            last = paragraphs[-1]
+            etree.SubElement(etree.SubElement(last, _w('r')), _w('tab'))
+            last.append(run)
+
+        _stamp_word_footers(pkg, doc_part, body)
+        pkg.touch(doc_part)
+        pkg.save(output_path)
+        return qr_replaced
+    finally:
+        pkg.close()
+
+
+def _read_image(image) -> bytes:
+    if isinstance(image, (bytes, bytearray)):
+        return bytes(image)
+    if isinstance(image, QRMatrix):
+        raise OoxmlError("XLSX/PPTX uchun QR PNG sifatida berilishi kerak")
+    with open(image, 'rb') as f:
+        return f.read()
+
+
+def _is_marked(element, marker_path):
+    return any(name in (QR_MARKER, FOOTER_MARKER) for name in element.xpath(marker_path, namespaces=NS))
+
+
+# --- XLSX ---
+
+WORKSHEET_AFTER_HEADER_FOOTER = {'rowBreaks', 'colBreaks', 'customProperties', 'cellWatches', 'ignoredErrors',
+                                 'smartTags', 'drawing', 'legacyDrawing', 'legacyDrawingHF', 'drawingHF',
+                                 'picture', 'oleObjects', 'controls', 'webPublishItems', 'tableParts', 'extLst'}
+WORKSHEET_AFTER_DRAWING = {'legacyDrawing', 'legacyDrawingHF', 'drawingHF', 'picture', 'oleObjects',
+                           'controls', 'webPublishItems', 'tableParts', 'extLst'}
+
+
+def _column_index(ref: str) -> int:
+    """1-based column number of a cell reference like 'AB12'"""
+    letters = re.match(r'[A-Z]+', ref.upper())
+    number = 0
+    for letter in letters.group(0) if letters else 'A':
+        number = number * 26 + ord(letter) - 64
+    return number
+
+
+def _last_column(sheet) -> int:
+    dimension = sheet.find('s:dimension', NS)
+    if dimension is not None and dimension.get('ref'):
+        return _column_index(dimension.get('ref').split(':')[-1])
+    columns = [_column_index(ref) for ref in sheet.xpath('s:sheetData/s:row/s:c/@r', namespaces=NS)]
+    return max(columns, default=0)
+
+
+def _xlsx_picture_anchor(column, rid, shape_id):
+    return etree.fromstring(
+        f'<xdr:oneCellAnchor xmlns:xdr="{NS["xdr"]}" xmlns:a="{NS["a"]}" xmlns:r="{NS["r"]}">'
+        f'<xdr:from><xdr:col>{column}</xdr:col><xdr:colOff>0</xdr:colOff>'
+        f'<xdr:row>0</xdr:row><xdr:rowOff>0</xdr:rowOff></xdr:from>'
+        f'<xdr:ext cx="{QR_EMU}" cy="{QR_EMU}"/>'
+        f'<xdr:pic><xdr:nvPicPr><xdr:cNvPr id="{shape_id}" name="{QR_MARKER}"/>'
+        f'<xdr:cNvPicPr><a:picLocks noChangeAspect="1"/></xdr:cNvPicPr></xdr:nvPicPr>'
+        f'<xdr:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></xdr:blipFill>'
+        f'<xdr:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{QR_EMU}" cy="{QR_EMU}"/></a:xfrm>'
+        f'<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></xdr:spPr></xdr:pic>'
+        f'<xdr:clientData/></xdr:oneCellAnchor>'
+    )
+
+
+def _stamp_sheet_footer(sheet):
+    """Print footer: &C centres the text"""
+    header_footer = sheet.find('s:headerFooter', NS)
+    if header_footer is None:
+        header_footer = etree.Element(_tag('s', 'headerFooter'))
+        _insert_before(sheet, header_footer, WORKSHEET_AFTER_HEADER_FOOTER)
+    odd_footer = header_footer.find('s:oddFooter', NS)
+    if odd_footer is None:
+        odd_footer = etree.Element(_tag('s', 'oddFooter'))
+        _insert_before(header_footer, odd_footer,
+                       {'evenHeader', 'evenFooter', 'firstHeader', 'firstFooter'})
+    odd_footer.text = f'&C{FOOTER_TEXT}'
+
+
+def stamp_xlsx(source, qr_png, output_path: str) -> bool:
+    """Add the QR picture to the first visible worksheet; returns True if an
+    earlier QR was replaced"""
+    pkg = Package(source)
+    try:
+        workbook_part = pkg.main_part()
+        workbook = pkg.xml(workbook_part)
+        sheets = [sheet for sheet in workbook.iterfind('s:sheets/s:sheet', NS)
+                  if sheet.get('state', 'visible') == 'visible']
+        if not sheets:
+            raise OoxmlError("ko'rinadigan varaq yo'q")
+        sheet_part = pkg.target(workbook_part, sheets[0].get(_tag('r', 'id')))
+        sheet = pkg.xml(sheet_part)
+
+        drawing_ref = sheet.find('s:drawing', NS)
+        if drawing_ref is not None:
+            drawing_part = pkg.target(sheet_part, drawing_ref.get(_tag('r', 'id')))
+        else:
+            drawing_part = pkg.free_name('xl/drawings/drawing{}.xml')
+            pkg.add_part(drawing_part, f'<xdr:wsDr xmlns:xdr="{NS["xdr"]}" xmlns:a="{NS["a"]}"/>'.encode(),
+                         CT_DRAWING)
+            drawing_ref = etree.Element(_tag('s', 'drawing'))
+            drawing_ref.set(_tag('r', 'id'), pkg.add_rel(sheet_part, RT_DRAWING, drawing_part))
+            _insert_before(sheet, drawing_ref, WORKSHEET_AFTER_DRAWING)
+        drawing = pkg.xml(drawing_part)
+
+        qr_replaced = False
+        for anchor in list(drawing):
+            if _is_marked(anchor, './/xdr:cNvPr/@name'):
+                drawing.remove(anchor)
+                pkg.drop_images(drawing_part, anchor)
+                qr_replaced = True
+
+        ids = [int(value) for value in drawing.xpath('.//xdr:cNvPr/@id', namespaces=NS) if value.isdigit()]
+        rid = pkg.add_image(drawing_part, _read_image(qr_png), 'xl')
+        # Ma'lumotlardan keyingi birinchi bo'sh ustun (0 dan boshlanadi)
+        drawing.append(_xlsx_picture_anchor(_last_column(sheet), rid, max(ids, default=1) + 1))
+
+        _stamp_sheet_footer(sheet)
+        pkg.touch(sheet_part)
+        pkg.touch(drawing_part)
+        pkg.save(output_path)
+        return qr_replaced
+    finally:
+        pkg.close()
+
+
+# --- PPTX ---
+
+def _pptx_picture(rid, shape_id, x, y):
+    return etree.fromstring(
+        f'<p:pic xmlns:p="{NS["p"]}" xmlns:a="{NS["a"]}" xmlns:r="{NS["r"]}">'
+        f'<p:nvPicPr><p:cNvPr id="{shape_id}" name="{QR_MARKER}"/>'
+        f'<p:cNvPicPr><a:picLocks noChangeAspect="1"/></p:cNvPicPr><p:nvPr/></p:nvPicPr>'
+        f'<p:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></p:blipFill>'
+        f'<p:spPr><a:xfrm><a:off x="{x}" y="{y}"/><a:ext cx="{QR_EMU}" cy="{QR_EMU}"/></a:xfrm>'
+        f'<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></p:spPr></p:pic>'
+    )
+
+
+def _pptx_footer(shape_id, width, y):
+    return etree.fromstring(
+        f'<p:sp xmlns:p="{NS["p"]}" xmlns:a="{NS["a"]}">'
+        f'<p:nvSpPr><p:cNvPr id="{shape_id}" name="{FOOTER_MARKER}"/><p:cNvSpPr txBox="1"/><p:nvPr/></p:nvSpPr>'
+        f'<p:spPr><a:xfrm><a:off x="0" y="{y}"/><a:ext cx="{width}" cy="{MARGIN_EMU * 2}"/></a:xfrm>'
+        f'<a:prstGeom prst="rect"><a:avLst/></a:prstGeom><a:noFill/></p:spPr>'
+        f'<p:txBody><a:bodyPr wrap="none" lIns="0" tIns="0" rIns="0" bIns="0" anchor="b"/><a:lstStyle/>'
+        f'<a:p><a:pPr algn="ctr"/><a:r><a:rPr lang="uz-UZ" sz="1000"><a:solidFill><a:srgbClr val="000000"/>'
+        f'</a:solidFill></a:rPr><a:t>{FOOTER_TEXT}</a:t></a:r></a:p></p:txBody></p:sp>'
+    )
+
+
+def stamp_pptx(source, qr_png, output_path: str) -> bool:
+    """Add the QR picture and footer text to the last slide; returns True if
+    an earlier QR was replaced"""
+    pkg = Package(source)
+    try:
+        presentation_part = pkg.main_part()
+        presentation = pkg.xml(presentation_part)
+        slide_ids = presentation.findall('p:sldIdLst/p:sldId', NS)
+        if not slide_ids:
+            raise OoxmlError("slaydlar yo'q")
+        slide_part = pkg.target(presentation_part, slide_ids[-1].get(_tag('r', 'id')))
+        size = presentation.find('p:sldSz', NS)
+        width, height = (int(size.get('cx')), int(size.get('cy'))) if size is not None else (9144000, 6858000)
+
+        slide = pkg.xml(slide_part)
+        tree = slide.find('p:cSld/p:spTree', NS)
+        qr_replaced = False
+        for shape in list(tree):
+            if _is_marked(shape, './*/p:cNvPr/@name'):
+                if shape.xpath(f'./*/p:cNvPr[@name="{QR_MARKER}"]', namespaces=NS):
+                    qr_replaced = True
+                tree.remove(shape)
+                pkg.drop_images(slide_part, shape)
+
+        ids = [int(value) for value in slide.xpath('.//p:cNvPr/@id', namespaces=NS) if value.isdigit()]
+        shape_id = max(ids, default=1) + 1
+        rid = pkg.add_image(slide_part, _read_image(qr_png), 'ppt')
+        tree.append(_pptx_picture(rid, shape_id, width - QR_EMU - MARGIN_EMU, height - QR_EMU - MARGIN_EMU))
+        tree.append(_pptx_footer(shape_id + 1, width, height - MARGIN_EMU * 2))
+
+        pkg.touch(slide_part)
+        pkg.save(output_path)
+        return qr_replaced
+    finally:
+        pkg.close()
+
+
+STAMPERS = {'docx': stamp_docx, 'xlsx': stamp_xlsx, 'pptx': stamp_pptx}
@@ -0,0 +1,66 @@
+"""
+Katta PDF -> Word konvertatsiya: sahifa oraliqlari bo'yicha parallel
+
+pdf2docx bitta Converter.convert() da barcha sahifalarni bitta yadroda
+tahlil qiladi - 150 sahifali PDF bir necha daqiqa oladi. Bu yerda PDF
+PDF_CHUNK_PAGES sahifalik oraliqlarga bo'linadi, har oraliq conversion
+pool dagi alohida ish sifatida tahlil qilinadi (natija JSON faylga,
+pdf2docx ning o'z multi_processing rejimidagidek), keyin bitta yakuniy ish
+sahifalarni bitta DOCX ga yig'adi. Har tugagan oraliqdan keyin progress
+callback chaqiriladi.
+
+PDF_PARALLEL_MIN_PAGES dan kam sahifali fayllar (yoki pool da bitta
+worker bo'lsa) oddiy yo'l bilan - bitta ishda konvertatsiya qilinadi.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+
+import documents
+from config import PDF_PARALLEL_MIN_PAGES, PDF_CHUNK_PAGES
+
+logger = logging.getLogger(__name__)
+
+
+def page_ranges(page_count: int, chunk_pages: int = PDF_CHUNK_PAGES) -> list:
+    """Split [0, page_count) into [(start, end)] ranges of at most chunk_pages"""
+    chunk_pages = max(1, chunk_pages)
+    return [(start, min(start + chunk_pages, page_count)) for start in range(0, page_count, chunk_pages)]
+
+
+def use_parallel(page_count: int, workers: int) -> bool:
+    return workers > 1 and page_count >= PDF_PARALLEL_MIN_PAGES
+
+
+async def convert_pdf_to_word(pool, pdf_path, docx_path, progress=None, chunk_pages: int = PDF_CHUNK_PAGES):
+    """Convert a PDF to DOCX in pool, splitting large files by page range.
+
+    progress(done, total) is awaited after each finished range. Returns True
+    on success; worker errors propagate like pool.run's.
+    """
+    page_count = await asyncio.to_thread(documents.pdf_page_count, pdf_path)
+    if not use_parallel(page_count, pool.max_workers):
+        return await pool.run(documents.convert_pdf_to_word, pdf_path, docx_path)
+
+    ranges = page_ranges(page_count, chunk_pages)
+    logger.info(f"PDF {page_count} sahifa, {len(ranges)} qismga bo'lindi")
+    work_dir = tempfile.mkdtemp(prefix='pdf_chunks_', dir=os.path.dirname(os.path.abspath(docx_path)))
+    json_paths = [os.path.join(work_dir, f"pages-{start}.json") for start, _ in ranges]
+    jobs = [asyncio.ensure_future(pool.run(documents.parse_pdf_pages, pdf_path, start, end, json_path))
+            for (start, end), json_path in zip(ranges, json_paths)]
+    try:
+        done = 0
+        for job in asyncio.as_completed(jobs):
+            await job
+            done += 1
+            if progress is not None:
+                await progress(done, len(ranges))
+        return await pool.run(documents.make_docx_from_parsed, pdf_path, json_paths, docx_path)
+    finally:
+        # Bitta qism xato bersa, qolganlari kutilmaydi
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
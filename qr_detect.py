@@ -0,0 +1,142 @@
+"""
+Hujjatdagi eski QR kodlarni topish
+
+PDF: rasmlar piksellari dekodlanmaydi - page.get_images(full=True) dagi
+eni/bo'yi va get_image_rects dagi sahifadagi joylashuv yetarli. Bir nechta
+sahifada ishlatilgan rasm (bitta xref) faqat bir marta tekshiriladi.
+Faqat kvadrat nomzodlar dekodlanadi va (OpenCV bo'lsa) haqiqiy QR ekani,
+ichida /files/ yoki /f/ havolasi borligi tekshiriladi.
+
+Word: har bir story part (asosiy matn, header, footer, izohlar) ustida
+bitta kompilyatsiya qilingan XPath ishlaydi - jadval, ichma-ich jadval va
+text box lar ham shu bilan qamrab olinadi. QR "har qanday rasm" emas,
+docPr name/descr dagi DIDOX_QR belgisi bo'yicha topiladi.
+"""
+import logging
+
+import fitz  # PyMuPDF
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from lxml import etree
+
+from config import QR_DETECT_DECODE
+from qr_render import QR_MARKER
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:  # pdf2docx odatda opencv ni o'rnatadi, lekin majburiy emas
+    cv2 = None
+
+# Sahifada 2 dyuymdan katta yoki kvadrat bo'lmagan rasm QR deb hisoblanmaydi
+QR_MAX_POINTS = 144
+SQUARE_TOLERANCE = 2  # points
+# Eski /files/<uuid> va qisqa /F/<CODE> havolalar (qisqasi katta harflarda)
+QR_LINK_MARKS = ('/files/', '/f/')
+
+
+def _is_square_placement(rect) -> bool:
+    return (abs(rect.width - rect.height) <= SQUARE_TOLERANCE
+            and 0 < rect.width <= QR_MAX_POINTS)
+
+
+def is_file_link(text) -> bool:
+    lowered = (text or '').lower()
+    return any(mark in lowered for mark in QR_LINK_MARKS)
+
+
+def decode_qr(pdf_document, xref):
+    """Decode the QR text of an image xref, or None (also when OpenCV is missing)"""
+    if cv2 is None:
+        return None
+    pix = fitz.Pixmap(pdf_document, xref)
+    try:
+        if pix.n - pix.alpha != 1:
+            pix = fitz.Pixmap(fitz.csGRAY, pix)
+        gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)[:, :, 0]
+        # QR atrofida oq chegara bo'lmasa detektor uni topa olmaydi
+        gray = cv2.copyMakeBorder(gray, 8, 8, 8, 8, cv2.BORDER_CONSTANT, value=255)
+        text, _, _ = cv2.QRCodeDetector().detectAndDecode(gray)
+        return text or None
+    except Exception as e:
+        logger.warning(f"QR dekodlashda xato (xref {xref}): {e}")
+        return None
+    finally:
+        pix = None
+
+
+def find_pdf_qr_images(pdf_document, confirm: bool = QR_DETECT_DECODE) -> dict:
+    """Find images that look like stamped QR codes.
+
+    Returns {xref: [page numbers]}. An image qualifies when it has square
+    pixel dimensions and every placement on a page is a square of at most
+    QR_MAX_POINTS; with confirm (and OpenCV) it must also decode to a link
+    containing /files/ or /f/.
+    """
+    verdicts = {}  # xref -> bool, shared images are judged once
+    found = {}
+    for page_num in range(len(pdf_document)):
+        page = pdf_document[page_num]
+        for img in page.get_images(full=True):
+            xref, width, height = img[0], img[2], img[3]
+            if xref not in verdicts:
+                verdicts[xref] = False
+                if width != height:
+                    continue
+                rects = page.get_image_rects(xref)
+                if not rects or not all(_is_square_placement(rect) for rect in rects):
+                    continue
+                if confirm and cv2 is not None:
+                    text = decode_qr(pdf_document, xref)
+                    if not is_file_link(text):
+                        continue
+                verdicts[xref] = True
+            if verdicts[xref]:
+                found.setdefault(xref, []).append(page_num)
+    return found
+
+
+# --- Word ---
+
+WORD_NAMESPACES = {
+    'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
+    'wp': 'http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing',
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+}
+
+# Belgi qo'shilishidan oldingi versiyalar QR ni 1x1 dyuymli inline rasm
+# sifatida qo'ygan - ular o'lchami bo'yicha taniladi
+LEGACY_QR_EMU = 914400
+
+WORD_QR_XPATH = etree.XPath(
+    f'.//w:drawing[.//wp:docPr[@name="{QR_MARKER}" or @descr="{QR_MARKER}"]'
+    f' or (wp:inline/wp:extent[@cx="{LEGACY_QR_EMU}" and @cy="{LEGACY_QR_EMU}"] and .//a:blip)]',
+    namespaces=WORD_NAMESPACES,
+)
+
+WORD_STORY_RELS = (RT.HEADER, RT.FOOTER, RT.FOOTNOTES, RT.ENDNOTES)
+
+
+def word_story_elements(doc):
+    """Root XML elements of the body and every header, footer and notes part"""
+    yield doc.element
+    seen = set()
+    for rel in doc.part.rels.values():
+        if rel.is_external or rel.reltype not in WORD_STORY_RELS:
+            continue
+        part = rel.target_part
+        # Sarlavhalar bir nechta section da umumiy bo'lishi mumkin; XmlPart
+        # bo'lmagan qismlar (element yo'q) o'zgartirib saqlanmaydi
+        if id(part) in seen or not hasattr(part, 'element'):
+            continue
+        seen.add(id(part))
+        yield part.element
+
+
+def find_word_qr_drawings(doc) -> list:
+    """Return the w:drawing elements of QR codes stamped earlier"""
+    drawings = []
+    for root in word_story_elements(doc):
+        drawings.extend(WORD_QR_XPATH(root))
+    return drawings
@@ -0,0 +1,316 @@
+"""
+QR kodni chizish - PNG rasm yoki vektor (PDF path / Word DrawingML shakl)
+
+Vektor rejimda QR modul matritsasi to'g'ridan-to'g'ri chiziladi: PIL
+kodlash yo'q, hujjat kichikroq va chop etilganda xiralashmaydi. Qo'shni
+qora modullar to'rtburchaklarga birlashtiriladi (41x41 QR da ~520 modul
+o'rniga ~220 to'rtburchak).
+
+Bot qo'shgan QR lar "DIDOX_QR" nomi bilan belgilanadi: PDF da optional
+content group (qatlam), Word da wp:docPr name - keyingi QR qo'shishda
+eski QR shu nom bo'yicha topiladi.
+
+QR matritsasi (qrcode.make - eng qimmat qismi) har bir matn uchun bir
+marta hisoblanadi va LRU keshda saqlanadi; Telegram rasmi, PDF va Word
+shtampi (PNG yoki vektor) shu matritsadan olinadi. PNG PIL siz, numpy
+bilan 1-bitli oq-qora rasm sifatida kodlanadi.
+"""
+import struct
+import zlib
+from collections import namedtuple
+
+import numpy as np
+import qrcode
+
+from cache import LRUCache
+from config import QR_CACHE_SIZE
+
+QR_MARKER = 'DIDOX_QR'
+QR_BORDER = 4
+BOX_SIZE = 10  # pixels per module in PNG output
+
+# (kind, data, style) -> modules / PNG bytes / QRMatrix
+_cache = LRUCache(maxsize=QR_CACHE_SIZE)
+
+# size - modullar soni (chegara bilan), rects - (x, y, w, h) modul birligida
+QRMatrix = namedtuple('QRMatrix', 'size rects')
+
+
+def _make_qr(data: str) -> qrcode.QRCode:
+    """Laid-out QR code, identical to qrcode's make(fit=True)"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=QR_BORDER,
+    )
+    qr.add_data(data)
+    qr.best_fit(start=qr.version)
+    qr.makeImpl(False, _best_mask_pattern(qr))
+    return qr
+
+
+# --- Mask tanlash (numpy) ---
+#
+# qrcode.best_mask_pattern matritsani 8 marta to'liq quradi va har birini
+# sof Python da baholaydi - QR vaqtining ~90%. Bu yerda matritsa bir marta
+# (0-niqob bilan) quriladi, qolgan niqoblar ma'lumot modullarini XOR qilib
+# olinadi va jarima numpy da hisoblanadi. Qoidalar qrcode.util.lost_point
+# bilan bir xil, natija ham bir xil.
+
+_FINDER_LIKE = np.array([[1, 0, 1, 1, 1, 0, 1, 0, 0, 0, 0],
+                         [0, 0, 0, 0, 1, 0, 1, 1, 1, 0, 1]], dtype=bool)
+
+# version -> (data cell mask, [8 mask patterns]); computed once per version
+_layouts = {}
+
+
+def _layout(qr):
+    layout = _layouts.get(qr.version)
+    if layout is None:
+        n = qr.version * 4 + 17
+        probe = qrcode.QRCode(version=qr.version, error_correction=qr.error_correction)
+        probe.modules_count = n
+        probe.modules = [[None] * n for _ in range(n)]
+        probe.setup_position_probe_pattern(0, 0)
+        probe.setup_position_probe_pattern(n - 7, 0)
+        probe.setup_position_probe_pattern(0, n - 7)
+        probe.setup_position_adjust_pattern()
+        probe.setup_timing_pattern()
+        probe.setup_type_info(True, 0)
+        if qr.version >= 7:
+            probe.setup_type_number(True)
+        data_cells = np.array([[cell is None for cell in row] for row in probe.modules])
+        i, j = np.indices((n, n))
+        patterns = [(i + j) % 2 == 0, i % 2 == 0, j % 3 == 0, (i + j) % 3 == 0,
+                    (i // 2 + j // 3) % 2 == 0, (i * j) % 2 + (i * j) % 3 == 0,
+                    ((i * j) % 2 + (i * j) % 3) % 2 == 0, ((i * j) % 3 + (i + j) % 2) % 2 == 0]
+        layout = _layouts[qr.version] = (data_cells, patterns)
+    return layout
+
+
+def _run_penalty(matrix) -> int:
+    # Qatorlar orasiga 2 qo'yiladi - yo'llar qatordan qatorga o'tmaydi
+    n = len(matrix)
+    cells = np.concatenate([matrix.astype(np.int8), np.full((n, 1), 2, np.int8)], axis=1).ravel()
+    starts = np.flatnonzero(np.concatenate(([True], cells[1:] != cells[:-1])))
+    lengths = np.diff(np.append(starts, len(cells)))
+    long_runs = lengths[lengths >= 5]
+    return int((long_runs - 2).sum())
+
+
+def _finder_penalty(matrix) -> int:
+    windows = np.lib.stride_tricks.sliding_window_view(matrix, 11, axis=1)
+    return 40 * int(sum((windows == pattern).all(axis=-1).sum() for pattern in _FINDER_LIKE))
+
+
+def lost_point(matrix: np.ndarray) -> int:
+    """qrcode.util.lost_point for a boolean matrix without quiet zone"""
+    n = len(matrix)
+    points = _run_penalty(matrix) + _run_penalty(matrix.T)
+    block = matrix[:-1, :-1]
+    points += 3 * int(((block == matrix[1:, :-1]) & (block == matrix[:-1, 1:]) & (block == matrix[1:, 1:])).sum())
+    points += _finder_penalty(matrix) + _finder_penalty(matrix.T)
+    percent = float(matrix.sum()) / (n ** 2)
+    return points + int(abs(percent * 100 - 50) / 5) * 10
+
+
+def _best_mask_pattern(qr) -> int:
+    """Mask with the lowest penalty (the first one on ties, like qrcode)"""
+    data_cells, patterns = _layout(qr)
+    qr.makeImpl(True, 0)
+    test = np.array(qr.modules, dtype=bool)
+    bits = test ^ (data_cells & patterns[0])
+    points = [lost_point(bits ^ (data_cells & pattern)) for pattern in patterns]
+    return points.index(min(points))
+
+
+def _cached(key, build):
+    value = _cache.get(key)
+    if value is None:
+        value = build()
+        _cache.set(key, value)
+    return value
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def modules(data: str) -> np.ndarray:
+    """Read-only boolean module matrix (True = dark) with the quiet zone"""
+    def build():
+        matrix = np.array(_make_qr(data).get_matrix(), dtype=bool)
+        matrix.setflags(write=False)
+        return matrix
+    return _cached(('modules', data), build)
+
+
+def _png_chunk(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I', len(payload)) + kind + payload + struct.pack('>I', zlib.crc32(kind + payload))
+
+
+def encode_png(matrix: np.ndarray, box_size: int = BOX_SIZE) -> bytes:
+    """Encode a module matrix as a 1-bit grayscale PNG, box_size pixels per module"""
+    # 1-bitli kulrang: 0 - qora, 1 - oq; qator boshida filtr bayti (0)
+    row_bits = np.repeat(~matrix, box_size, axis=1)
+    rows = np.packbits(row_bits, axis=1)
+    raw = np.zeros((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+    raw[:, 1:] = rows
+    raw = np.repeat(raw, box_size, axis=0)
+    height, width = raw.shape[0], row_bits.shape[1]
+    header = struct.pack('>IIBBBBB', width, height, 1, 0, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', header)
+            + _png_chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + _png_chunk(b'IEND', b''))
+
+
+def render_png(data: str, box_size: int = BOX_SIZE) -> bytes:
+    """Render a QR code as PNG bytes (Telegram photo or stamp picture)"""
+    return _cached(('png', data, box_size), lambda: encode_png(modules(data), box_size))
+
+
+def merge_rects(matrix) -> list:
+    """Merge dark modules into rectangles: horizontal runs, then identical
+    runs on consecutive rows. Returns [(x, y, w, h)]."""
+    rects = []
+    open_runs = {}  # (x, w) -> [y, h]
+    for y, row in enumerate(matrix):
+        runs = set()
+        x = 0
+        while x < len(row):
+            if row[x]:
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                runs.add((start, x - start))
+            else:
+                x += 1
+        for run in list(open_runs):
+            if run not in runs:
+                top, height = open_runs.pop(run)
+                rects.append((run[0], top, run[1], height))
+        for run in runs:
+            if run in open_runs:
+                open_runs[run][1] += 1
+            else:
+                open_runs[run] = [y, 1]
+    for (x, w), (top, height) in open_runs.items():
+        rects.append((x, top, w, height))
+    return rects
+
+
+def qr_matrix(data: str) -> QRMatrix:
+    """Module matrix of a QR code (with quiet zone) as merged rectangles"""
+    def build():
+        matrix = modules(data)
+        return QRMatrix(len(matrix), tuple(merge_rects(matrix.tolist())))
+    return _cached(('rects', data), build)
+
+
+# --- PDF ---
+
+def draw_qr_pdf(page, rect, qr: QRMatrix, oc: int = 0):
+    """Draw the QR as one filled vector path (on a white square) inside rect"""
+    module = rect.width / qr.size
+    shape = page.new_shape()
+    shape.draw_rect(rect)
+    shape.finish(color=None, fill=(1, 1, 1), width=0, oc=oc)
+    # Shape.draw_rect har chaqiruvda Rect/Point yaratadi (~30us); bu yerda
+    # "re" buyruqlari to'g'ridan-to'g'ri draw_cont ga yoziladi. Ikkala
+    # burchak o'giriladi - aylantirilgan sahifalarda ham to'g'ri chiqadi
+    a, b, c, d, e, f = shape.ipctm
+    ops = []
+    for x, y, w, h in qr.rects:
+        x0, y0 = rect.x0 + x * module, rect.y0 + y * module
+        x1, y1 = x0 + w * module, y0 + h * module
+        px0, py0 = x0 * a + y0 * c + e, x0 * b + y0 * d + f
+        px1, py1 = x1 * a + y1 * c + e, x1 * b + y1 * d + f
+        ops.append(f"{min(px0, px1):g} {min(py0, py1):g} {abs(px1 - px0):g} {abs(py1 - py0):g} re\n")
+    shape.draw_cont += ''.join(ops)
+    shape.finish(color=None, fill=(0, 0, 0), width=0, oc=oc)
+    shape.commit()
+
+
+def hide_marked_qr_layers(pdf_document) -> bool:
+    """Switch off layers holding QR codes stamped earlier; True if any were on"""
+    ocgs = pdf_document.get_ocgs()
+    marked = [xref for xref, info in ocgs.items() if info['name'] == QR_MARKER]
+    if not marked:
+        return False
+    was_on = any(ocgs[xref]['on'] for xref in marked)
+    keep_on = [xref for xref, info in ocgs.items() if info['on'] and xref not in marked]
+    pdf_document.set_layer(-1, on=keep_on, off=marked)
+    return was_on
+
+
+# --- Word (DrawingML) ---
+
+_WORD_SHAPE = (
+    '<w:drawing xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    ' xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"'
+    ' xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+    ' xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape">'
+    '<wp:inline distT="0" distB="0" distL="0" distR="0">'
+    '<wp:extent cx="{emu}" cy="{emu}"/>'
+    '<wp:docPr id="{shape_id}" name="{marker}"/>'
+    '<a:graphic><a:graphicData uri="http://schemas.microsoft.com/office/word/2010/wordprocessingShape">'
+    '<wps:wsp><wps:cNvSpPr/><wps:spPr>'
+    '<a:xfrm><a:off x="0" y="0"/><a:ext cx="{emu}" cy="{emu}"/></a:xfrm>'
+    '<a:custGeom><a:avLst/><a:gdLst/><a:ahLst/><a:cxnLst/><a:rect l="0" t="0" r="r" b="b"/>'
+    '<a:pathLst><a:path w="{size}" h="{size}" stroke="0">{path}</a:path></a:pathLst></a:custGeom>'
+    '<a:solidFill><a:srgbClr val="000000"/></a:solidFill><a:ln><a:noFill/></a:ln>'
+    '</wps:spPr><wps:bodyPr/></wps:wsp>'
+    '</a:graphicData></a:graphic></wp:inline></w:drawing>'
+)
+
+
+def _word_path(qr: QRMatrix) -> str:
+    parts = []
+    for x, y, w, h in qr.rects:
+        parts.append(
+            f'<a:moveTo><a:pt x="{x}" y="{y}"/></a:moveTo>'
+            f'<a:lnTo><a:pt x="{x + w}" y="{y}"/></a:lnTo>'
+            f'<a:lnTo><a:pt x="{x + w}" y="{y + h}"/></a:lnTo>'
+            f'<a:lnTo><a:pt x="{x}" y="{y + h}"/></a:lnTo><a:close/>'
+        )
+    return ''.join(parts)
+
+
+_WORD_PICTURE = (
+    '<w:drawing xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    ' xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"'
+    ' xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+    ' xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture"'
+    ' xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<wp:inline distT="0" distB="0" distL="0" distR="0">'
+    '<wp:extent cx="{emu}" cy="{emu}"/>'
+    '<wp:docPr id="{shape_id}" name="{marker}"/>'
+    '<wp:cNvGraphicFramePr><a:graphicFrameLocks noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+    '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+    '<pic:pic><pic:nvPicPr><pic:cNvPr id="0" name="qr.png"/><pic:cNvPicPr/></pic:nvPicPr>'
+    '<pic:blipFill><a:blip r:embed="{rid}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+    '<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{emu}" cy="{emu}"/></a:xfrm>'
+    '<a:prstGeom prst="rect"/></pic:spPr></pic:pic>'
+    '</a:graphicData></a:graphic></wp:inline></w:drawing>'
+)
+
+
+def word_shape_xml(qr: QRMatrix, emu: int, shape_id: int) -> str:
+    """w:drawing markup of the QR as an inline DrawingML shape"""
+    return _WORD_SHAPE.format(emu=emu, shape_id=shape_id, marker=QR_MARKER,
+                              size=qr.size, path=_word_path(qr))
+
+
+def word_picture_xml(rid: str, emu: int, shape_id: int) -> str:
+    """w:drawing markup of an inline QR picture whose image part is rid"""
+    return _WORD_PICTURE.format(emu=emu, shape_id=shape_id, marker=QR_MARKER, rid=rid)
+
+
+def add_qr_shape(run, qr: QRMatrix, size):
+    """Append the QR to a python-docx run as an inline DrawingML shape.
+
+    size is a docx Length (e.g. Inches(1)); the shape scales without loss.
+    """
+    from docx.oxml import parse_xml
+
+    run._r.append(parse_xml(word_shape_xml(qr, int(size), run.part.next_id)))
@@ -0,0 +1,128 @@
+"""
+Telegram javoblari - Bot API so'rovlarini kritik yo'ldan olib tashlash
+
+Oddiy yuklashda har bir so'rov (status, status tahriri, havola, QR) alohida
+tarmoq aylanishi edi va handler har birini kutardi. Bu modul:
+
+- StatusMessage - "⏳ ..." status xabari fonda yuboriladi va tahrirlanadi:
+  handler yuklab olishni darhol boshlaydi, tahrirlar tartib bilan ketadi.
+  Yuborilmagan eski tahrir yangisi bilan almashtiriladi (oxirgisi yetib
+  boradi), progress tahrirlari STATUS_EDIT_INTERVAL dan tez-tez yuborilmaydi
+- rate_limiter() - 429 (RetryAfter) javobida retry_after kutib so'rovni
+  TELEGRAM_MAX_RETRIES martagacha qayta yuboradi (PTB AIORateLimiter)
+
+Havola va QR bitta reply_photo da (HTML caption) yuboriladi - bot.py ga qarang.
+"""
+import asyncio
+import logging
+
+from telegram.error import TelegramError
+from telegram.ext import AIORateLimiter
+
+from config import STATUS_EDIT_INTERVAL, TELEGRAM_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Fon vazifalari - GC yig'ib olmasligi va to'xtashda kutish uchun
+_tasks = set()
+
+
+def spawn(coro) -> asyncio.Task:
+    """Run a reply in the background, keeping a reference until it finishes"""
+    task = asyncio.ensure_future(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    task.add_done_callback(_log_failure)
+    return task
+
+
+def _log_failure(task: asyncio.Task):
+    # Hech kim kutmagan vazifa xatosi "Task exception was never retrieved" bo'lib yo'qolmasin
+    if task.cancelled():
+        return
+    error = task.exception()
+    if isinstance(error, TelegramError):
+        logger.warning(f"Fon javobi yuborilmadi: {error}")
+    elif error is not None:
+        logger.error("Fon javobida kutilmagan xato", exc_info=error)
+
+
+async def drain(timeout: float = 10.0):
+    """Wait for background replies (on shutdown)"""
+    if _tasks:
+        await asyncio.wait(set(_tasks), timeout=timeout)
+
+
+def rate_limiter() -> AIORateLimiter:
+    """Bot API limits with automatic retries of 429 responses"""
+    return AIORateLimiter(max_retries=TELEGRAM_MAX_RETRIES)
+
+
+class StatusMessage:
+    """A status message that is sent and edited without blocking the handler.
+
+    Edits are applied in order; an edit still waiting to be sent is replaced
+    by a newer one. progress() edits are additionally spaced at least
+    interval seconds apart. Telegram errors are logged, not raised.
+    """
+
+    def __init__(self, sending, text: str = None, interval: float = STATUS_EDIT_INTERVAL):
+        self._sending = spawn(sending)
+        self._interval = interval
+        self._pending = None
+        self._editor = None
+        self._text = text
+        self._edited_at = float('-inf')
+
+    @classmethod
+    def send(cls, message, text: str, **kwargs) -> 'StatusMessage':
+        """Reply to message with text in the background"""
+        return cls(message.reply_text(text, **kwargs), text)
+
+    async def sent(self):
+        """The sent telegram Message"""
+        return await asyncio.shield(self._sending)
+
+    async def edit_text(self, text: str, **kwargs):
+        """Queue an edit; returns without waiting for Telegram"""
+        self._queue(text, kwargs, throttled=False)
+
+    async def progress(self, text: str):
+        """Queue a throttled progress edit"""
+        self._queue(text, {}, throttled=True)
+
+    async def flush(self):
+        """Wait until queued edits are sent"""
+        while self._editor is not None and not self._editor.done():
+            await asyncio.shield(self._editor)
+
+    def _queue(self, text, kwargs, throttled):
+        self._pending = (text, kwargs, throttled)
+        if self._editor is None or self._editor.done():
+            self._editor = spawn(self._edit_pending())
+
+    async def _edit_pending(self):
+        try:
+            message = await self._sending
+        except TelegramError as e:
+            logger.warning(f"Status xabarini yuborib bo'lmadi: {e}")
+            self._pending = None
+            return
+        loop = asyncio.get_running_loop()
+        while self._pending is not None:
+            text, kwargs, throttled = self._pending
+            if throttled:
+                delay = self._edited_at + self._interval - loop.time()
+                if delay > 0:
+                    # Kutish paytida kelgan yangiroq tahrir shu o'rinni oladi
+                    await asyncio.sleep(delay)
+                    continue
+            self._pending = None
+            if text == self._text and not kwargs:
+                continue
+            try:
+                await message.edit_text(text, **kwargs)
+                self._text = text
+            except TelegramError as e:
+                logger.warning(f"Status xabarini yangilab bo'lmadi: {e}")
+            self._edited_at = loop.time()
@@ -1,19 +1,26 @@
 #!/usr/bin/env python3
 """
 Railway uchun start fayl - file server va bot ni bir vaqtda ishga tushiradi
+
+BOT_MODE=polling (standart): gunicorn file server alohida jarayonda, bot
+long-poll qiladi. BOT_MODE=webhook: bitta aiohttp server PORT da ham
+Telegram update larini, ham /files ni qabul qiladi.
 """
 import os
 import sys
-import threading
 import time
-from config import RAILWAY_URL, PORT, TELEGRAM_BOT_TOKEN
+from config import RAILWAY_URL, PORT, TELEGRAM_BOT_TOKEN, BOT_MODE
 
 def start_file_server():
     """File server ni ishga tushirish"""
     print("File server ishga tushmoqda...")
     try:
-        import file_server
-        file_server.app.run(host='0.0.0.0', port=PORT, debug=False, use_reloader=False)
+        if BOT_MODE == 'webhook':
+            import web_server
+            web_server.serve(host='0.0.0.0', port=PORT)
+        else:
+            import file_server
+            file_server.serve(host='0.0.0.0', port=PORT)
     except Exception as e:
         print(f"File server xatoligi: {e}")
 
@@ -24,7 +31,7 @@ def start_bot():
         print("Bot modulini import qilmoqda...")
         import bot
         print("Bot moduli import qilindi, main() ni chaqirmoqda...")
-        bot.main()
+        bot.main(BOT_MODE)
     except Exception as e:
         print(f"Bot xatoligi: {e}")
         import traceback
@@ -45,16 +52,10 @@ def main():
         start_file_server()
         return
     
-    print("Token mavjud, ikkala xizmatni ishga tushiramiz...")
-    
-    # File server ni alohida thread da ishga tushirish
-    file_server_thread = threading.Thread(target=start_file_server, daemon=True)
-    file_server_thread.start()
-    
-    # Kichik kutish
-    time.sleep(3)
+    print(f"Token mavjud, ikkala xizmatni ishga tushiramiz ({BOT_MODE} rejimi)...")
     
-    # Bot ni ishga tushirish
+    # Bot ni ishga tushirish: polling da file server ni bot.main() o'zi
+    # alohida jarayonda ochadi, webhook da u bot bilan bitta serverda
     start_bot()
 
 if __name__ == '__main__':
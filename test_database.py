@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Ma'lumotlar bazasi testi - holatli o'zgarishlar vaqtinchalik bazada
+
+Har bir test yangi vaqtinchalik DB_FILE bilan ishlaydi. Tekshiriladi:
+    - statistika: trigger lar yuritgan hisoblagichlar qo'shish, o'chirish
+      va ruxsatni almashtirishdan keyin to'liq sanash bilan bir xil
+    - sahifalash: kursor saqlangan vaqtni aniq qaytaradi, bir soniya
+      ichidagi yozuvlar sahifa chegarasida tushib qolmaydi va takrorlanmaydi
+    - blob lar: alias trigger lari ref_count ni yuritadi, havolasiz blob
+      yetim bo'ladi va faqat shunda o'chiriladi (GC qator va faylni birga,
+      yaqinda saqlangan blob'ga tegmasdan)
+    - natija keshi: faqat keshgagina tegishli natijalar byudjetga kiradi,
+      eng kam ishlatilganlari blob'i bilan o'chiriladi; hit/miss
+      hisoblagichlari bazada; operatsiya versiyasi oshsa eski natija
+      topilmaydi
+    - qisqa havolalar: kod bir marta yaratiladi, istalgan harf registrida
+      topiladi va /f/ hamda /F/ orqali faylni beradi (Flask va aiohttp)
+    - ish navbati: parallel worker lar bitta ishni ikki marta olmaydi,
+      qayta urinish, ijara muddati tugashi va failed holatlari; tugagan
+      ish tozalanganda kirish blob'i ham o'chiriladi
+
+Ishlatish:
+    python test_database.py
+    python -m pytest test_database.py
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import database
+
+
+@contextmanager
+def temp_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = database.DB_FILE
+        database.DB_FILE = os.path.join(tmp, 'test.db')
+        try:
+            database.init_database()
+            yield database.get_connection()
+        finally:
+            database.close_connections()
+            database.DB_FILE = previous
+
+
+def enqueue(count=1, max_attempts=3):
+    return [database.enqueue_job('pdf_to_word', 'a' * 64, 100, {}, 1, 1, i, i, max_attempts)[0]
+            for i in range(count)]
+
+
+def job_status(conn, job_id):
+    return conn.execute('SELECT status, attempts FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+
+def add_file(user_id, size, service='file_upload'):
+    database.add_file_record(user_id, f"{size}.pdf", f"uploads/{size}.pdf", f"http://x/f/{size}", 'pdf', size,
+                             service)
+
+
+# --- statistika ---
+
+def test_stats_follow_insert_delete_and_toggle():
+    with temp_database() as conn:
+        for user_id in (1, 2, 3):
+            database.add_or_update_user(user_id, f"user{user_id}", f"User {user_id}")
+        database.add_or_update_user(1, 'renamed', 'Renamed')
+        database.set_user_permission(1, True)
+        database.set_user_permission(2, True)
+        database.set_user_permission(2, True)
+        database.set_user_permission(2, False)
+        database.add_admin(3, 'user3', 'User 3', added_by=1)
+        database.add_admin(3, 'user3', 'User 3', added_by=1)
+        add_file(1, 100)
+        add_file(1, 200, 'pdf_to_word')
+        add_file(2, 300, 'pdf_to_word')
+        add_file(3, 400, 'word_to_pdf')
+        assert database.check_stats() == {}
+
+        # O'chirish API si yo'q - qo'lda SQL ham trigger lardan o'tadi
+        conn.execute('DELETE FROM files WHERE file_size IN (200, 400)')
+        conn.execute('DELETE FROM files WHERE user_id = 2')
+        conn.execute('DELETE FROM users WHERE user_id = 2')
+        conn.commit()
+        database.remove_admin(3)
+        database.set_user_permission(1, False)
+        assert database.check_stats() == {}
+        assert database.get_stats() == {'total_users': 2, 'allowed_users': 0, 'total_admins': 0,
+                                        'total_files': 1, 'total_size': 100}
+        assert database.get_service_stats() == [('file_upload', 1, 100)]
+
+
+def test_check_stats_repairs_drift():
+    with temp_database() as conn:
+        database.add_or_update_user(1, 'a', 'A')
+        add_file(1, 100)
+        conn.execute('UPDATE stats SET total_files = 7')
+        conn.execute("UPDATE stats_service SET bytes = 1 WHERE service_used = 'file_upload'")
+        conn.commit()
+        drift = database.check_stats(repair=True)
+        assert drift['totals.total_files'] == (7, 1)
+        assert drift['services.file_upload'] == ((1, 1), (1, 100))
+        assert database.check_stats() == {}
+
+
+# --- sahifalash ---
+
+def test_cursor_round_trips_stored_value():
+    for value in ('2025-10-09 12:30:45', '2025-10-09 12:30:45.50', '2025-10-09T12:30:45Z',
+                  1728477045.25, 1728477045):
+        token = database.encode_cursor(value, 42)
+        assert database.decode_cursor(token) == (value, 42), token
+    assert database.encode_cursor('2025-10-09 12:30:45', 42) == '20251009123045.42'
+
+
+def test_pages_split_inside_one_second():
+    with temp_database() as conn:
+        database.add_or_update_user(1, 'a', 'A')
+        conn.executemany('''
+            INSERT INTO files (user_id, file_name, file_path, file_url, file_type, file_size, uploaded_at)
+            VALUES (1, ?, ?, '', 'pdf', 1, ?)
+        ''', [(f"{i}.pdf", f"uploads/{i}.pdf", f"2025-01-01 00:00:00.{i + 1}") for i in range(7)])
+        conn.commit()
+        seen, token = [], None
+        while True:
+            page = database.get_files_page(token, limit=2)
+            seen.extend(row[0] for row in page.rows)
+            token = page.next_cursor
+            if token is None:
+                break
+        assert sorted(seen) == list(range(1, 8)) and len(seen) == 7
+        # Orqaga ham xuddi shu yozuvlar
+        back = database.get_files_page(page.prev_cursor, backward=True, limit=2)
+        assert [row[0] for row in back.rows] == seen[-3:-1]
+
+
+# --- blob lar ---
+
+def blob_refs(conn, sha256):
+    row = conn.execute('SELECT ref_count FROM blobs WHERE sha256 = ?', (sha256,)).fetchone()
+    return row and row[0]
+
+
+def test_alias_triggers_count_blob_references():
+    with temp_database() as conn:
+        sha256 = hashlib.sha256(b'hujjat').hexdigest()
+        other = hashlib.sha256(b'boshqa').hexdigest()
+        database.add_alias('alias-a.pdf', sha256, 6)
+        database.add_alias('alias-b.pdf', sha256, 6)
+        database.add_alias('alias-c.pdf', other, 6)
+        assert blob_refs(conn, sha256) == 2
+        assert database.get_storage_stats() == {'blobs': 2, 'stored_bytes': 12}
+        assert database.resolve_alias('alias-a.pdf') == sha256
+
+        database.remove_alias('alias-a.pdf')
+        assert blob_refs(conn, sha256) == 1
+        assert database.resolve_alias('alias-a.pdf') is None
+        assert database.resolve_alias('alias-b.pdf') == sha256
+        assert database.get_orphan_blobs() == []
+        assert not database.delete_blob(sha256)
+
+        database.remove_alias('alias-b.pdf')
+        assert database.get_orphan_blobs() == [(sha256, 6)]
+        assert database.delete_blob(sha256)
+        assert blob_refs(conn, sha256) is None
+        assert blob_refs(conn, other) == 1
+
+
+def test_collect_orphan_blobs():
+    import blob_store
+
+    with temp_database() as conn, tempfile.TemporaryDirectory() as tmp:
+        store = blob_store.BlobStore(tmp)
+        kept, _ = store.put_bytes(b'havolali')
+        orphan, size = store.put_bytes(b'yetim')
+        recent, _ = store.put_bytes(b'yaqinda')
+        database.add_alias('gc-kept.pdf', kept, 8)
+        for name, sha256 in (('gc-orphan.pdf', orphan), ('gc-recent.pdf', recent)):
+            database.add_alias(name, sha256, size)
+            database.remove_alias(name)
+        for sha256 in (kept, orphan):
+            os.utime(store.path_for(sha256), (0, 0))
+
+        assert database.collect_orphan_blobs(store.delete_unused) == [(orphan, size)]
+        assert not store.exists(orphan) and blob_refs(conn, orphan) is None
+        assert store.exists(kept) and store.exists(recent)
+        assert blob_refs(conn, recent) == 0
+
+
+# --- natija keshi ---
+
+def cache_result(name, size, keys, options='v1', max_bytes=10 ** 9, public=True, removed=None):
+    """Publish an output (public=False: its alias is gone again) and cache it under keys"""
+    sha256 = hashlib.sha256(name.encode()).hexdigest()
+    database.add_alias(name, sha256, size)
+    if not public:
+        database.remove_alias(name)
+    result = database.CachedResult(sha256, name, name, f"tg-{name}", None, size)
+
+    def remove_blob(blob):
+        removed.append(blob)
+        return True
+
+    deleted = database.save_cached_result(keys, 'pdf_to_word', options, result, max_bytes,
+                                          remove_blob if removed is not None else None)
+    return sha256, deleted
+
+
+def test_result_cache_evicts_least_recently_used():
+    with temp_database() as conn:
+        removed = []
+        # Ommaviy natija havolalar uchun diskda qoladi - byudjetga kirmaydi
+        public, _ = cache_result('cache-public.docx', 5000, ['u:public'], max_bytes=900, removed=removed)
+        old, _ = cache_result('cache-old.docx', 400, ['u:old'], public=False)
+        used, _ = cache_result('cache-used.docx', 400, ['u:used', 'h:used'], public=False)
+        conn.execute("UPDATE result_cache SET last_used_at = '2000-01-01 00:00:00'")
+        conn.commit()
+        assert database.get_cached_result(['u:used'], 'pdf_to_word', 'v1').sha256 == used
+
+        new, deleted = cache_result('cache-new.docx', 400, ['u:new'], max_bytes=900, public=False,
+                                    removed=removed)
+        assert deleted == removed == [old]
+        assert blob_refs(conn, old) is None
+        assert database.get_cached_result(['u:old'], 'pdf_to_word', 'v1') is None
+        assert database.get_cached_result(['h:used'], 'pdf_to_word', 'v1').sha256 == used
+        assert database.get_cached_result(['u:public'], 'pdf_to_word', 'v1').sha256 == public
+        assert (blob_refs(conn, public), blob_refs(conn, used), blob_refs(conn, new)) == (2, 2, 1)
+        assert database.get_result_cache_stats()['bytes'] == 5800
+
+
+def test_result_cache_counters_are_shared():
+    with temp_database() as conn:
+        cache_result('cache-count.docx', 100, ['u:count'])
+        assert database.get_cached_result(['u:count'], 'pdf_to_word', 'v1')
+        assert database.get_cached_result(['u:none'], 'pdf_to_word', 'v1', count_miss=False) is None
+        assert database.get_cached_result(['u:none'], 'pdf_to_word', 'v1') is None
+        # Boshqa jarayon (worker) shu jadvalni o'qiydi va yozadi
+        thread = threading.Thread(target=database.get_cached_result, args=(['u:count'], 'pdf_to_word', 'v1'))
+        thread.start()
+        thread.join()
+        stats = database.get_result_cache_stats()
+        assert (stats['hits'], stats['misses']) == (2, 1)
+        assert dict(conn.execute('SELECT name, value FROM counters')) == {
+            'result_cache_hits': 2, 'result_cache_misses': 1}
+
+
+def test_result_cache_key_copies_and_forget():
+    with temp_database() as conn:
+        sha256, _ = cache_result('cache-copy.docx', 100, ['h:copy'])
+        # Kontent hash i bo'yicha topilgan natija file_unique_id kalitiga ham yoziladi
+        assert database.get_cached_result(['u:copy', 'h:copy'], 'pdf_to_word', 'v1').sha256 == sha256
+        assert blob_refs(conn, sha256) == 3
+        database.forget_cached_result(['u:copy', 'h:copy'], 'pdf_to_word', 'v1')
+        assert database.get_cached_result(['u:copy', 'h:copy'], 'pdf_to_word', 'v1') is None
+        assert blob_refs(conn, sha256) == 1
+
+
+def test_result_version_guard():
+    import bot
+
+    with temp_database():
+        cache_result('cache-v.docx', 100, ['u:v'], options=bot.result_options('pdf_to_word'))
+        assert database.get_cached_result(['u:v'], 'pdf_to_word', bot.result_options('pdf_to_word'))
+        previous = bot.RESULT_VERSIONS['pdf_to_word']
+        bot.RESULT_VERSIONS['pdf_to_word'] = previous + 1
+        try:
+            assert database.get_cached_result(['u:v'], 'pdf_to_word', bot.result_options('pdf_to_word')) is None
+        finally:
+            bot.RESULT_VERSIONS['pdf_to_word'] = previous
+
+
+# --- qisqa havolalar ---
+
+@contextmanager
+def stored_file(name, data):
+    """A public name pointing at a blob in a temporary blob store"""
+    import blob_store
+
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = blob_store.store
+        blob_store.store = blob_store.BlobStore(tmp)
+        try:
+            sha256, size = blob_store.store.put_bytes(data)
+            database.add_alias(name, sha256, size)
+            yield database.short_code(name)
+        finally:
+            blob_store.store = previous
+
+
+def test_short_code_is_stable_and_case_insensitive():
+    with temp_database():
+        code = database.short_code('short-stable.pdf')
+        assert len(code) == database.SHORT_CODE_LENGTH
+        assert set(code) <= set(database.SHORT_CODE_ALPHABET)
+        assert database.short_code('short-stable.pdf') == code
+        assert database.short_code('short-other.pdf') != code
+        assert database.resolve_short_code(code) == 'short-stable.pdf'
+        assert database.resolve_short_code(code.lower()) == 'short-stable.pdf'
+        assert database.resolve_short_code('0' * database.SHORT_CODE_LENGTH) is None
+
+
+def test_short_links_in_file_server():
+    from file_server import app
+
+    with temp_database(), stored_file('short-flask.pdf', b'%PDF flask') as code:
+        client = app.test_client()
+        for path in (f"/f/{code}", f"/F/{code}", f"/f/{code.lower()}"):
+            response = client.get(path)
+            assert response.status_code == 200, path
+            assert response.data == b'%PDF flask'
+            assert 'short-flask.pdf' in response.headers['Content-Disposition']
+        assert client.get('/f/NOSUCHCODE').status_code == 404
+
+
+def test_short_links_in_web_server():
+    from aiohttp.test_utils import TestClient, TestServer
+
+    from web_server import create_app
+
+    async def fetch(code):
+        async with TestClient(TestServer(create_app())) as client:
+            for path in (f"/f/{code}", f"/F/{code}"):
+                response = await client.get(path)
+                assert response.status == 200, path
+                assert await response.read() == b'%PDF aiohttp'
+                assert response.content_type == 'application/pdf'
+            assert (await client.get('/F/NOSUCHCODE')).status == 404
+
+    with temp_database(), stored_file('short-aiohttp.pdf', b'%PDF aiohttp') as code:
+        asyncio.run(fetch(code))
+
+
+# --- ish navbati ---
+
+def test_concurrent_claims_are_exclusive():
+    with temp_database():
+        job_ids = enqueue(60)
+        claimed = []
+        errors = []
+
+        def worker(name):
+            try:
+                while True:
+                    job = database.claim_job(name, 60)
+                    if job is None:
+                        return
+                    claimed.append(job.id)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(f"worker-{i}",)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, errors
+        assert sorted(claimed) == job_ids
+
+
+def test_retry_then_fail():
+    with temp_database() as conn:
+        job_id, = enqueue(max_attempts=2)
+        job = database.claim_job('w', 60)
+        assert job.attempts == 1
+        assert database.fail_job(job_id, 'w', 'xato', retry_delay=0) == 'queued'
+        job = database.claim_job('w', 60)
+        assert job.attempts == 2
+        assert database.fail_job(job_id, 'w', 'xato', retry_delay=0) == 'failed'
+        assert database.claim_job('w', 60) is None
+        # Tugagan ish kirish blob'idagi havolani qo'yib yuboradi
+        assert conn.execute('SELECT ref_count FROM blobs').fetchone()[0] == 0
+
+
+def test_expired_lease_is_reclaimed_then_failed():
+    with temp_database() as conn:
+        job_id, = enqueue(max_attempts=2)
+        # Manfiy ijara - darhol tugaydi, worker o'lgandek
+        assert database.claim_job('dead-1', -1).id == job_id
+        job = database.claim_job('dead-2', -1)
+        assert (job.id, job.attempts) == (job_id, 2)
+        assert not database.complete_job(job_id, 'dead-1')
+        assert not database.renew_job_lease(job_id, 'dead-1', 60)
+        # Oxirgi urinishda ham o'ldi - qayta olinmaydi
+        assert database.claim_job('w', 60) is None
+        assert job_status(conn, job_id) == ('failed', 2)
+        assert conn.execute('SELECT ref_count FROM blobs').fetchone()[0] == 0
+
+
+def test_complete_only_by_owner():
+    with temp_database() as conn:
+        job_id, = enqueue()
+        database.claim_job('w1', 60)
+        assert not database.complete_job(job_id, 'w2')
+        assert database.complete_job(job_id, 'w1')
+        assert job_status(conn, job_id) == ('done', 1)
+
+
+def test_prune_deletes_input_blob():
+    import blob_store
+
+    with temp_database() as conn, tempfile.TemporaryDirectory() as tmp:
+        store = blob_store.BlobStore(tmp)
+        old, size = store.put_bytes(b'eski kirish')
+        fresh, _ = store.put_bytes(b'yangi kirish')
+        for sha256 in (old, fresh):
+            job_id, _ = database.enqueue_job('pdf_to_word', sha256, size, {}, 1, 1, 0, 0)
+            database.claim_job('w', 60)
+            database.complete_job(job_id, 'w')
+        # Faqat eski blob GC kutish muddatidan o'tgan
+        os.utime(store.path_for(old), (0, 0))
+
+        assert database.prune_jobs(-1, store.delete_unused) == 2
+        assert blob_refs(conn, old) is None and not store.exists(old)
+        # Yaqinda saqlangan blob'ga hozir havola olinayotgan bo'lishi mumkin
+        assert blob_refs(conn, fresh) == 0 and store.exists(fresh)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
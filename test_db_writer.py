@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Write-behind testi - flush, crash dan keyin replay va jarayonlar journali
+
+Bir nechta WriteBehindWriter (bot va worker jarayonlari kabi) bitta
+vaqtinchalik baza va bitta journal_dir bilan ishlaydi. Tekshiriladi:
+    - flush navbatdagi yozuvlarni bazaga yozadi va segmentni o'chiradi
+    - bir jarayonning flush i boshqasining yozilmagan segmentlarini
+      o'chirmaydi
+    - replay tirik jarayon journalini o'qimaydi, qulfi bo'shagan (o'lgan)
+      jarayon journalini esa bir marta qo'llaydi
+
+Ishlatish:
+    python test_db_writer.py
+    python -m pytest test_db_writer.py
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+import database
+from db_writer import WriteBehindWriter, journal_segments
+
+
+@contextmanager
+def temp_database():
+    """Fresh database and journal directory; yields the journal directory"""
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = database.DB_FILE
+        database.DB_FILE = os.path.join(tmp, 'writer.db')
+        try:
+            database.init_database()
+            yield os.path.join(tmp, 'journal')
+        finally:
+            database.close_connections()
+            database.DB_FILE = previous
+
+
+def make_writer(journal_dir):
+    # Fon flush i test davomida ishga tushmasin
+    return WriteBehindWriter(database.get_connection, flush_interval_ms=60000, journal_dir=journal_dir)
+
+
+def crashed_writer(journal_dir, user_id):
+    """A writer that journaled a user but has not flushed yet, like a live process"""
+    writer = make_writer(journal_dir)
+    writer._claim_journal()
+    writer._open_segment(0)
+    writer.upsert_user(user_id, f"user{user_id}", f"User {user_id}")
+    return writer
+
+
+def user_ids():
+    return [row[0] for row in database.get_connection().execute('SELECT user_id FROM users ORDER BY user_id')]
+
+
+def test_flush_writes_and_removes_segments():
+    with temp_database() as journal_dir:
+        writer = make_writer(journal_dir)
+        writer.start()
+        try:
+            writer.upsert_user(1, 'a', 'A')
+            writer.add_file_record(1, 'a.pdf', 'uploads/a.pdf', 'http://x/f/A', 'pdf', 10)
+            assert writer.flush() == 2
+            assert user_ids() == [1]
+            assert all(os.path.getsize(path) == 0 for _, path in writer._existing_segments())
+        finally:
+            writer.close()
+        assert os.listdir(journal_dir) == []
+
+
+def test_writers_do_not_touch_each_others_journal():
+    with temp_database() as journal_dir:
+        first = make_writer(journal_dir)
+        first.start()
+        second = crashed_writer(journal_dir, 2)
+        try:
+            first.upsert_user(1, 'a', 'A')
+            first.flush()
+            assert journal_segments(second._owner_dir), "boshqa jarayon segmenti o'chirildi"
+
+            # Ikkinchi jarayon tirik - uning journali replay qilinmaydi
+            assert make_writer(journal_dir).replay() == 0
+            assert user_ids() == [1]
+
+            # Jarayon o'ldi: qulf bo'shaydi, yozuvlar bir marta tiklanadi
+            second._journal.close()
+            second._owner_lock.close()
+            assert make_writer(journal_dir).replay() == 1
+            assert user_ids() == [1, 2]
+            assert not os.path.exists(second._owner_dir)
+            assert make_writer(journal_dir).replay() == 0
+        finally:
+            first.close()
+
+
+def test_legacy_segments_are_replayed():
+    with temp_database() as journal_dir:
+        os.makedirs(journal_dir)
+        with open(os.path.join(journal_dir, 'writes.000000000000.log'), 'w') as journal:
+            journal.write('{"kind": "user", "user_id": 5, "username": "e", "full_name": "E"}\n')
+        assert make_writer(journal_dir).replay() == 1
+        assert user_ids() == [5]
+
+
+if __name__ == '__main__':
+    for test in (test_flush_writes_and_removes_segments, test_writers_do_not_touch_each_others_journal,
+                 test_legacy_segments_are_replayed):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN QUERY PLAN testi - asosiy so'rovlarda to'liq jadval skanerlash yo'qligini tekshirish
+
+database.py funksiyalari vaqtinchalik bazada chaqiriladi, ular bajargan SQL
+trace orqali yig'iladi va har biri uchun EXPLAIN QUERY PLAN tekshiriladi.
+
+Ishlatish:
+    python test_query_plans.py
+    python -m pytest test_query_plans.py
+"""
+import os
+import tempfile
+
+import database
+
+# (funksiya nomi, argumentlar) - admin panel va har bir update dagi so'rovlar
+HOT_QUERIES = [
+    ('get_user_files', (1,)),
+    ('get_all_files', ()),
+    ('get_all_users', ()),
+    ('is_user_allowed', (1,)),
+    ('is_admin', (1,)),
+    ('get_all_admins', ()),
+    ('get_stats', ()),
+    ('get_user', (1,)),
+    ('get_users', ([1, 2, 3],)),
+    ('get_files_page', ()),
+    ('get_files_page', ('20250101000000.100',)),
+    ('get_files_page', ('20250101000000.100', True)),
+    ('get_users_page', ()),
+    ('get_users_page', ('20250101000000.100', False, 20, True)),
+    ('claim_job', ('worker-1', 60)),
+    ('get_job_stats', ()),
+    ('short_code', ('f1.pdf',)),
+    ('resolve_short_code', ('0A1B2C3D4',)),
+]
+
+
+def _seed(conn):
+    conn.executemany('INSERT INTO users (user_id, username, full_name, is_allowed) VALUES (?, ?, ?, ?)',
+                     [(i, f"user{i}", f"User {i}", i % 2) for i in range(1, 201)])
+    conn.executemany('''
+        INSERT INTO files (user_id, file_name, file_path, file_url, file_type, file_size, service_used)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(i % 200 + 1, f"f{i}.pdf", f"uploads/f{i}.pdf", f"http://x/files/f{i}.pdf", 'pdf', 100, 'file_upload')
+          for i in range(2000)])
+    conn.commit()
+    conn.execute('ANALYZE')
+
+
+def _full_scans(conn, sql):
+    """Return plan lines that read a whole table or sort in a temp b-tree"""
+    plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+    bad = []
+    for row in plan:
+        detail = row[-1]
+        if detail.startswith('SCAN') and 'INDEX' not in detail:
+            bad.append(detail)
+        if 'USE TEMP B-TREE' in detail:
+            bad.append(detail)
+    return bad
+
+
+def collect_plans():
+    """Run the hot queries against a fresh database and return {query: bad plan lines}"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = database.DB_FILE
+        database.DB_FILE = os.path.join(tmp, 'plans.db')
+        try:
+            database.init_database()
+            conn = database.get_connection()
+            _seed(conn)
+
+            for name, args in HOT_QUERIES:
+                statements = []
+                database._auth_cache.clear()
+                conn.set_trace_callback(statements.append)
+                getattr(database, name)(*args)
+                conn.set_trace_callback(None)
+                selects = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+                assert selects, f"{name} hech qanday SELECT bajarmadi"
+                for sql in selects:
+                    results[f"{name}{args}: {' '.join(sql.split())[:80]}"] = _full_scans(conn, sql)
+        finally:
+            database.close_connections()
+            database.DB_FILE = previous
+    return results
+
+
+def test_no_full_scans_on_hot_queries():
+    failures = {query: bad for query, bad in collect_plans().items() if bad}
+    assert not failures, f"To'liq skanerlash topildi: {failures}"
+
+
+def test_schema_is_at_latest_version():
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = database.DB_FILE
+        database.DB_FILE = os.path.join(tmp, 'version.db')
+        try:
+            database.init_database()
+            latest = database.MIGRATIONS[-1][0]
+            assert database.get_schema_version(database.get_connection()) == latest
+            # Qayta ishga tushirish hech narsani o'zgartirmasligi kerak
+            database.init_database()
+            assert database.get_schema_version(database.get_connection()) == latest
+        finally:
+            database.close_connections()
+            database.DB_FILE = previous
+
+
+if __name__ == '__main__':
+    ok = True
+    for query, bad in collect_plans().items():
+        print(f"{'❌' if bad else '✅'} {query}")
+        for line in bad:
+            print(f"      {line}")
+        ok = ok and not bad
+    test_schema_is_at_latest_version()
+    print("Natija:", "OK" if ok else "to'liq skanerlash bor")
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Javoblar qatlami testi - status xabari handler ni to'xtatmaydi
+
+Soxta Message har bir Bot API so'rovini RTT ga uxlab taqlid qiladi.
+Tekshiriladi:
+    - status yuborish va tahrirlash handler ni kutdirmaydi
+    - tahrirlar tartib bilan boradi, yuborilmagan eskisi tashlab yuboriladi
+    - progress tahrirlari interval dan tez yuborilmaydi
+    - Telegram xatosi handler ga chiqmaydi, fon vazifasining boshqa xatosi
+      ham log ga yoziladi
+    - 429 (RetryAfter) javobi qayta yuboriladi
+
+Ishlatish:
+    python test_replies.py
+    python -m pytest test_replies.py
+"""
+import asyncio
+import logging
+import time
+
+from telegram.error import BadRequest, RetryAfter
+
+import replies
+from replies import StatusMessage
+
+RTT = 0.05  # seconds
+
+
+class FakeMessage:
+    """Records edits; every request takes RTT seconds"""
+
+    def __init__(self, fail=False):
+        self.edits = []
+        self.fail = fail
+
+    async def reply_text(self, text, **kwargs):
+        await asyncio.sleep(RTT)
+        return self
+
+    async def edit_text(self, text, **kwargs):
+        await asyncio.sleep(RTT)
+        if self.fail:
+            raise BadRequest("Message to edit not found")
+        self.edits.append(text)
+        return self
+
+
+def test_edits_do_not_block():
+    async def run():
+        message = FakeMessage()
+        started = time.perf_counter()
+        status = StatusMessage.send(message, "⏳ Yuklanmoqda...")
+        await status.edit_text("⏳ Yuklab olinmoqda...")
+        await status.edit_text("✅ Tayyor", reply_markup=None)
+        elapsed = time.perf_counter() - started
+        await status.flush()
+        return elapsed, message.edits
+
+    elapsed, edits = asyncio.run(run())
+    assert elapsed < RTT / 2
+    # Birinchi tahrir xabar yuborilishini kutayotganda almashtirildi
+    assert edits == ["✅ Tayyor"]
+
+
+def test_edits_keep_order():
+    async def run():
+        message = FakeMessage()
+        status = StatusMessage.send(message, "⏳ 0")
+        await status.sent()
+        for i in range(1, 6):
+            await status.edit_text(f"⏳ {i}")
+            await asyncio.sleep(RTT / 3)
+        await status.flush()
+        return message.edits
+
+    edits = asyncio.run(run())
+    assert edits[-1] == "⏳ 5"
+    assert edits == sorted(edits)
+    assert len(edits) < 5
+
+
+def test_progress_throttled():
+    async def run():
+        message = FakeMessage()
+        status = StatusMessage(message.reply_text("⏳"), "⏳", interval=0.2)
+        started = time.perf_counter()
+        while time.perf_counter() - started < 0.5:
+            await status.progress(f"⏳ {time.perf_counter() - started:.3f}")
+            await asyncio.sleep(0.01)
+        await status.progress("⏳ oxirgi")
+        await status.flush()
+        return message.edits
+
+    edits = asyncio.run(run())
+    assert 2 <= len(edits) <= 4, edits
+    assert edits[-1] == "⏳ oxirgi"
+
+
+def test_errors_are_logged():
+    async def run():
+        status = StatusMessage.send(FakeMessage(fail=True), "⏳")
+        await status.edit_text("✅")
+        await status.flush()
+
+    asyncio.run(run())
+
+
+def test_background_failures_are_logged():
+    async def fails():
+        raise RuntimeError("shutdown")
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        unhandled = []
+        loop.set_exception_handler(lambda loop, context: unhandled.append(context))
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        replies.logger.addHandler(handler)
+        try:
+            replies.spawn(fails())
+            await replies.drain()
+        finally:
+            replies.logger.removeHandler(handler)
+        return records, unhandled
+
+    records, unhandled = asyncio.run(run())
+    assert [record.exc_info[1].args for record in records] == [("shutdown",)]
+    assert not unhandled
+
+
+def test_retry_after():
+    async def run():
+        calls = []
+
+        async def request(*args, **kwargs):
+            calls.append(time.perf_counter())
+            if len(calls) == 1:
+                raise RetryAfter(0)
+            return True
+
+        limiter = replies.rate_limiter()
+        await limiter.initialize()
+        try:
+            result = await limiter.process_request(request, (), {}, 'sendMessage', {'chat_id': 1}, None)
+        finally:
+            await limiter.shutdown()
+        return result, calls
+
+    result, calls = asyncio.run(run())
+    assert result is True
+    assert len(calls) == 2
+
+
+if __name__ == '__main__':
+    for test in (test_edits_do_not_block, test_edits_keep_order, test_progress_throttled,
+                 test_errors_are_logged, test_background_failures_are_logged, test_retry_after):
+        test()
+        print(f"✅ {test.__name__}")
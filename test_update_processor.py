@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Update processor testi - og'ir yuklama ostida menyu kechikishi
+
+Update lar Application dagidek har biri alohida task da
+process_update(update, handler) orqali beriladi. Og'ir update lar
+(hujjat) konvertatsiyani taqlid qilib uzoq uxlaydi, menyu update lari
+(callback) esa bir zumda tugaydi. Tekshiriladi:
+    - konvertatsiyalar hamma og'ir joylarni band qilganda ham menyu
+      kechikishi past qoladi
+    - bitta chat update lari kelgan tartibida bajariladi
+    - global va og'ir update chegaralari oshmaydi
+
+Ishlatish:
+    python test_update_processor.py
+    python -m pytest test_update_processor.py
+"""
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+from telegram import CallbackQuery, Chat, Document, Message, Update, User
+from telegram.ext import SimpleUpdateProcessor
+
+from update_processor import ChatOrderedUpdateProcessor
+
+CONVERSION_SECONDS = 0.5
+MENU_LATENCY_LIMIT = 0.1  # seconds
+
+
+def document_update(update_id, chat_id):
+    user = User(chat_id, f"user{chat_id}", False)
+    message = Message(update_id, datetime.now(timezone.utc), Chat(chat_id, Chat.PRIVATE), from_user=user,
+                      document=Document(f"file{update_id}", f"unique{update_id}", file_name='a.pdf'))
+    return Update(update_id, message=message)
+
+
+def menu_update(update_id, chat_id):
+    user = User(chat_id, f"user{chat_id}", False)
+    message = Message(update_id, datetime.now(timezone.utc), Chat(chat_id, Chat.PRIVATE), from_user=user)
+    return Update(update_id, callback_query=CallbackQuery(str(update_id), user, 'instance', message=message,
+                                                          data='convert_menu'))
+
+
+class Load:
+    """Feeds updates into a processor and records what the handlers saw"""
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.menu_latency = []
+        self.order = {}
+        self.running = self.heavy_running = 0
+        self.max_running = self.max_heavy = 0
+
+    async def handler(self, update, submitted, seconds):
+        started = time.perf_counter()
+        heavy = update.message is not None
+        self.running += 1
+        self.heavy_running += heavy
+        self.max_running = max(self.max_running, self.running)
+        self.max_heavy = max(self.max_heavy, self.heavy_running)
+        self.order.setdefault(update.effective_chat.id, []).append(update.update_id)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.running -= 1
+            self.heavy_running -= heavy
+        if not heavy:
+            self.menu_latency.append(started - submitted)
+
+    def submit(self, update, seconds):
+        handler = self.handler(update, time.perf_counter(), seconds)
+        return asyncio.ensure_future(self.processor.process_update(update, handler))
+
+
+async def run_load(processor, conversions=12, menus=60):
+    """Conversions from their own chats saturate the heavy slots while other
+    chats press menu buttons"""
+    load = Load(processor)
+    tasks = [load.submit(document_update(i, 1000 + i), CONVERSION_SECONDS) for i in range(conversions)]
+    for i in range(menus):
+        await asyncio.sleep(0.01)
+        tasks.append(load.submit(menu_update(10_000 + i, 2000 + i % 10), 0.002))
+    await asyncio.gather(*tasks)
+    return load
+
+
+def test_menu_latency_stays_flat_under_conversions():
+    processor = ChatOrderedUpdateProcessor(concurrency=16, heavy_concurrency=4)
+    load = asyncio.run(run_load(processor))
+    assert max(load.menu_latency) < MENU_LATENCY_LIMIT, max(load.menu_latency)
+    assert load.max_heavy == 4
+    assert load.max_running <= 16
+
+
+def test_same_chat_updates_run_in_order():
+    async def run():
+        load = Load(ChatOrderedUpdateProcessor(concurrency=8, heavy_concurrency=2))
+        rng = random.Random(0)
+        tasks = []
+        for i in range(40):
+            chat_id = 1 + i % 3
+            update = document_update(i, chat_id) if i % 4 == 0 else menu_update(i, chat_id)
+            tasks.append(load.submit(update, rng.random() * 0.02))
+        await asyncio.gather(*tasks)
+        return load
+
+    load = asyncio.run(run())
+    for chat_id, update_ids in load.order.items():
+        assert update_ids == sorted(update_ids), (chat_id, update_ids)
+    assert load.max_running > 1  # turli chat lar parallel
+
+
+def test_global_limit():
+    async def run():
+        load = Load(ChatOrderedUpdateProcessor(concurrency=3, heavy_concurrency=3))
+        await asyncio.gather(*(load.submit(menu_update(i, i), 0.02) for i in range(20)))
+        return load
+
+    assert asyncio.run(run()).max_running == 3
+
+
+if __name__ == '__main__':
+    for label, processor in (('ketma-ket (standart)', SimpleUpdateProcessor(1)),
+                             ('ChatOrdered 16/4', ChatOrderedUpdateProcessor(concurrency=16, heavy_concurrency=4))):
+        started = time.perf_counter()
+        load = asyncio.run(run_load(processor))
+        latency = sorted(load.menu_latency)
+        print(f"{label:>22}: menyu kechikishi median {statistics.median(latency) * 1000:7.1f}ms, "
+              f"p95 {latency[int(len(latency) * 0.95)] * 1000:7.1f}ms, maks {latency[-1] * 1000:7.1f}ms, "
+              f"jami {time.perf_counter() - started:.1f}s")
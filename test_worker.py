@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Worker testi - ish urinishi natijasi navbatga to'g'ri yoziladi
+
+Vaqtinchalik baza va blob store, Telegram ga so'rov yuborilmaydi (status
+xabari yo'q, natija yuborilishigacha yetib borilmaydi). Tekshiriladi:
+    - conversion pool vaqti tugasa ish qayta navbatga qo'yiladi (queued)
+    - konvertatsiya natija bermasa ish qayta urinilmaydi (failed)
+
+Ishlatish:
+    python test_worker.py
+    python -m pytest test_worker.py
+"""
+import asyncio
+import os
+import tempfile
+from contextlib import contextmanager
+
+import blob_store
+import bot as bot_module
+import database
+import worker
+from conversion_pool import ConversionTimeout
+
+
+@contextmanager
+def temp_queue():
+    """Fresh database and blob store, one queued qr_to_pdf job; yields its id"""
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = database.DB_FILE, blob_store.store, worker.blob_store
+        database.DB_FILE = os.path.join(tmp, 'worker.db')
+        blob_store.store = worker.blob_store = blob_store.BlobStore(os.path.join(tmp, 'blobs'))
+        try:
+            database.init_database()
+            sha256, size = blob_store.store.put_bytes(b'%PDF-1.4 test')
+            params = {'source_keys': [f"h:{sha256}"], 'extension': 'pdf', 'base_name': 'hujjat'}
+            job_id, _ = database.enqueue_job('qr_to_pdf', sha256, size, params, 1, 1, 0, 0)
+            yield job_id
+        finally:
+            database.close_connections()
+            database.DB_FILE, blob_store.store, worker.blob_store = previous
+
+
+def run_attempt(conversion):
+    """Claim the job and process it with bot.run_conversion replaced by conversion"""
+    async def run():
+        job_worker = worker.JobWorker(None, 1)
+        job = await database.adb.claim_job(job_worker.worker_id, 60)
+        await job_worker.process(job)
+
+    previous = bot_module.run_conversion
+    bot_module.run_conversion = conversion
+    try:
+        asyncio.run(run())
+    finally:
+        bot_module.run_conversion = previous
+
+
+def job_row(job_id):
+    return database.get_connection().execute(
+        'SELECT status, attempts, error FROM jobs WHERE id = ?', (job_id,)).fetchone()
+
+
+def test_pool_timeout_requeues_job():
+    async def timeout(*args, **kwargs):
+        raise ConversionTimeout()
+
+    with temp_queue() as job_id:
+        run_attempt(timeout)
+        status, attempts, error = job_row(job_id)
+        assert (status, attempts) == ('queued', 1)
+        assert error.startswith('ConversionTimeout')
+
+
+def test_missing_output_fails_job():
+    async def no_output(*args, **kwargs):
+        return False
+
+    with temp_queue() as job_id:
+        run_attempt(no_output)
+        assert job_row(job_id)[:2] == ('failed', 1)
+
+
+if __name__ == '__main__':
+    for test in (test_pool_timeout_requeues_job, test_missing_output_fails_job):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,105 @@
+"""
+Update larni parallel qayta ishlash - har bir chat ichida tartib saqlanadi
+
+python-telegram-bot standart holatda update larni birma-bir bajaradi: bitta
+foydalanuvchining 60 soniyalik LibreOffice konvertatsiyasi boshqa hammaning
+/start va tugmalarini ushlab turadi. ChatOrderedUpdateProcessor:
+
+- turli chat lar update lari parallel bajariladi (UPDATE_CONCURRENCY tasi
+  bir vaqtda)
+- bitta chat (yoki foydalanuvchi) update lari kelgan tartibida, ketma-ket
+  bajariladi - context.user_data['convert_mode'] poyga holatiga tushmaydi
+- og'ir update lar (hujjat va rasm - konvertatsiya, QR) uchun alohida,
+  kichikroq chegara (HEAVY_UPDATE_CONCURRENCY): ular band bo'lsa ham
+  menyu tugmalari uchun bo'sh joy qoladi
+
+Chat o'z navbatini kutayotgan update global joyni egallamaydi.
+"""
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from config import UPDATE_CONCURRENCY, HEAVY_UPDATE_CONCURRENCY, UPDATE_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+
+def update_key(update):
+    """Ordering key: the chat, or the user for updates without a chat"""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return ('chat', update.effective_chat.id)
+    if update.effective_user is not None:
+        return ('user', update.effective_user.id)
+    return None
+
+
+def is_heavy(update) -> bool:
+    """Documents and photos start conversions or QR work"""
+    message = update.message if isinstance(update, Update) else None
+    return message is not None and bool(message.document or message.photo)
+
+
+class _KeyLock:
+    __slots__ = ('lock', 'users')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Concurrent update processor that keeps each chat's updates in order.
+
+    max_pending bounds the updates in flight (PTB's own semaphore, including
+    updates waiting for their chat's turn); concurrency bounds the handlers
+    actually running, heavy_concurrency the document/photo handlers among them.
+    """
+
+    def __init__(self, concurrency: int = UPDATE_CONCURRENCY,
+                 heavy_concurrency: int = HEAVY_UPDATE_CONCURRENCY,
+                 max_pending: int = UPDATE_MAX_PENDING):
+        super().__init__(max(max_pending, concurrency, 2))
+        self.concurrency = max(1, concurrency)
+        self.heavy_concurrency = max(1, min(heavy_concurrency, self.concurrency))
+        self._running = asyncio.Semaphore(self.concurrency)
+        self._heavy = asyncio.Semaphore(self.heavy_concurrency)
+        self._locks = {}
+
+    async def do_process_update(self, update, coroutine):
+        key = update_key(update)
+        entry = None
+        if key is not None:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = _KeyLock()
+            entry.users += 1
+        try:
+            # asyncio.Lock navbati FIFO: update lar kelgan tartibda kiradi
+            if entry is not None:
+                await entry.lock.acquire()
+            try:
+                if is_heavy(update):
+                    async with self._heavy, self._running:
+                        await coroutine
+                else:
+                    async with self._running:
+                        await coroutine
+            finally:
+                if entry is not None:
+                    entry.lock.release()
+        finally:
+            if entry is not None:
+                entry.users -= 1
+                if entry.users == 0:
+                    del self._locks[key]
+
+    async def initialize(self):
+        logger.info(f"Update processor: {self.concurrency} parallel, og'ir {self.heavy_concurrency}, "
+                    f"navbat {self.max_concurrent_updates}")
+
+    async def shutdown(self):
+        """Nothing to free: pending updates finish with the application"""
@@ -0,0 +1,157 @@
+"""
+Webhook rejimi - bitta aiohttp server: Telegram update lari va /files
+
+Polling rejimida bot long-poll qiladi, fayllarni esa alohida jarayondagi
+gunicorn beradi. BOT_MODE=webhook da PORT dagi bitta asyncio server:
+
+- POST WEBHOOK_PATH - Telegram update ni qabul qilib, darhol
+  application.update_queue ga qo'yadi (secret token tekshiriladi)
+- GET /files/<filename> - fayl web.FileResponse orqali beriladi:
+  sendfile() (zero-copy), Range, If-None-Match / If-Modified-Since
+- GET /f/<code> - xuddi shu fayl qisqa kod orqali
+- GET / - bosh sahifa
+
+Token bo'lmasa serve() faqat fayl serverini ishga tushiradi.
+"""
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import signal
+
+from aiohttp import web
+from telegram import Update
+from werkzeug.http import quote_header_value
+from werkzeug.security import safe_join
+
+from config import (
+    HOST, PORT, UPLOAD_FOLDER, TELEGRAM_BOT_TOKEN,
+    WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS
+)
+from file_server import CACHE_CONTROL, HOME_PAGE
+
+logger = logging.getLogger(__name__)
+
+APPLICATION = web.AppKey('application', object)
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def webhook_secret(token: str = TELEGRAM_BOT_TOKEN) -> str:
+    """WEBHOOK_SECRET, or a stable secret derived from the bot token"""
+    return WEBHOOK_SECRET or hashlib.sha256(f"webhook:{token}".encode()).hexdigest()[:32]
+
+
+async def resolve(filename: str):
+    """Path of a public file name: content-addressed blob or legacy upload"""
+    from blob_store import store
+    from database import adb
+
+    sha256 = await adb.resolve_alias(filename)
+    if sha256 is not None:
+        return store.path_for(sha256)
+    return safe_join(UPLOAD_FOLDER, filename)
+
+
+async def serve_file(request):
+    """Serve uploaded files with sendfile, Range and conditional GET"""
+    return await _send_file(request.match_info['filename'])
+
+
+async def serve_short(request):
+    """Serve a file by its short code, like /files/<name>"""
+    from database import adb
+
+    filename = await adb.resolve_short_code(request.match_info['code'])
+    if filename is None:
+        raise web.HTTPNotFound()
+    return await _send_file(filename)
+
+
+async def _send_file(filename: str):
+    path = await resolve(filename)
+    if path is None:
+        raise web.HTTPNotFound()
+    headers = {
+        'Cache-Control': CACHE_CONTROL,
+        'Content-Disposition': f'attachment; filename={quote_header_value(filename)}',
+        # Blob fayllarda kengaytma yo'q - turi ochiq nomdan aniqlanadi
+        'Content-Type': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+    }
+    return web.FileResponse(path, headers=headers)
+
+
+async def home(request):
+    return web.Response(text=HOME_PAGE, content_type='text/html')
+
+
+async def telegram_webhook(request):
+    """Queue a Telegram update; handlers run on the application's processor"""
+    application = request.app[APPLICATION]
+    if request.headers.get(SECRET_HEADER) != webhook_secret(application.bot.token):
+        raise web.HTTPForbidden()
+    try:
+        data = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest()
+    await application.update_queue.put(Update.de_json(data, application.bot))
+    return web.Response()
+
+
+def create_app(application=None) -> web.Application:
+    """aiohttp app with /files and, given a PTB application, the webhook route"""
+    app = web.Application(client_max_size=4 * 1024 * 1024)
+    app.router.add_get('/', home)
+    app.router.add_get('/files/{filename}', serve_file)
+    # QR ichidagi havola katta harflarda (alphanumeric rejim): /F/<CODE>
+    app.router.add_get('/f/{code}', serve_short)
+    app.router.add_get('/F/{code}', serve_short)
+    if application is not None:
+        app[APPLICATION] = application
+        app.router.add_post(WEBHOOK_PATH, telegram_webhook)
+    return app
+
+
+async def _wait_for_signal():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+
+async def run(application, webhook_url: str, host: str = HOST, port: int = PORT):
+    """Run the PTB application behind this server until SIGINT/SIGTERM.
+
+    Mirrors Application.run_webhook's lifecycle (post_init, post_stop,
+    post_shutdown) without its own tornado server. The webhook is left set
+    on exit so Telegram keeps updates while the bot restarts.
+    """
+    runner = web.AppRunner(create_app(application), access_log=None)
+    await runner.setup()
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await web.TCPSite(runner, host, port).start()
+        await application.bot.set_webhook(
+            webhook_url, secret_token=webhook_secret(application.bot.token), allowed_updates=Update.ALL_TYPES,
+            max_connections=WEBHOOK_MAX_CONNECTIONS)
+        logger.info(f"Webhook server ishga tushdi: http://{host}:{port}, webhook {webhook_url}")
+        await _wait_for_signal()
+    finally:
+        # Avval yangi so'rovlarni to'xtatish, keyin navbatdagilarni tugatish
+        await runner.cleanup()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def serve(host: str = HOST, port: int = PORT):
+    """Run only the file endpoints (no bot token)"""
+    print(f"File server ishga tushdi (aiohttp): http://{host}:{port}")
+    web.run_app(create_app(), host=host, port=port, access_log=None, print=None)
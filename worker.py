@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Konvertatsiya worker - jobs jadvalidagi ishlarni bajaradi
+
+JOB_QUEUE=true bo'lsa bot faylni blob store ga yuklab, ishni navbatga
+qo'yadi va darhol javob beradi. Bu jarayon (bir nechta nusxasi, boshqa
+mashinalarda ham - DB_FILE va BLOB_FOLDER umumiy bo'lsa) ishlarni oladi:
+
+- ish ijaraga (lease) olinadi va bajarilayotganda muntazam uzaytiriladi;
+  worker o'lsa, ijara tugagach ishni boshqa worker oladi
+- vaqtinchalik xatoda (tarmoq, qulagan worker) ish eksponensial kutish
+  bilan qayta navbatga qo'yiladi, JOB_MAX_ATTEMPTS dan keyin - xato
+- konvertatsiya natija bermasa (buzuq fayl) qayta urinilmaydi
+- natija Bot API orqali foydalanuvchiga yuboriladi, status xabari yangilanadi
+- navbat chuqurligi, kutish va bajarilish vaqti har daqiqada log ga yoziladi
+  (/stats da ham ko'rinadi)
+
+Ishlatish:
+    python worker.py [--concurrency N]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import time
+import uuid
+
+from telegram import Bot, ReplyParameters
+from telegram.error import BadRequest, TelegramError
+from telegram.ext import ExtBot
+
+import bot as bot_module
+import qr_render
+from blob_store import store as blob_store
+from config import (
+    TELEGRAM_BOT_TOKEN, UPLOAD_FOLDER, DB_WRITE_BEHIND,
+    JOB_WORKER_CONCURRENCY, JOB_LEASE_SECONDS, JOB_RETRY_BASE_SECONDS, JOB_RETRY_MAX_SECONDS,
+    JOB_POLL_INTERVAL, STATUS_EDIT_INTERVAL
+)
+from conversion_pool import pool as conversion_pool
+from database import adb, start_write_behind, stop_write_behind, close_connections
+from libreoffice import LibreOfficeCrashed, LibreOfficeError, pool as libreoffice_pool
+from replies import rate_limiter
+
+logger = logging.getLogger('worker')
+
+METRICS_INTERVAL = 60  # seconds
+JOB_HISTORY_SECONDS = 7 * 24 * 3600  # tugagan ishlar metrikalar uchun shuncha saqlanadi
+
+
+class JobFailed(Exception):
+    """The job cannot succeed (bad input); it is not retried"""
+
+
+class LeaseLost(Exception):
+    """Another worker owns the job now; this attempt must not send anything"""
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff before attempt number attempts + 1"""
+    return min(JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), JOB_RETRY_MAX_SECONDS)
+
+
+def link_input(sha256: str, path: str):
+    """Make the stored input blob available at path without copying"""
+    try:
+        os.link(blob_store.path_for(sha256), path)
+    except OSError:
+        shutil.copyfile(blob_store.path_for(sha256), path)
+
+
+# --- operations: (source path, params, work) -> Result ---
+
+class Result:
+    """A produced output waiting to be published and sent"""
+
+    def __init__(self, output_path, public_name, result_name, caption, reply_markup):
+        self.output_path = output_path
+        self.public_name = public_name
+        self.result_name = result_name
+        self.caption = caption
+        self.reply_markup = reply_markup
+
+
+def _qr_caption(title: str, qr_replaced: bool, file_url: str) -> str:
+    caption = f"✅ {title}\n\n"
+    caption += "🔄 Mavjud QR kod almashtirildi!\n\n" if qr_replaced else "➕ Yangi QR kod qo'shildi!\n\n"
+    return caption + f"📥 Yuklab olish: {file_url}\n🌐 Soliq.uz"
+
+
+async def run_pdf_to_word(source, params, work):
+    public_name = f"{work.unique_id}.docx"
+    output_path = os.path.join(blob_store.tmp_dir, public_name)
+    work.cleanup.append(output_path)
+    if not await bot_module.convert_pdf_to_word(source, output_path, work.progress, raise_transient=True):
+        raise JobFailed("PDF to Word konvertatsiya xatoligi")
+    return Result(output_path, public_name, f"{params['base_name']}.docx",
+                  "✅ PDF Word formatiga o'zgartirildi\n🌐 Soliq.uz", bot_module.create_convert_keyboard())
+
+
+async def run_word_to_pdf(source, params, work):
+    public_name = f"{work.unique_id}.pdf"
+    output_path = os.path.join(UPLOAD_FOLDER, public_name)
+    work.cleanup.append(output_path)
+    if not await bot_module.convert_word_to_pdf(source, output_path, raise_transient=True):
+        raise JobFailed("Word to PDF konvertatsiya xatoligi")
+    return Result(output_path, public_name, f"{params['base_name']}.pdf",
+                  "✅ Word PDF formatiga o'zgartirildi\n🌐 Soliq.uz", bot_module.create_convert_keyboard())
+
+
+async def run_qr_stamp(source, params, work):
+    operation, extension = work.operation, params['extension']
+    if operation == 'qr_to_word' and extension == 'doc':
+        if not libreoffice_pool.available:
+            raise JobFailed("LibreOffice topilmadi")
+        try:
+            source = await libreoffice_pool.convert_one(source, 'docx', UPLOAD_FOLDER)
+        except LibreOfficeCrashed:
+            raise
+        except LibreOfficeError as e:
+            raise JobFailed(f"DOC -> DOCX xatoligi: {e}")
+        work.cleanup.append(source)
+        extension = 'docx'
+
+    public_name = f"{uuid.uuid4()}.{extension}"
+    file_url = await bot_module.public_url(public_name)
+    output_path = os.path.join(blob_store.tmp_dir, f"{work.unique_id}_with_qr.{extension}")
+    work.cleanup.append(output_path)
+    if operation == 'qr_to_word':
+        qr_replaced = await bot_module.add_qr_to_word_document(source, bot_module.make_stamp_qr(file_url),
+                                                               output_path, raise_transient=True)
+        title = "Word faylga QR kod qo'shildi!"
+    elif operation == 'qr_to_pdf':
+        qr_replaced = await bot_module.add_qr_to_pdf_document(source, bot_module.make_stamp_qr(file_url),
+                                                              output_path, raise_transient=True)
+        title = "PDF faylga QR kod qo'shildi!"
+    else:
+        qr_replaced = await bot_module.add_qr_to_office_document(
+            source, qr_render.render_png(bot_module.qr_data(file_url)), output_path, extension, raise_transient=True)
+        title = "Faylga QR kod qo'shildi!"
+    if not os.path.exists(output_path):
+        raise JobFailed("QR kod qo'shishda xatolik")
+    return Result(output_path, public_name, f"{params['base_name']}_QR.{extension}",
+                  _qr_caption(title, qr_replaced, file_url), bot_module.create_back_keyboard())
+
+
+OPERATIONS = {
+    'pdf_to_word': run_pdf_to_word,
+    'word_to_pdf': run_word_to_pdf,
+    'qr_to_word': run_qr_stamp,
+    'qr_to_pdf': run_qr_stamp,
+    'qr_to_office': run_qr_stamp,
+}
+
+
+class JobContext:
+    """Per-attempt scratch state: temp files and progress reporting"""
+
+    def __init__(self, telegram_bot, job):
+        self.bot = telegram_bot
+        self.job = job
+        self.operation = job.operation
+        self.unique_id = str(uuid.uuid4())
+        self.cleanup = []
+        self.progress_at = float('-inf')
+
+    async def status(self, text, reply_markup=None):
+        if not self.job.status_message_id:
+            return
+        try:
+            await self.bot.edit_message_text(text, chat_id=self.job.chat_id,
+                                             message_id=self.job.status_message_id, reply_markup=reply_markup)
+        except TelegramError as e:
+            logger.warning(f"Job {self.job.id}: status xabarini yangilab bo'lmadi: {e}")
+
+    async def progress(self, done, total):
+        # Oraliq holatlar STATUS_EDIT_INTERVAL dan tez-tez yuborilmaydi
+        now = time.monotonic()
+        if done < total and now - self.progress_at < STATUS_EDIT_INTERVAL:
+            return
+        self.progress_at = now
+        await self.status(f"⏳ Konvertatsiya... {done}/{total} qism")
+
+    def remove_files(self):
+        for path in self.cleanup:
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+class JobWorker:
+    """Claims jobs from the queue and runs up to concurrency of them at once"""
+
+    def __init__(self, telegram_bot: Bot, concurrency: int = JOB_WORKER_CONCURRENCY):
+        self.bot = telegram_bot
+        self.concurrency = max(1, concurrency)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        logger.info(f"Worker {self.worker_id} ishga tushdi, {self.concurrency} ta parallel ish")
+        slots = [asyncio.create_task(self._slot()) for _ in range(self.concurrency)]
+        metrics = asyncio.create_task(self._log_metrics())
+        try:
+            await self._stopping.wait()
+        finally:
+            metrics.cancel()
+            # Bajarilayotgan ishlar tugatiladi, yangisi olinmaydi
+            await asyncio.gather(*slots, return_exceptions=True)
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _slot(self):
+        while not self._stopping.is_set():
+            try:
+                job = await adb.claim_job(self.worker_id, JOB_LEASE_SECONDS)
+            except Exception as e:
+                logger.error(f"Ish olishda xato: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.process(job)
+
+    async def _keep_lease(self, job, attempt):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            if not await adb.renew_job_lease(job.id, self.worker_id, JOB_LEASE_SECONDS):
+                logger.warning(f"Job {job.id}: ijara boshqa worker ga o'tdi, urinish to'xtatildi")
+                # Natijani endi yangi egasi yuboradi
+                attempt.cancel()
+                return
+
+    async def _check_lease(self, job):
+        """Raise LeaseLost unless this worker still owns the job; renews the lease"""
+        if not await adb.renew_job_lease(job.id, self.worker_id, JOB_LEASE_SECONDS):
+            raise LeaseLost(f"Job {job.id}")
+
+    async def process(self, job):
+        """Run one attempt of a claimed job and record its outcome"""
+        work = JobContext(self.bot, job)
+        attempt = asyncio.create_task(self.execute(job, work))
+        lease = asyncio.create_task(self._keep_lease(job, attempt))
+        logger.info(f"Job {job.id} ({job.operation}) boshlandi, urinish {job.attempts}/{job.max_attempts}")
+        try:
+            await attempt
+        except asyncio.CancelledError:
+            if not lease.done():
+                # Worker ning o'zi bekor qilindi, ijara yo'qolmagan
+                raise
+            logger.warning(f"Job {job.id}: ijara yo'qoldi, natija yuborilmadi")
+        except LeaseLost:
+            logger.warning(f"Job {job.id}: ijara yo'qoldi, natija yuborilmadi")
+        except JobFailed as e:
+            logger.error(f"Job {job.id} bajarilmadi: {e}")
+            await adb.fail_job(job.id, self.worker_id, str(e), None)
+            await work.status("❌ Konvertatsiya xatoligi. Iltimos qaytadan urinib ko'ring.",
+                              bot_module.create_back_keyboard())
+        except Exception as e:
+            delay = retry_delay(job.attempts)
+            status = await adb.fail_job(job.id, self.worker_id, f"{type(e).__name__}: {e}", delay)
+            if status == 'queued':
+                logger.warning(f"Job {job.id} xato: {e!r}, {delay:.0f}s dan keyin qayta urinish")
+                await work.status(f"⏳ Vaqtinchalik xato, {delay:.0f} soniyadan keyin qayta urinib ko'riladi...")
+            else:
+                logger.error(f"Job {job.id} {job.attempts} urinishdan keyin bajarilmadi: {e!r}")
+                await work.status("❌ Xatolik yuz berdi. Iltimos qaytadan urinib ko'ring.",
+                                  bot_module.create_back_keyboard())
+        else:
+            if not await adb.complete_job(job.id, self.worker_id):
+                logger.warning(f"Job {job.id} tugadi, lekin ijara allaqachon boshqa worker da")
+            logger.info(f"Job {job.id} tugadi")
+        finally:
+            lease.cancel()
+            work.remove_files()
+
+    async def execute(self, job, work):
+        params = job.params
+        source_keys = params['source_keys']
+        options = bot_module.result_options(job.operation)
+        reply = ReplyParameters(message_id=job.message_id, allow_sending_without_reply=True) \
+            if job.message_id else None
+        await work.status("⏳ Fayl ishlanmoqda...")
+
+        # Boshqa ish shu natijani allaqachon tayyorlagan bo'lishi mumkin
+        cached = await adb.get_cached_result(source_keys, job.operation, options)
+        if cached is not None and cached.tg_file_id:
+            await self._check_lease(job)
+            try:
+                await self.bot.send_document(job.chat_id, cached.tg_file_id, caption=cached.caption,
+                                             reply_parameters=reply)
+                await work.status("✅ Tayyor natija yuborildi!")
+                await self._record(job, cached.file_name, cached.public_name, blob_store.path_for(cached.sha256),
+                                   cached.sha256, cached.size)
+                return
+            except BadRequest as e:
+                logger.warning(f"Keshdagi file_id ishlamadi ({job.operation}): {e}")
+                await adb.forget_cached_result(source_keys, job.operation, options)
+
+        source = os.path.join(UPLOAD_FOLDER, f"{work.unique_id}_original.{params['extension']}")
+        work.cleanup.append(source)
+        await asyncio.to_thread(link_input, job.input_blob, source)
+
+        result = await OPERATIONS[job.operation](source, params, work)
+        # Ijara yangilash oralig'ida boshqa worker ishni olgan bo'lishi mumkin.
+        # Tekshiruv ijarani yangilaydi - nashr, yozuv va yuborish uning ichida
+        # ulguradi, natija ikki marta yozilmaydi
+        await self._check_lease(job)
+        blob_path, blob, file_size = await bot_module.publish_file(result.output_path, result.public_name)
+        await self._record(job, result.result_name, result.public_name, blob_path, blob, file_size)
+        with bot_module.upload_source(blob_path, result.result_name) as result_file:
+            sent = await self.bot.send_document(job.chat_id, result_file, filename=result.result_name,
+                                                caption=result.caption, reply_markup=result.reply_markup,
+                                                reply_parameters=reply)
+        await work.status("✅ Tayyor!")
+        await bot_module.remember_result(source_keys, job.operation, sent, blob, result.public_name,
+                                         result.result_name, result.caption, file_size)
+
+    async def _record(self, job, file_name, public_name, blob_path, blob, file_size):
+        try:
+            await adb.add_file_record(
+                user_id=job.user_id,
+                file_name=file_name,
+                file_path=blob_path,
+                file_url=await bot_module.public_url(public_name),
+                file_type=os.path.splitext(public_name)[1].lstrip('.'),
+                file_size=file_size,
+                service_used=job.operation,
+                blob=blob
+            )
+        except Exception as e:
+            logger.error(f"Failed to save {job.operation} record: {e}")
+
+    async def _log_metrics(self):
+        while True:
+            await asyncio.sleep(METRICS_INTERVAL)
+            try:
+                await adb.prune_jobs(JOB_HISTORY_SECONDS, blob_store.delete_unused)
+                stats = await adb.get_job_stats()
+                logger.info(
+                    f"Navbat: {stats['queued']} kutmoqda ({stats['retrying']} qayta urinish), "
+                    f"{stats['running']} bajarilmoqda, eng eski {stats['oldest_wait']:.0f}s | "
+                    f"oxirgi soat: {stats['done']} tayyor, {stats['failed']} xato, "
+                    f"kutish o'rt. {stats['wait_avg']:.1f}s, bajarilish o'rt. {stats['run_avg']:.1f}s"
+                )
+            except Exception as e:
+                logger.error(f"Navbat metrikalarini o'qishda xato: {e}")
+
+
+async def main_async(concurrency: int):
+    import signal
+
+    if DB_WRITE_BEHIND:
+        # Har bir jarayonning o'z journali va LibreOffice slot i bor - bot va
+        # boshqa worker lar bilan to'qnashmaydi
+        start_write_behind()
+    await libreoffice_pool.start()
+    async with ExtBot(TELEGRAM_BOT_TOKEN, rate_limiter=rate_limiter(), **bot_module.bot_api_settings()) as telegram_bot:
+        worker = JobWorker(telegram_bot, concurrency)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        try:
+            await worker.run()
+        finally:
+            conversion_pool.shutdown(wait=False)
+            await libreoffice_pool.stop()
+            stop_write_behind()
+            close_connections()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=JOB_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    if not TELEGRAM_BOT_TOKEN or TELEGRAM_BOT_TOKEN == 'YOUR_BOT_TOKEN_HERE':
+        print("XATOLIK: TELEGRAM_BOT_TOKEN o'rnatilmagan!")
+        return
+    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    asyncio.run(main_async(args.concurrency))
+
+
+if __name__ == '__main__':
+    main()